@@ -0,0 +1,513 @@
+"""Burst trie
+
+=== Module description ===
+This file contains BurstTrie, an Autocompleter storing its values in a burst
+trie: a trie whose nodes near the root index their children by prefix
+element, and whose deeper values are kept in small containers sorted by the
+rest of their prefix sequences.
+
+A container holds the values of every prefix sequence starting with the
+elements on its path. Once it holds more than BURST_THRESHOLD values, it
+bursts into a node with a container for each next prefix element. Long
+single-child chains, which take a node per element in a SimplePrefixTree,
+stay inside a container as the tuple of their remaining elements, and
+inserting never splits or copies a node as in a CompressedPrefixTree.
+
+Like the other prefix trees, a burst trie can keep the top_k heaviest
+values of every node, so that a query with a limit of at most top_k ending
+at a node reads them instead of searching below it. Containers hold at most
+BURST_THRESHOLD values, and are sorted by weight when a query reaches them.
+"""
+from __future__ import annotations
+
+import heapq
+import sys
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .prefix_tree import (Autocompleter, Substitution, fuzzy_step,
+                          unit_substitution)
+
+# The largest number of values of a container before it bursts
+BURST_THRESHOLD = 32
+
+
+class BurstContainer:
+    """A container of the values whose prefix sequences start with the
+    elements on its path, sorted by the rest of their prefix sequences.
+
+    === Attributes ===
+    suffixes:
+        The rest of the prefix sequence of each value, after the elements on
+        the path of this container, in sorted order.
+    entries:
+        The [value, weight] of each value, in the same order as <suffixes>.
+    max_weight:
+        The largest weight of the values, or 0 if there is none.
+    """
+    __slots__ = ('suffixes', 'entries', 'max_weight')
+    suffixes: List[Tuple]
+    entries: List[List]
+    max_weight: float
+
+    def __init__(self) -> None:
+        """Initialize an empty container."""
+        self.suffixes = []
+        self.entries = []
+        self.max_weight = 0.0
+
+    def __len__(self) -> int:
+        """Return the number of values in this container."""
+        return len(self.entries)
+
+    def insert(self, value: Any, weight: float, suffix: Tuple
+               ) -> Tuple[int, float]:
+        """Insert <value> with <weight> under <suffix>, adding <weight> to
+        its weight if it is already stored, and return the number of values
+        added and the new weight of the value.
+        """
+        start = bisect_left(self.suffixes, suffix)
+        end = bisect_right(self.suffixes, suffix, start)
+        for entry in self.entries[start:end]:
+            if entry[0] == value:
+                entry[1] += weight
+                self.max_weight = max(self.max_weight, entry[1])
+                return 0, entry[1]
+
+        self.suffixes.insert(end, suffix)
+        self.entries.insert(end, [value, weight])
+        self.max_weight = max(self.max_weight, weight)
+        return 1, weight
+
+    def find_range(self, prefix: Tuple) -> Tuple[int, int]:
+        """Return the range of indices of the suffixes starting with
+        <prefix>.
+        """
+        start = bisect_left(self.suffixes, prefix)
+        end = start
+        while end < len(self.suffixes) and \
+                self.suffixes[end][:len(prefix)] == prefix:
+            end += 1
+        return start, end
+
+    def remove_range(self, start: int, end: int) -> None:
+        """Remove the values from index <start> to <end> - 1."""
+        del self.suffixes[start:end]
+        del self.entries[start:end]
+        self.max_weight = max((weight for _, weight in self.entries),
+                              default=0.0)
+
+    def burst(self) -> BurstNode:
+        """Return a node storing the values of this container, with a
+        container for each element their suffixes continue with.
+        """
+        node = BurstNode()
+        for suffix, (value, weight) in zip(self.suffixes, self.entries):
+            if not suffix:
+                node.leaves[value] = weight
+                continue
+
+            # the suffixes are sorted, so each container is filled in order
+            child = node.children.get(suffix[0])
+            if child is None:
+                child = node.children[suffix[0]] = BurstContainer()
+            child.suffixes.append(suffix[1:])
+            child.entries.append([value, weight])
+            child.max_weight = max(child.max_weight, weight)
+
+        node.length = len(self.entries)
+        node.max_weight = self.max_weight
+        return node
+
+
+class BurstNode:
+    """A node of a burst trie, indexing its children by prefix element.
+
+    === Attributes ===
+    children:
+        The node or container storing the values whose prefix sequences
+        continue with each element.
+    leaves:
+        The weight of each value whose prefix sequence ends at this node.
+    length:
+        The number of values stored in this node and below it.
+    max_weight:
+        The largest weight of the values stored in this node and below it,
+        or 0 if there is none.
+    top:
+        The heaviest (value, weight) pairs stored in this node and below it,
+        heaviest first, if the trie keeps them, and None otherwise.
+    """
+    __slots__ = ('children', 'leaves', 'length', 'max_weight', 'top')
+    children: Dict[Any, Union[BurstNode, BurstContainer]]
+    leaves: Dict[Any, float]
+    length: int
+    max_weight: float
+    top: Optional[List[Tuple[Any, float]]]
+
+    def __init__(self) -> None:
+        """Initialize an empty node."""
+        self.children = {}
+        self.leaves = {}
+        self.length = 0
+        self.max_weight = 0.0
+        self.top = None
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this node and below it."""
+        return self.length
+
+    def update_max_weight(self) -> None:
+        """Recompute the largest weight from the leaves and children."""
+        self.max_weight = max(
+            max(self.leaves.values(), default=0.0),
+            max((child.max_weight for child in self.children.values()),
+                default=0.0))
+
+    def collect_top(self, top_k: int) -> List[Tuple[Any, float]]:
+        """Return the <top_k> heaviest values stored in this node and below
+        it, from its leaves, the values of its containers and the heaviest
+        values kept by its child nodes.
+        """
+        pairs = list(self.leaves.items())
+        for child in self.children.values():
+            if isinstance(child, BurstNode):
+                pairs.extend(child.top)
+            else:
+                pairs.extend(map(tuple, child.entries))
+        return heapq.nlargest(top_k, pairs, key=itemgetter(1))
+
+    def update_top(self, value: Any, weight: float, top_k: int) -> None:
+        """Update the heaviest values kept by this node, after <value> was
+        inserted below it or had its weight increased to <weight>.
+
+        The weights of the other values did not change, so the value only
+        has to be moved up or added.
+        """
+        top = self.top
+        if len(top) == top_k and top[-1][1] >= weight and \
+                all(pair[0] != value for pair in top):
+            return
+
+        top = [pair for pair in top if pair[0] != value]
+        index = 0
+        while index < len(top) and top[index][1] >= weight:
+            index += 1
+        top.insert(index, (value, weight))
+        self.top = top[:top_k]
+
+
+class BurstTrie(Autocompleter):
+    """An Autocompleter storing its values in a burst trie.
+
+    === Attributes ===
+    weight_type:
+        The type of weight used to aggregate the weights of the values,
+        'sum' or 'average'.
+    root:
+        The node storing every value.
+    top_k:
+        The number of heaviest values kept by every node, or None if they
+        are not kept.
+    """
+    __slots__ = ('weight_type', 'root', 'top_k')
+    weight_type: str
+    root: BurstNode
+    top_k: Optional[int]
+
+    def __init__(self, weight_type: str, top_k: Optional[int] = None) -> None:
+        """Initialize an empty burst trie with the given weight type, whose
+        nodes keep their <top_k> heaviest values if top_k is not None.
+
+        Precondition: weight_type == 'sum' or weight_type == 'average', and
+        top_k is None or top_k > 0.
+        """
+        self.weight_type = weight_type
+        self.top_k = top_k
+        self.root = BurstNode()
+        if top_k:
+            self.root.top = []
+
+    @classmethod
+    def from_items(cls, weight_type: str,
+                   items: Iterable[Tuple[Any, float, List]],
+                   top_k: Optional[int] = None) -> BurstTrie:
+        """Return a new burst trie storing every (value, weight, prefix)
+        item, inserted in turn.
+        """
+        trie = cls(weight_type, top_k)
+        for value, weight, prefix in items:
+            trie.insert(value, weight, prefix)
+        return trie
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        return self.root.length
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value into this Autocompleter.
+
+        See Autocompleter.insert.
+        """
+        path = [self.root]
+        node = self.root
+        depth = 0
+        while True:
+            # the prefix sequence ends at this node
+            if depth == len(prefix):
+                added = int(value not in node.leaves)
+                new_weight = node.leaves.get(value, 0.0) + weight
+                node.leaves[value] = new_weight
+                break
+
+            child = node.children.get(prefix[depth])
+            if child is None:
+                child = node.children[prefix[depth]] = BurstContainer()
+
+            if isinstance(child, BurstNode):
+                node = child
+                path.append(node)
+                depth += 1
+                continue
+
+            suffix = tuple(prefix[depth + 1:])
+            added, new_weight = child.insert(value, weight, suffix)
+            if len(child) > BURST_THRESHOLD:
+                child = node.children[prefix[depth]] = child.burst()
+                if self.top_k:
+                    child.top = child.collect_top(self.top_k)
+            break
+
+        for tree in path:
+            tree.length += added
+            tree.max_weight = max(tree.max_weight, new_weight)
+            if self.top_k:
+                tree.update_top(value, new_weight, self.top_k)
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix.
+
+        A prefix ending inside a container is answered from the range of
+        its sorted suffixes starting with the rest of the prefix. A prefix
+        ending at a node is answered from the heaviest values it keeps if
+        they are enough, and otherwise the trees below it are searched
+        best-first by their largest weight. The values of a node or
+        container reached by the search enter the heap one at a time,
+        heaviest first.
+
+        See Autocompleter.autocomplete.
+        """
+        node = self.root
+        for depth, element in enumerate(prefix):
+            child = node.children.get(element)
+            if child is None:
+                return []
+            if isinstance(child, BurstContainer):
+                start, end = child.find_range(tuple(prefix[depth + 1:]))
+                matches = [tuple(entry) for entry in child.entries[start:end]]
+                matches.sort(key=lambda pair: -pair[1])
+                return matches[:limit]
+            node = child
+
+        # the heaviest values kept by the node are enough
+        top = node.top
+        if top is not None and (len(top) == node.length
+                                or (limit is not None and limit <= len(top))):
+            return top[:limit]
+
+        # the heap holds trees, and lists of values sorted by weight with
+        # the index of the next value to pop
+        result = []
+        heap = [(-node.max_weight, 0, node, 0)]
+        count = 0
+        while heap and (limit is None or len(result) < limit):
+            _, _, tree, index = heapq.heappop(heap)
+            if isinstance(tree, list):
+                result.append(tree[index])
+                index += 1
+                if index < len(tree):
+                    count += 1
+                    heapq.heappush(heap, (-tree[index][1], count, tree,
+                                          index))
+                continue
+
+            if isinstance(tree, BurstContainer):
+                values = [tuple(entry) for entry in tree.entries]
+            else:
+                values = list(tree.leaves.items())
+                for child in tree.children.values():
+                    count += 1
+                    heapq.heappush(heap, (-child.max_weight, count, child, 0))
+            if values:
+                values.sort(key=itemgetter(1), reverse=True)
+                count += 1
+                heapq.heappush(heap, (-values[0][1], count, values, 0))
+
+        return result
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order.
+
+        The nodes and containers are searched best-first by their largest
+        weight, keeping for each the last row of the edit distance table
+        between the given prefix and the elements on its path, or None once
+        every value below it matches. The suffix of every value of a
+        container reached with a row is matched on its own.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        if substitution is None:
+            substitution = unit_substitution
+
+        row = [0.0] + [gap * length for length in range(1, len(prefix) + 1)]
+        if row[-1] <= max_edits:
+            row = None
+
+        # the heap holds nodes and containers with their rows, and lists of
+        # matching values sorted by weight with the index of the next value
+        # to pop
+        result = []
+        heap = [(-self.root.max_weight, 0, self.root, row)]
+        count = 0
+        while heap and (limit is None or len(result) < limit):
+            _, _, tree, row = heapq.heappop(heap)
+            if isinstance(tree, list):
+                # the row of a list is the index of its next value
+                result.append(tree[row])
+                if row + 1 < len(tree):
+                    count += 1
+                    heapq.heappush(heap, (-tree[row + 1][1], count, tree,
+                                          row + 1))
+                continue
+
+            if isinstance(tree, BurstContainer):
+                if row is None:
+                    values = [tuple(entry) for entry in tree.entries]
+                else:
+                    values = []
+                    for suffix, entry in zip(tree.suffixes, tree.entries):
+                        step = fuzzy_step(row, suffix, prefix, max_edits,
+                                          substitution, gap)
+                        if step is not None and step[1]:
+                            values.append(tuple(entry))
+            else:
+                values = list(tree.leaves.items()) if row is None else []
+                for element, child in tree.children.items():
+                    child_row = None
+                    if row is not None:
+                        step = fuzzy_step(row, [element], prefix, max_edits,
+                                          substitution, gap)
+                        if step is None:
+                            continue
+                        child_row = None if step[1] else step[0]
+                    count += 1
+                    heapq.heappush(heap, (-child.max_weight, count, child,
+                                          child_row))
+
+            if values:
+                values.sort(key=itemgetter(1), reverse=True)
+                count += 1
+                heapq.heappush(heap, (-values[0][1], count, values, 0))
+
+        return result
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix.
+
+        Nodes and containers left empty are removed from their parents, and
+        the largest weights and heaviest values kept above them are
+        recomputed.
+        """
+        path = [self.root]
+        node = self.root
+        removed = 0
+        for depth, element in enumerate(prefix):
+            child = node.children.get(element)
+            if child is None:
+                return
+            if isinstance(child, BurstContainer):
+                start, end = child.find_range(tuple(prefix[depth + 1:]))
+                child.remove_range(start, end)
+                removed = end - start
+                break
+            node = child
+            path.append(node)
+        else:
+            # every value of the last node matches
+            removed = node.length
+            node.children = {}
+            node.leaves = {}
+            if self.top_k:
+                node.top = []
+
+        # update the trees above, dropping the empty ones
+        for depth in range(len(path) - 1, -1, -1):
+            tree = path[depth]
+            tree.length -= removed
+            if depth < len(prefix):
+                child = tree.children[prefix[depth]]
+                if len(child) == 0:
+                    del tree.children[prefix[depth]]
+            tree.update_max_weight()
+            if self.top_k:
+                tree.top = tree.collect_top(self.top_k)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the number of nodes ('nodes'), containers ('containers')
+        and values ('leaves') in this trie, and the approximate number of
+        bytes they use ('bytes').
+
+        The bytes count the nodes, containers and the lists, dicts and
+        tuples they own, but not the heaviest values kept, the inserted
+        values, prefix elements and weights.
+        """
+        stats = {'nodes': 0, 'containers': 0, 'leaves': 0, 'bytes': 0}
+        stack = [self.root]
+        while stack:
+            tree = stack.pop()
+            if isinstance(tree, BurstContainer):
+                stats['containers'] += 1
+                stats['leaves'] += len(tree)
+                stats['bytes'] += (sys.getsizeof(tree)
+                                   + sys.getsizeof(tree.suffixes)
+                                   + sys.getsizeof(tree.entries)
+                                   + sum(map(sys.getsizeof, tree.suffixes))
+                                   + sum(map(sys.getsizeof, tree.entries)))
+            else:
+                stats['nodes'] += 1
+                stats['leaves'] += len(tree.leaves)
+                stats['bytes'] += (sys.getsizeof(tree)
+                                   + sys.getsizeof(tree.children)
+                                   + sys.getsizeof(tree.leaves))
+                stack.extend(tree.children.values())
+
+        return stats
+
+    def top_memory(self) -> int:
+        """Return the approximate number of bytes used by the heaviest values
+        kept by the nodes, counting the pairs shared by several nodes once,
+        but not the values themselves.
+        """
+        seen = set()
+        size = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            stack.extend(child for child in node.children.values()
+                         if isinstance(child, BurstNode))
+            if node.top is None:
+                continue
+
+            size += sys.getsizeof(node.top)
+            for pair in node.top:
+                if id(pair) not in seen:
+                    seen.add(id(pair))
+                    size += sys.getsizeof(pair)
+
+        return size
@@ -0,0 +1,282 @@
+"""Cached autocompleter
+
+=== Module description ===
+This file contains CachedAutocompleter, an Autocompleter that keeps the most
+recently used autocomplete results of another Autocompleter.
+
+Results are cached by (prefix, limit). Inserting a value only changes the
+results of the prefixes of its prefix sequence, and removing values only
+changes the results of the prefixes of the removed prefix and of the prefixes
+it starts, so only those results are dropped from the cache. The cached
+prefixes are indexed by each of their own prefixes, so they are found without
+going through the whole cache.
+
+Freezing a CachedAutocompleter freezes the Autocompleter it caches, and the
+frozen copy is cached in turn, so an engine with a cache can be frozen and
+saved like one without.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .prefix_tree import Autocompleter, Substitution
+
+
+class CachedAutocompleter(Autocompleter):
+    """An Autocompleter caching the results of another Autocompleter in a
+    bounded least recently used cache.
+
+    === Attributes ===
+    autocompleter:
+        The Autocompleter whose results are cached.
+    size:
+        The largest number of results cached.
+    """
+    autocompleter: Autocompleter
+    size: int
+
+    # === Private Attributes ===
+    # The cached results by (prefix, limit), least recently used first
+    _results: OrderedDict
+    # The limits of the cached results of each prefix
+    _limits: Dict[Tuple, Set[Optional[int]]]
+    # The cached prefixes starting with each shorter prefix
+    _extensions: Dict[Tuple, Set[Tuple]]
+    # The number of autocomplete calls answered from and not from the cache,
+    # of results evicted to make room for others, and of results dropped
+    # because values were inserted or removed
+    _hits: int
+    _misses: int
+    _evictions: int
+    _invalidations: int
+
+    def __init__(self, autocompleter: Autocompleter, size: int = 1024) -> None:
+        """Initialize an empty cache of at most <size> results of the given
+        Autocompleter.
+
+        Precondition: size > 0
+        """
+        self.autocompleter = autocompleter
+        self.size = size
+        self._results = OrderedDict()
+        self._limits = {}
+        self._extensions = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        return len(self.autocompleter)
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value into the cached Autocompleter, and drop the
+        cached results of the prefixes of <prefix>.
+
+        See Autocompleter.insert.
+        """
+        self.autocompleter.insert(value, weight, prefix)
+        self._invalidate_prefixes(prefix)
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix from the cached
+        Autocompleter, and drop the cached results of the prefixes of
+        <prefix> and of the prefixes starting with it, which are found in the
+        index of the cached prefixes.
+        """
+        self.autocompleter.remove(prefix)
+
+        self._invalidate_prefixes(prefix)
+        for cached in list(self._extensions.get(tuple(prefix), ())):
+            self._invalidate(cached)
+
+    def increment(self, value: Any, delta: float) -> None:
+        """Add <delta> to the weight of the given value in the cached
+        Autocompleter, and drop the cached results of the prefixes of its
+        prefix sequence.
+
+        The prefix sequence is looked up with the prefix_of method of the
+        cached Autocompleter, so this raises a NotImplementedError, without
+        changing anything, for an Autocompleter that cannot look up the
+        prefix sequences of its values. See Autocompleter.increment.
+        """
+        prefix = self.autocompleter.prefix_of(value)
+        self.autocompleter.increment(value, delta)
+        self._invalidate_prefixes(prefix)
+
+    def remove_value(self, value: Any) -> None:
+        """Remove the given value from the cached Autocompleter, and drop the
+        cached results of the prefixes of its prefix sequence.
+
+        See CachedAutocompleter.increment.
+        """
+        prefix = self.autocompleter.prefix_of(value)
+        if prefix is not None:
+            self.autocompleter.remove_value(value)
+            self._invalidate_prefixes(prefix)
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix, from the cache
+        if they were already looked up.
+
+        See Autocompleter.autocomplete.
+        """
+        key = (tuple(prefix), limit)
+        result = self._results.get(key)
+        if result is not None:
+            self._hits += 1
+            self._results.move_to_end(key)
+            return list(result)
+
+        self._misses += 1
+        result = self.autocompleter.autocomplete(prefix, limit)
+        self._store(key, result)
+        return list(result)
+
+    def autocomplete_many(self, prefixes: Iterable[List],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[Any, float]]]:
+        """Return the autocomplete results of every prefix in <prefixes>, the
+        ones not cached being looked up together by the cached Autocompleter.
+
+        See Autocompleter.autocomplete_many.
+        """
+        prefixes = list(prefixes)
+        results = [None] * len(prefixes)
+        missed = []
+        for index, prefix in enumerate(prefixes):
+            key = (tuple(prefix), limit)
+            result = self._results.get(key)
+            if result is None:
+                missed.append(index)
+            else:
+                self._hits += 1
+                self._results.move_to_end(key)
+                results[index] = list(result)
+
+        found = self.autocompleter.autocomplete_many(
+            [prefixes[index] for index in missed], limit)
+        for index, result in zip(missed, found):
+            self._misses += 1
+            self._store((tuple(prefixes[index]), limit), result)
+            results[index] = list(result)
+
+        return results
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return the fuzzy matches of the given prefix from the cached
+        Autocompleter. They are not cached.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        return self.autocompleter.autocomplete_fuzzy(prefix, max_edits, limit,
+                                                     substitution, gap)
+
+    def warm(self, queries: Iterable[Tuple[List, Optional[int]]]) -> None:
+        """Cache the results of the given (prefix, limit) queries, such as
+        the queries recorded in a query log.
+        """
+        for prefix, limit in queries:
+            self.autocomplete(prefix, limit)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return the number of results cached ('size'), of autocomplete
+        calls answered from the cache ('hits') and not from the cache
+        ('misses'), of results evicted ('evictions') and of results dropped
+        by insert and remove ('invalidations').
+        """
+        return {
+            'size': len(self._results),
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'invalidations': self._invalidations
+        }
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the memory statistics of the cached Autocompleter, which do
+        not count the cached results.
+        """
+        return self.autocompleter.memory_stats()
+
+    def freeze(self) -> CachedAutocompleter:
+        """Return an empty cache of the same size of a read-only copy of the
+        cached Autocompleter.
+
+        See SimplePrefixTree.freeze.
+        """
+        return CachedAutocompleter(self.autocompleter.freeze(), self.size)
+
+    def save(self, path: str) -> None:
+        """Write the cached read-only Autocompleter to an index file at
+        <path>.
+
+        See FrozenPrefixTree.save.
+        """
+        self.autocompleter.save(path)
+
+    def close(self) -> None:
+        """Close the cached Autocompleter, such as a ShardedAutocompleter
+        stopping its worker processes.
+        """
+        self.autocompleter.close()
+
+    def _store(self, key: Tuple[Tuple, Optional[int]],
+               result: List[Tuple[Any, float]]) -> None:
+        """Cache <result> by <key>, evicting the least recently used result
+        if the cache is full.
+        """
+        self._results[key] = result
+        prefix = key[0]
+        if prefix not in self._limits:
+            self._limits[prefix] = set()
+            for length in range(len(prefix)):
+                self._extensions.setdefault(prefix[:length], set()).add(prefix)
+        self._limits[prefix].add(key[1])
+
+        # evict the least recently used result
+        if len(self._results) > self.size:
+            (old_prefix, old_limit), _ = self._results.popitem(last=False)
+            self._limits[old_prefix].discard(old_limit)
+            if not self._limits[old_prefix]:
+                self._forget(old_prefix)
+            self._evictions += 1
+
+    def _invalidate_prefixes(self, prefix: List) -> None:
+        """Drop every cached result of the prefixes of <prefix>, whose
+        results change when a value of <prefix> is inserted or changed.
+
+        Each prefix of <prefix> is looked up in the cache, so this takes time
+        linear in the length of <prefix>, whatever the number of cached
+        results.
+        """
+        if self._limits:
+            prefix = tuple(prefix)
+            for length in range(len(prefix) + 1):
+                if prefix[:length] in self._limits:
+                    self._invalidate(prefix[:length])
+
+    def _invalidate(self, prefix: Tuple) -> None:
+        """Drop every cached result of <prefix>.
+        """
+        for limit in self._limits[prefix]:
+            del self._results[(prefix, limit)]
+            self._invalidations += 1
+        self._forget(prefix)
+
+    def _forget(self, prefix: Tuple) -> None:
+        """Remove <prefix>, which has no cached results left, from the index
+        of the cached prefixes.
+        """
+        del self._limits[prefix]
+        for length in range(len(prefix)):
+            extensions = self._extensions[prefix[:length]]
+            extensions.discard(prefix)
+            if not extensions:
+                del self._extensions[prefix[:length]]
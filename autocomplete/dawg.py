@@ -0,0 +1,470 @@
+"""Minimized word automaton
+
+=== Module description ===
+This file contains DawgAutocompleter, a read-only Autocompleter for the
+letter engine, storing its strings in a minimized acyclic automaton (a DAWG)
+which shares their common suffixes as well as their common prefixes.
+
+The strings are numbered in sorted order. Every transition is labelled with
+the number of strings that sort before the strings through it among the
+strings of its state, so the numbers of the strings starting with a prefix
+are the contiguous range found by adding up the labels along the path of the
+prefix, and a string is spelled back from its number by following the
+transitions whose ranges contain it. The weights are stored in an array by
+string number, and the heaviest strings of a range are found with a segment
+tree of the heaviest string of every part of the array.
+
+The automaton is built one character per transition with the incremental
+algorithm for sorted strings of Daciuk et al. It is then stored in flat
+arrays rather than Python objects, with every chain of states that have a
+single transition and are reached by a single transition merged into one
+transition labelled with the characters of the chain, so that the long
+unshared ends of lines take a few bytes per character.
+"""
+from __future__ import annotations
+
+import heapq
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .prefix_tree import (Autocompleter, Substitution, fuzzy_step,
+                          unit_substitution)
+
+
+class DawgAutocompleter(Autocompleter):
+    """A read-only Autocompleter storing strings in a minimized automaton.
+
+    Every value is the string spelled by its prefix sequence of characters,
+    as in the letter engine. State 0 is the start state, and the transitions
+    of state i are the ones from first_edges[i] to first_edges[i + 1] - 1,
+    sorted by their first character.
+
+    === Attributes ===
+    weight_type:
+        The type of weight used to aggregate the weights of the values,
+        'sum' or 'average'.
+    first_edges:
+        The index of the first transition of each state, followed by the
+        number of transitions.
+    firsts:
+        The first character of the label of each transition.
+    labels:
+        The labels of the transitions, one after the other.
+    label_starts:
+        The index in <labels> of the label of each transition, followed by
+        the length of <labels>.
+    targets:
+        The state each transition leads to.
+    offsets:
+        The number of strings of the state of each transition that sort
+        before the strings through it.
+    counts:
+        The number of strings spelled from each state.
+    finals:
+        1 for the states where a string ends, and 0 for the others.
+    weights:
+        The weight of each string, by string number.
+    """
+    weight_type: str
+    first_edges: array
+    firsts: str
+    labels: str
+    label_starts: array
+    targets: array
+    offsets: array
+    counts: array
+    finals: bytearray
+    weights: array
+
+    # === Private Attributes ===
+    # The number of the heaviest string of every part of the weights, as a
+    # segment tree: entry i + n is string i, and entry i is the heavier of
+    # entries 2i and 2i + 1
+    _best: array
+
+    def __init__(self, weight_type: str,
+                 items: Iterable[Tuple[str, float, List[str]]]) -> None:
+        """Compile the given (value, weight, prefix) items, adding up the
+        weights of equal strings.
+
+        Raise ValueError if a value is not the string spelled by its prefix
+        sequence of characters.
+        """
+        self.weight_type = weight_type
+
+        totals = {}
+        for value, weight, prefix in items:
+            if not isinstance(value, str) or len(value) != len(prefix) or \
+                    value != ''.join(prefix):
+                raise ValueError(f'{value!r} is not spelled by its prefix')
+            totals[value] = totals.get(value, 0.0) + weight
+
+        strings = sorted(totals)
+        self.weights = array('d', (totals[string] for string in strings))
+        self.compile(*build_automaton(strings))
+        self.build_best()
+
+    @classmethod
+    def from_items(cls, weight_type: str,
+                   items: Iterable[Tuple[str, float, List[str]]],
+                   top_k: Optional[int] = None) -> DawgAutocompleter:
+        """Return an automaton storing every (value, weight, prefix) item.
+
+        <top_k> is accepted like by the prefix trees, but is not needed,
+        since the heaviest strings of every prefix are found in the segment
+        tree.
+        """
+        return cls(weight_type, items)
+
+    def compile(self, start: int, first_edges: array, chars: str,
+                targets: array, finals: bytearray, counts: array) -> None:
+        """Store the automaton returned by build_automaton, merging its
+        chains of states and numbering the remaining states in breadth-first
+        order from <start>.
+        """
+        # the number of transitions reaching each state, up to 2
+        in_degrees = bytearray(len(counts))
+        for target in targets:
+            if in_degrees[target] < 2:
+                in_degrees[target] += 1
+
+        def merged(state: int) -> bool:
+            return not finals[state] and in_degrees[state] == 1 and \
+                first_edges[state + 1] - first_edges[state] == 1
+
+        numbers = {start: 0}
+        order = [start]
+        self.first_edges = array('i')
+        firsts = []
+        labels = []
+        self.label_starts = array('i')
+        self.targets = array('i')
+        self.offsets = array('i')
+        self.counts = array('i')
+        self.finals = bytearray()
+        length = 0
+        for state in order:
+            self.first_edges.append(len(self.targets))
+            self.counts.append(counts[state])
+            self.finals.append(finals[state])
+
+            offset = finals[state]
+            for edge in range(first_edges[state], first_edges[state + 1]):
+                firsts.append(chars[edge])
+                self.label_starts.append(length)
+                target = targets[edge]
+                labels.append(chars[edge])
+                while merged(target):
+                    labels.append(chars[first_edges[target]])
+                    target = targets[first_edges[target]]
+                length = len(labels)
+
+                if target not in numbers:
+                    numbers[target] = len(order)
+                    order.append(target)
+                self.targets.append(numbers[target])
+                self.offsets.append(offset)
+                offset += counts[target]
+        self.first_edges.append(len(self.targets))
+        self.label_starts.append(length)
+
+        self.firsts = ''.join(firsts)
+        self.labels = ''.join(labels)
+
+    def build_best(self) -> None:
+        """Build the segment tree of the heaviest strings."""
+        size = len(self.weights)
+        best = array('i', [0]) * size + array('i', range(size))
+        for index in range(size - 1, 0, -1):
+            best[index] = self.heavier(best[2 * index], best[2 * index + 1])
+        self._best = best
+
+    def heavier(self, first: int, second: int) -> int:
+        """Return the number of the heavier of two strings, or of the one
+        sorting first if they weigh the same.
+        """
+        if self.weights[second] > self.weights[first] or \
+                (self.weights[second] == self.weights[first]
+                 and second < first):
+            return second
+        return first
+
+    def heaviest(self, start: int, end: int) -> int:
+        """Return the number of the heaviest string from <start> to
+        <end> - 1.
+
+        Precondition: start < end
+        """
+        size = len(self.weights)
+        result = start
+        start += size
+        end += size
+        while start < end:
+            if start & 1:
+                result = self.heavier(result, self._best[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                result = self.heavier(result, self._best[end])
+            start >>= 1
+            end >>= 1
+        return result
+
+    def __len__(self) -> int:
+        """Return the number of strings stored in this automaton."""
+        return len(self.weights)
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """An automaton cannot be changed.
+        """
+        raise NotImplementedError('DawgAutocompleter is read-only')
+
+    def remove(self, prefix: List) -> None:
+        """An automaton cannot be changed.
+        """
+        raise NotImplementedError('DawgAutocompleter is read-only')
+
+    def increment(self, value: Any, delta: float) -> None:
+        """An automaton cannot be changed.
+        """
+        raise NotImplementedError('DawgAutocompleter is read-only')
+
+    def remove_value(self, value: Any) -> None:
+        """An automaton cannot be changed.
+        """
+        raise NotImplementedError('DawgAutocompleter is read-only')
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix.
+
+        The return value is a list of tuples (value, weight), and must be
+        ordered in non-increasing weight. Strings of equal weight are
+        returned in sorted order, which is not always the order the prefix
+        trees return them in.
+
+        If limit is None, return *every* match for the given prefix.
+
+        Precondition: limit is None or limit > 0.
+        """
+        found = self.find_range(prefix)
+        if found is None:
+            return []
+        start, end = found
+
+        if limit is None or limit >= end - start:
+            numbers = sorted(range(start, end),
+                             key=lambda number: -self.weights[number])
+        else:
+            # split the range around its heaviest string, heaviest first
+            numbers = []
+            best = self.heaviest(start, end)
+            heap = [(-self.weights[best], best, start, end)]
+            while heap and len(numbers) < limit:
+                _, best, start, end = heapq.heappop(heap)
+                numbers.append(best)
+                for part_start, part_end in [(start, best), (best + 1, end)]:
+                    if part_start < part_end:
+                        part_best = self.heaviest(part_start, part_end)
+                        heapq.heappush(heap, (-self.weights[part_best],
+                                              part_best, part_start,
+                                              part_end))
+
+        return [(self.spell(number), self.weights[number])
+                for number in numbers]
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order, and strings of
+        equal weight in sorted order.
+
+        The paths from the start state are searched best-first by the
+        heaviest string of their range, keeping the last row of the edit
+        distance table between the given prefix and the characters of the
+        path. Once a path matches, every string of its range matches, and
+        the range is split around its heaviest string as in autocomplete.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        if not self.weights:
+            return []
+        if substitution is None:
+            substitution = unit_substitution
+        if limit is None:
+            limit = len(self)
+
+        result = []
+        # (negated weight of the heaviest string of the range, its number,
+        # start and end of the range, and the state at the end of the path
+        # with its row if the path does not match yet)
+        heap = []
+
+        def push(start: int, end: int, state: Optional[int] = None,
+                 row: Optional[List[float]] = None) -> None:
+            if start < end:
+                best = self.heaviest(start, end)
+                heapq.heappush(heap, (-self.weights[best], best, start, end,
+                                      state, row))
+
+        row = [0.0] + [gap * length for length in range(1, len(prefix) + 1)]
+        if row[-1] <= max_edits:
+            push(0, len(self))
+        else:
+            push(0, len(self), 0, row)
+
+        while heap and len(result) < limit:
+            _, best, start, end, state, row = heapq.heappop(heap)
+            if row is None:
+                result.append((self.spell(best), self.weights[best]))
+                push(start, best)
+                push(best + 1, end)
+                continue
+
+            # the string ending at the state is shorter than every match
+            for edge in range(self.first_edges[state],
+                              self.first_edges[state + 1]):
+                label = self.labels[self.label_starts[edge]:
+                                    self.label_starts[edge + 1]]
+                step = fuzzy_step(row, label, prefix, max_edits,
+                                  substitution, gap)
+                if step is None:
+                    continue
+
+                target = self.targets[edge]
+                edge_start = start + self.offsets[edge]
+                edge_end = edge_start + self.counts[target]
+                if step[1]:
+                    push(edge_start, edge_end)
+                else:
+                    push(edge_start, edge_end, target, step[0])
+
+        return result
+
+    def find_range(self, prefix: List) -> Optional[Tuple[int, int]]:
+        """Return the range of the numbers of the strings starting with
+        <prefix>, or None if there is none.
+        """
+        if not all(isinstance(char, str) and len(char) == 1
+                   for char in prefix):
+            return None
+        text = ''.join(prefix)
+
+        state = 0
+        start = 0
+        depth = 0
+        while depth < len(text):
+            edge = self.firsts.find(text[depth], self.first_edges[state],
+                                    self.first_edges[state + 1])
+            if edge < 0:
+                return None
+            label = self.labels[self.label_starts[edge]:
+                                self.label_starts[edge + 1]]
+            # the prefix may end inside the label
+            if text[depth:depth + len(label)] != label[:len(text) - depth]:
+                return None
+            start += self.offsets[edge]
+            state = self.targets[edge]
+            depth += len(label)
+
+        if self.counts[state] == 0:
+            return None
+        return start, start + self.counts[state]
+
+    def spell(self, number: int) -> str:
+        """Return the string with the given number."""
+        labels = []
+        state = 0
+        while not (self.finals[state] and number == 0):
+            edge = bisect_right(self.offsets, number,
+                                self.first_edges[state],
+                                self.first_edges[state + 1]) - 1
+            labels.append(self.labels[self.label_starts[edge]:
+                                      self.label_starts[edge + 1]])
+            number -= self.offsets[edge]
+            state = self.targets[edge]
+
+        return ''.join(labels)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the number of states ('nodes') and strings ('leaves') of
+        this automaton, and the number of bytes used by its arrays
+        ('bytes').
+        """
+        arrays = [self.first_edges, self.firsts, self.labels,
+                  self.label_starts, self.targets, self.offsets, self.counts,
+                  self.finals, self.weights, self._best]
+        return {
+            'nodes': len(self.counts),
+            'leaves': len(self.weights),
+            'bytes': sum(map(sys.getsizeof, arrays))
+        }
+
+
+def build_automaton(strings: List[str]
+                    ) -> Tuple[int, array, str, array, bytearray, array]:
+    """Return the minimized automaton spelling the sorted <strings>, with a
+    character per transition.
+
+    The automaton is returned as its start state, the index of the first
+    transition of each state followed by the number of transitions, the
+    character and target of each transition, whether each state is final,
+    and the number of strings spelled from each state.
+
+    Each string is added to the states of the previous one it shares a
+    prefix with. The states of the previous string after that prefix are
+    then final, so they are replaced by an equal registered state, or
+    registered themselves, from the last one up.
+    """
+    register = {}
+    first_edges = array('i')
+    chars = []
+    targets = array('i')
+    finals = bytearray()
+    counts = array('i')
+
+    def register_state(key: Tuple) -> int:
+        # a key is whether the state is final, followed by the character and
+        # target of each of its transitions
+        number = register.get(key)
+        if number is None:
+            number = register[key] = len(counts)
+            first_edges.append(len(targets))
+            finals.append(key[0])
+            count = key[0]
+            for index in range(1, len(key), 2):
+                chars.append(key[index])
+                targets.append(key[index + 1])
+                count += counts[key[index + 1]]
+            counts.append(count)
+        return number
+
+    # the key of the state after each prefix of the last string added, with
+    # the transitions registered so far
+    path = [[False]]
+    previous = ''
+
+    def minimize(depth: int) -> None:
+        while len(path) > depth + 1:
+            number = register_state(tuple(path.pop()))
+            path[-1] += (previous[len(path) - 1], number)
+
+    for string in strings:
+        common = 0
+        while common < min(len(string), len(previous)) and \
+                string[common] == previous[common]:
+            common += 1
+        minimize(common)
+
+        path.extend([False] for _ in string[common:])
+        path[-1][0] = True
+        previous = string
+
+    minimize(0)
+    start = register_state(tuple(path[0]))
+    first_edges.append(len(targets))
+    return start, first_edges, ''.join(chars), targets, finals, counts
@@ -0,0 +1,638 @@
+"""Disk autocompleter
+
+=== Module description ===
+This file contains DiskAutocompleter, an Autocompleter whose values are
+stored in a single-file SQLite database instead of in memory, so that it is
+not limited by the memory of the process.
+
+Every value is a row of the leaves table, with its weight and the key of
+its prefix sequence, which is the code of each prefix element, one after
+the other. No code is the start of another, so the values matching a
+prefix are exactly the rows whose keys start with the key of the prefix,
+which sort together in the index of the keys. A query is then a single
+range query read by SQLite, and removing a prefix a single range delete,
+instead of a walk down a tree of rows one SELECT at a time.
+
+A range query reads and sorts every value matching its prefix, so the ids
+of the top_k heaviest values of every prefix matching more than top_k
+values are also stored, in the tops table, and kept up to date by every
+change. A query with a limit of at most top_k reads the ids of its prefix
+and then only those values, and the values of the most recently used
+prefixes are kept in memory, so that the hot prefixes of a skewed workload
+are answered without reading the database.
+
+Strings are coded as their length and UTF-8 bytes, and the other prefix
+elements and the values are stored pickled, so they are equal when their
+pickles are.
+"""
+from __future__ import annotations
+
+import heapq
+import io
+import pickle
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .prefix_tree import (Autocompleter, Substitution, fuzzy_step,
+                          unit_substitution)
+
+# The pickle protocol of the stored prefix elements and values
+PICKLE_PROTOCOL = 4
+
+# The first byte of the code of a string and of a pickled prefix element,
+# which starts with the PROTO opcode
+STRING_CODE = b'\x01'
+PICKLE_CODE = b'\x80'
+
+# The number of heaviest values stored for every prefix, and the number of
+# prefixes whose heaviest values are kept in memory, by default
+TOP_K = 10
+CACHE_SIZE = 1024
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leaves (
+    id INTEGER PRIMARY KEY,
+    prefix BLOB NOT NULL,
+    value BLOB NOT NULL,
+    weight REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prefix_leaves ON leaves (prefix);
+CREATE UNIQUE INDEX IF NOT EXISTS value_leaves ON leaves (value);
+CREATE TABLE IF NOT EXISTS tops (
+    prefix BLOB PRIMARY KEY,
+    leaves BLOB NOT NULL
+) WITHOUT ROWID;
+'''
+
+# Add the weight of a value to the weight it is already stored with, if any
+STORE_LEAF = '''
+INSERT INTO leaves (prefix, value, weight) VALUES (?, ?, ?)
+ON CONFLICT (value) DO UPDATE SET weight = weight + excluded.weight
+'''
+
+
+class DiskAutocompleter(Autocompleter):
+    """An Autocompleter storing its values in a SQLite database.
+
+    Every change is committed when it returns. The database is closed by
+    close, or when the DiskAutocompleter is used as a context manager and the
+    block ends. The connection is used by one thread at a time, so a
+    DiskAutocompleter can be shared by the threads of a server.
+
+    === Attributes ===
+    weight_type:
+        The type of weight used to aggregate the weights of the values,
+        'sum' or 'average'.
+    path:
+        The path of the database file, or '' for a temporary database
+        deleted when it is closed.
+    top_k:
+        The number of heaviest values stored for every prefix matching more
+        values.
+    """
+    weight_type: str
+    path: str
+    top_k: int
+
+    # === Private Attributes ===
+    # The connection to the database
+    _connection: sqlite3.Connection
+    # Held while the connection or the cache is used
+    _lock: threading.Lock
+    # The heaviest (value, weight) pairs of the most recently used prefixes
+    # stored in the tops table, by key, least recently used first
+    _cache: OrderedDict
+    # The largest number of prefixes in the cache
+    _cache_size: int
+
+    def __init__(self, weight_type: str, path: str = '', top_k: int = TOP_K,
+                 cache_size: int = CACHE_SIZE) -> None:
+        """Initialize an autocompleter storing its values in the database at
+        <path>, created if it does not exist, and keeping the heaviest values
+        of up to <cache_size> prefixes in memory.
+
+        The values already stored in the database are kept, and their
+        heaviest values stored again if they were stored for another top_k.
+        Raise ValueError if they were stored with another weight type.
+
+        Preconditions:
+            weight_type == 'sum' or weight_type == 'average'
+            top_k > 0 and cache_size >= 0
+        """
+        self.weight_type = weight_type
+        self.path = path
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+            self._connection.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('weight_type', ?)",
+                (weight_type,))
+        meta = dict(self._connection.execute('SELECT key, value FROM meta'))
+        if meta['weight_type'] != weight_type:
+            self._connection.close()
+            raise ValueError(f"{path} stores {meta['weight_type']!r} "
+                             f"weights, not {weight_type!r}")
+        if meta.get('top_k') != str(top_k):
+            with self._connection:
+                self.store_tops()
+
+    @classmethod
+    def from_items(cls, weight_type: str,
+                   items: Iterable[Tuple[Any, float, List]],
+                   path: str = '', top_k: int = TOP_K,
+                   cache_size: int = CACHE_SIZE) -> DiskAutocompleter:
+        """Return a new autocompleter storing every (value, weight, prefix)
+        item in the database at <path>, in a single transaction.
+
+        The heaviest values of the prefixes are stored once all the items
+        are, by store_tops.
+
+        Precondition: the items satisfy the preconditions of insert.
+        """
+        autocompleter = cls(weight_type, path, top_k, cache_size)
+        with autocompleter._lock, autocompleter._connection:
+            autocompleter._connection.executemany(
+                STORE_LEAF,
+                ((encode_prefix(prefix),
+                  pickle.dumps(value, PICKLE_PROTOCOL), weight)
+                 for value, weight, prefix in items))
+            autocompleter.store_tops()
+
+        return autocompleter
+
+    def __enter__(self) -> DiskAutocompleter:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the database. A temporary database is deleted.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM leaves').fetchone()[0]
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value into this Autocompleter, and update the
+        heaviest values of the prefixes of <prefix>.
+
+        See Autocompleter.insert.
+        """
+        with self._lock, self._connection:
+            # a value already inserted keeps the key it was inserted with
+            leaf, key = self._connection.execute(
+                STORE_LEAF + 'RETURNING id, prefix',
+                (encode_prefix(prefix), pickle.dumps(value, PICKLE_PROTOCOL),
+                 weight)).fetchone()
+            self._update_tops(key, leaf)
+
+    def increment(self, value: Any, delta: float) -> None:
+        """Add <delta> to the weight of the given value, and update the
+        heaviest values of the prefixes of its prefix sequence.
+
+        See Autocompleter.increment.
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'UPDATE leaves SET weight = weight + ? WHERE value = ? '
+                'RETURNING id, prefix',
+                (delta, pickle.dumps(value, PICKLE_PROTOCOL))).fetchone()
+            if row is None:
+                raise KeyError(value)
+            self._update_tops(row[1], row[0])
+
+    def remove_value(self, value: Any) -> None:
+        """Remove the given value, if it is in this Autocompleter, and update
+        the heaviest values of the prefixes of its prefix sequence.
+
+        See Autocompleter.remove_value.
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'DELETE FROM leaves WHERE value = ? RETURNING prefix',
+                (pickle.dumps(value, PICKLE_PROTOCOL),)).fetchone()
+            if row is not None:
+                self._refresh_tops(prefix_keys(row[0])[::-1])
+
+    def prefix_of(self, value: Any) -> Optional[List]:
+        """Return the prefix sequence the given value was inserted with, or
+        None if it is not in this Autocompleter.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT prefix FROM leaves WHERE value = ?',
+                (pickle.dumps(value, PICKLE_PROTOCOL),)).fetchone()
+        return None if row is None else decode_prefix(row[0])
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix.
+
+        With a limit of at most top_k, the values are the stored heaviest
+        values of the prefix if it has more. Otherwise, they are read by a
+        single range query of the keys starting with the key of <prefix>.
+        Either way, values of equal weight are in the order of their keys
+        and then of their insertion.
+
+        See Autocompleter.autocomplete.
+        """
+        key = encode_prefix(prefix)
+        with self._lock:
+            if limit is not None and limit <= self.top_k:
+                top = self._top(key)
+                if top is not None:
+                    return top[:limit]
+            rows = self._range(key, 'value, weight', limit)
+        return [(pickle.loads(value), weight) for value, weight in rows]
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order.
+
+        The prefixes of the stored keys are walked down like the trees of a
+        prefix tree, the children of a prefix being found by a seek of the
+        index of the keys each, and a prefix being left out with all the
+        keys starting with it as soon as it is too far from <prefix>. The
+        values of the matching prefixes are then read as by autocomplete.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        if substitution is None:
+            substitution = unit_substitution
+
+        row = [0.0] + [gap * length for length in range(1, len(prefix) + 1)]
+        if row[-1] <= max_edits:
+            return self.autocomplete([], limit)
+
+        with self._lock:
+            matched = []
+            stack = [(b'', row)]
+            while stack:
+                key, row = stack.pop()
+                for child in self._children(key):
+                    step = fuzzy_step(row, [decode_element(child, len(key))],
+                                      prefix, max_edits, substitution, gap)
+                    if step is None:
+                        continue
+                    if step[1]:
+                        matched.append(child)
+                    else:
+                        stack.append((child, step[0]))
+
+            # the matching prefixes start disjoint ranges of keys, so their
+            # values are ordered by weight, prefix and then their order
+            candidates = []
+            for key in matched:
+                top = None
+                if limit is not None and limit <= self.top_k:
+                    top = self._top(key)
+                if top is None:
+                    top = [(pickle.loads(value), weight) for value, weight
+                           in self._range(key, 'value, weight', limit)]
+                candidates.extend((-weight, key, index, value)
+                                  for index, (value, weight)
+                                  in enumerate(top[:limit]))
+
+        candidates.sort(key=lambda candidate: candidate[:3])
+        return [(value, -weight) for weight, _, _, value
+                in candidates[:limit]]
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix, with a single range
+        delete, and update the heaviest values of the prefixes of <prefix>.
+        """
+        key = encode_prefix(prefix)
+        where, parameters = key_condition(key)
+        with self._lock, self._connection:
+            self._connection.execute(f'DELETE FROM leaves WHERE {where}',
+                                     parameters)
+            self._connection.execute(f'DELETE FROM tops WHERE {where}',
+                                     parameters)
+            for cached in [cached for cached in self._cache
+                           if cached.startswith(key)]:
+                del self._cache[cached]
+            self._refresh_tops(prefix_keys(key)[-2::-1])
+
+    def store_tops(self) -> None:
+        """Store the ids of the top_k heaviest values of every prefix that
+        matches more values, replacing the stored ones.
+
+        The leaves are read once in the order of their keys, keeping the
+        heaviest values of each prefix of the current key, so only those of
+        the prefixes of one key are in memory at a time.
+        """
+        connection = self._connection
+        connection.execute('DELETE FROM tops')
+        self._cache.clear()
+
+        # the [key, count, heap of (weight, -order, id)] of each prefix of
+        # the current key, shortest first
+        stack = []
+
+        def pop() -> None:
+            key, count, heap = stack.pop()
+            if count > self.top_k:
+                heap.sort(reverse=True)
+                connection.execute('INSERT INTO tops VALUES (?, ?)', (
+                    key, array('q', [leaf for _, _, leaf in heap]).tobytes()))
+
+        for order, (leaf, key, weight) in enumerate(connection.execute(
+                'SELECT id, prefix, weight FROM leaves ORDER BY prefix, id')):
+            while stack and not key.startswith(stack[-1][0]):
+                pop()
+            if not stack:
+                stack.append([b'', 0, []])
+            for end in element_ends(key, len(stack[-1][0])):
+                stack.append([key[:end], 0, []])
+
+            item = (weight, -order, leaf)
+            for entry in stack:
+                entry[1] += 1
+                heap = entry[2]
+                if len(heap) < self.top_k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        while stack:
+            pop()
+
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('top_k', ?)",
+                           (str(self.top_k),))
+
+    def _top(self, key: bytes) -> Optional[List[Tuple[Any, float]]]:
+        """Return the stored heaviest (value, weight) pairs of the prefix with
+        <key>, from the cache if they are in it, or None if the prefix
+        matches at most top_k values.
+        """
+        top = self._cache.get(key)
+        if top is not None:
+            self._cache.move_to_end(key)
+            return top
+
+        leaves = self._stored_top(key)
+        if leaves is None:
+            return None
+        rows = self._leaves(leaves, 'value, weight')
+        top = [(pickle.loads(rows[leaf][0]), rows[leaf][1])
+               for leaf in leaves]
+        if self._cache_size:
+            self._cache[key] = top
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return top
+
+    def _stored_top(self, key: bytes) -> Optional[List[int]]:
+        """Return the ids stored in the tops table for the prefix with <key>,
+        or None if there are none.
+        """
+        row = self._connection.execute(
+            'SELECT leaves FROM tops WHERE prefix = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return array('q', row[0]).tolist()
+
+    def _store_top(self, key: bytes, leaves: List[int]) -> None:
+        """Store <leaves> as the ids of the heaviest values of the prefix
+        with <key>, or remove its ids if there are none.
+        """
+        self._cache.pop(key, None)
+        if leaves:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO tops VALUES (?, ?)',
+                (key, array('q', leaves).tobytes()))
+        else:
+            self._connection.execute('DELETE FROM tops WHERE prefix = ?',
+                                     (key,))
+
+    def _update_tops(self, key: bytes, leaf: int) -> None:
+        """Update the heaviest values of every prefix of <key> after the
+        weight of the value with id <leaf> and key <key> was increased.
+
+        A prefix whose ids are not stored matched at most top_k values
+        before, so at most top_k + 1 values are read to find out whether
+        they are stored now.
+        """
+        for prefix in prefix_keys(key):
+            leaves = self._stored_top(prefix)
+            if leaves is not None:
+                if leaf not in leaves:
+                    leaves.append(leaf)
+                self._store_top(prefix, self._rank(leaves)[:self.top_k])
+                continue
+
+            leaves = [row[0] for row in self._range(prefix, 'id',
+                                                    self.top_k + 1)]
+            if len(leaves) > self.top_k:
+                self._store_top(prefix, leaves[:self.top_k])
+
+    def _refresh_tops(self, keys: List[bytes]) -> None:
+        """Store again the heaviest values of the prefixes with <keys>, longest
+        first, whose stored heaviest values were removed.
+
+        The heaviest values of a prefix are the heaviest of the values stored
+        under it and of the heaviest values of its children, so each prefix
+        only reads the stored ids, or at most top_k values, of its children.
+        """
+        for key in keys:
+            leaves = self._stored_top(key)
+            if leaves is None or len(self._leaves(leaves, 'id')) == \
+                    len(leaves):
+                continue
+
+            leaves = [row[0] for row in self._connection.execute(
+                'SELECT id FROM leaves WHERE prefix = ? '
+                'ORDER BY weight DESC, id LIMIT ?', (key, self.top_k))]
+            for child in self._children(key):
+                top = self._stored_top(child)
+                if top is None:
+                    top = [row[0] for row in self._range(child, 'id',
+                                                         self.top_k)]
+                leaves.extend(top)
+            self._store_top(key, self._rank(leaves)[:self.top_k])
+
+    def _rank(self, leaves: List[int]) -> List[int]:
+        """Return the ids <leaves> of stored values, heaviest first, and
+        values of equal weight in the order of their keys and then of their
+        insertion.
+        """
+        rows = self._leaves(leaves, 'prefix, weight')
+        return sorted(rows, key=lambda leaf: (-rows[leaf][1], rows[leaf][0],
+                                              leaf))
+
+    def _leaves(self, leaves: List[int],
+                columns: str) -> Dict[int, Tuple[Any, ...]]:
+        """Return the given <columns> of the stored values with ids <leaves>,
+        by id.
+        """
+        marks = ', '.join('?' * len(leaves))
+        return {row[0]: row[1:] for row in self._connection.execute(
+            f'SELECT id, {columns} FROM leaves WHERE id IN ({marks})',
+            leaves)}
+
+    def _range(self, key: bytes, columns: str,
+               limit: Optional[int]) -> List[Tuple[Any, ...]]:
+        """Return the given <columns> of up to <limit> of the values whose
+        keys start with <key>, heaviest first, and values of equal weight in
+        the order of their keys and then of their insertion.
+        """
+        where, parameters = key_condition(key)
+        query = f'SELECT {columns} FROM leaves WHERE {where} ' \
+                f'ORDER BY weight DESC, prefix, id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters += (limit,)
+        return self._connection.execute(query, parameters).fetchall()
+
+    def _children(self, key: bytes) -> Iterator[bytes]:
+        """Yield the keys of the prefixes one element longer than the prefix
+        with <key> that start stored keys, in order.
+
+        Each child is found by a seek of the index of the keys, to the first
+        key after <key> and then to the first key after the keys starting
+        with the previous child.
+        """
+        where, parameters = key_condition(key)
+        condition, bound = 'prefix > ?', key
+        while True:
+            row = self._connection.execute(
+                f'SELECT prefix FROM leaves WHERE {where} AND {condition} '
+                f'ORDER BY prefix LIMIT 1', parameters + (bound,)).fetchone()
+            if row is None:
+                return
+
+            child = row[0][:next(element_ends(row[0], len(key)))]
+            yield child
+            bound = key_end(child)
+            if bound is None:
+                return
+            condition = 'prefix >= ?'
+
+
+def encode_prefix(prefix: Iterable) -> bytes:
+    """Return the key of the prefix sequence <prefix>.
+
+    A string is coded as STRING_CODE, its length in UTF-8 bytes in base 128
+    with the high bit set on every byte but the last, and its UTF-8 bytes.
+    Any other element is pickled, which starts with PICKLE_CODE and ends
+    with the STOP opcode the unpickler stops at.
+    """
+    codes = []
+    for element in prefix:
+        if isinstance(element, str):
+            data = element.encode('utf-8', 'surrogatepass')
+            length = len(data)
+            codes.append(STRING_CODE)
+            while length >= 0x80:
+                codes.append(bytes([length & 0x7f | 0x80]))
+                length >>= 7
+            codes.append(bytes([length]))
+            codes.append(data)
+        else:
+            codes.append(pickle.dumps(element, PICKLE_PROTOCOL))
+    return b''.join(codes)
+
+
+def element_ends(key: bytes, start: int = 0) -> Iterator[int]:
+    """Yield the index in <key> after the code of each prefix element coded
+    from index <start>, as encoded by encode_prefix.
+
+    Precondition: <start> is 0 or the end of the code of an element.
+    """
+    while start < len(key):
+        if key[start] != STRING_CODE[0]:
+            stream = io.BytesIO(key)
+            stream.seek(start)
+            pickle.load(stream)
+            start = stream.tell()
+        else:
+            start += 1
+            length = 0
+            shift = 0
+            while True:
+                byte = key[start]
+                start += 1
+                length |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            start += length
+        yield start
+
+
+def decode_element(key: bytes, start: int) -> Any:
+    """Return the prefix element coded from index <start> of <key>, as
+    encoded by encode_prefix.
+    """
+    end = next(element_ends(key, start))
+    if key[start] != STRING_CODE[0]:
+        return pickle.loads(key[start:end])
+
+    start += 1
+    while key[start] >= 0x80:
+        start += 1
+    return key[start + 1:end].decode('utf-8', 'surrogatepass')
+
+
+def decode_prefix(key: bytes) -> List:
+    """Return the prefix sequence whose key is <key>, as encoded by
+    encode_prefix.
+    """
+    prefix = []
+    start = 0
+    for end in element_ends(key):
+        prefix.append(decode_element(key, start))
+        start = end
+    return prefix
+
+
+def prefix_keys(key: bytes) -> List[bytes]:
+    """Return the keys of the prefixes of the prefix sequence with <key>,
+    shortest first, from the empty prefix to <key> itself.
+    """
+    return [b''] + [key[:end] for end in element_ends(key)]
+
+
+def key_end(key: bytes) -> Optional[bytes]:
+    """Return the smallest key after every key starting with <key>, or None
+    if there is none.
+
+    This is <key> with its last byte that is not 0xff increased by one.
+    """
+    stripped = key.rstrip(b'\xff')
+    if not stripped:
+        return None
+    return stripped[:-1] + bytes([stripped[-1] + 1])
+
+
+def key_condition(key: bytes) -> Tuple[str, tuple]:
+    """Return the condition on the keys of the leaves and tops tables that
+    start with <key>, and its parameters.
+    """
+    end = key_end(key)
+    if end is None:
+        return 'prefix >= ?', (key,)
+    return 'prefix >= ? AND prefix < ?', (key, end)
@@ -7,12 +7,350 @@ you are writing for this assignment.
 from __future__ import annotations
 
 import csv
-from typing import Any, Dict, List, Optional, Tuple
-
+import gc
+import hashlib
+import math
+import os
+import pickle
+from functools import lru_cache
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple)
+
+from .cache import CachedAutocompleter
+from .ingest import ProgressCallback, Source, read_lines
+from .intervals import IntervalIndex
 from .melody import Melody
 from .prefix_tree import SimplePrefixTree, CompressedPrefixTree, Autocompleter
 
 
+# The version of the snapshots saved in a cache directory. It is part of the
+# snapshot names, and changes whenever the items read by the engines or the
+# pickled trees change.
+SNAPSHOT_VERSION = 4
+
+
+################################################################################
+# Helpers
+################################################################################
+def build_autocompleter(
+        config: Dict[str, Any],
+        read_items: Callable[..., Iterable[Tuple[Any, float, List]]],
+        vocabulary: bool = False
+) -> Autocompleter:
+    """Return the Autocompleter specified by <config>, storing every
+    (value, weight, prefix) item read from config['file'] by <read_items>.
+
+    The prefix tree returned by build_tree is wrapped in a
+    CachedAutocompleter if <config> has a 'cache_size' key.
+    """
+    autocompleter = build_tree(config, read_items, vocabulary)
+    if config.get('cache_size'):
+        autocompleter = CachedAutocompleter(autocompleter,
+                                            config['cache_size'])
+
+    return autocompleter
+
+
+def build_tree(config: Dict[str, Any],
+               read_items: Callable[..., Iterable[Tuple[Any, float, List]]],
+               vocabulary: bool = False) -> Autocompleter:
+    """Return the prefix tree specified by <config>, storing every
+    (value, weight, prefix) item read from config['file'] by <read_items>.
+
+    The prefix tree is bulk loaded from the items as they are read, rather
+    than built by inserting them one at a time. If <config> has an 'index'
+    key, the read-only tree saved to that index file is loaded instead, and
+    no file is read. If it has a 'cache_dir' key, the tree is loaded from its
+    snapshot in that directory, which is saved after building the tree if
+    there is none. If it has a 'top_k' key, every tree of the prefix tree
+    keeps its 'top_k' heaviest values. If it has a 'workers' key, the tree is
+    built by that many processes. If it has a 'shards' key, the items are
+    stored by a ShardedAutocompleter with that many worker processes instead,
+    and there is no snapshot. If its 'autocompleter' is 'disk', the items are
+    stored by a DiskAutocompleter in the database at its 'disk_path', which
+    is opened instead of reading the file if it exists, storing the 'top_k'
+    heaviest values of its prefixes, and the other keys are not used.
+
+    If <vocabulary> is True, the prefix elements are words, which are stored
+    as their ids in a Vocabulary, and the prefix tree is wrapped in a
+    VocabularyAutocompleter translating the prefixes of queries. The trees
+    loaded from an index file and the DiskAutocompleters, whose files are
+    read without the vocabulary, store the words, and each worker of a
+    ShardedAutocompleter keeps the vocabulary of its own items.
+    """
+    if 'index' in config:
+        from .frozen import FrozenPrefixTree
+        return FrozenPrefixTree.load(config['index'])
+
+    if config['autocompleter'] == 'disk':
+        from .disk import TOP_K, DiskAutocompleter
+        path = config.get('disk_path', '')
+        top_k = config.get('top_k') or TOP_K
+        if path and os.path.exists(path):
+            return DiskAutocompleter(config['weight_type'], path, top_k)
+        return DiskAutocompleter.from_items(
+            config['weight_type'],
+            read_items(config['file'], config.get('progress')), path, top_k)
+
+    if config['autocompleter'] == 'simple':
+        tree_class = SimplePrefixTree
+    elif config['autocompleter'] == 'burst':
+        from .burst import BurstTrie
+        tree_class = BurstTrie
+    elif config['autocompleter'] == 'ternary':
+        from .ternary import TernarySearchTree
+        tree_class = TernarySearchTree
+    elif config['autocompleter'] == 'dawg':
+        from .dawg import DawgAutocompleter
+        tree_class = DawgAutocompleter
+    else:
+        tree_class = CompressedPrefixTree
+
+    if config.get('shards'):
+        from .sharded import ShardedAutocompleter
+        return ShardedAutocompleter.from_items(
+            tree_class, config['weight_type'],
+            read_items(config['file'], config.get('progress')),
+            config.get('top_k'), config['shards'], vocabulary)
+
+    # no cache, build the tree from the file
+    if config.get('cache_dir') is None:
+        return load_tree(config, tree_class, read_items, vocabulary)
+
+    path = os.path.join(config['cache_dir'],
+                        snapshot_name(config, read_items))
+    tree = load_snapshot(path)
+    if tree is None:
+        tree = load_tree(config, tree_class, read_items, vocabulary)
+        save_snapshot(tree, path)
+
+    return tree
+
+
+def load_tree(config: Dict[str, Any], tree_class: type,
+              read_items: Callable[..., Iterable[Tuple[Any, float, List]]],
+              vocabulary: bool = False) -> Autocompleter:
+    """Return a prefix tree of <tree_class> bulk loaded from the items read
+    from config['file'] by <read_items>, with the words of their prefixes
+    stored as ids if <vocabulary> is True, as in build_tree.
+
+    If <config> has a 'workers' key, the items are split by the first element
+    of their prefix sequences between that many processes, which each build
+    the subtrees of their items. Only the prefix trees grafting the subtrees
+    built by their bulk loader are built in parallel.
+    """
+    items, wrap = intern_words(
+        read_items(config['file'], config.get('progress')), vocabulary)
+    if config.get('workers', 1) == 1 or \
+            not issubclass(tree_class, SimplePrefixTree):
+        return wrap(tree_class.from_items(config['weight_type'], items,
+                                          config.get('top_k')))
+
+    from .parallel import from_items_parallel
+    return wrap(from_items_parallel(tree_class, config['weight_type'], items,
+                                    config.get('top_k'), config['workers']))
+
+
+def intern_words(items: Iterable[Tuple[Any, float, List]], vocabulary: bool
+                 ) -> Tuple[Iterable[Tuple[Any, float, List]],
+                            Callable[[Autocompleter], Autocompleter]]:
+    """Return the given items, and a function returning the Autocompleter
+    they are stored in.
+
+    If <vocabulary> is True, the words of the prefixes of the items are
+    interned in a new Vocabulary as the items are read, and the
+    Autocompleter is wrapped in a VocabularyAutocompleter with it.
+    """
+    if not vocabulary:
+        return items, lambda autocompleter: autocompleter
+
+    from .vocabulary import Vocabulary, VocabularyAutocompleter
+    words = Vocabulary()
+    return words.intern_items(items), \
+        lambda autocompleter: VocabularyAutocompleter(autocompleter, words)
+
+
+def snapshot_name(config: Dict[str, Any],
+                  read_items: Callable[..., Iterable]) -> str:
+    """Return the file name of the snapshot of the tree built for <config>
+    by <read_items>.
+
+    The name is a hash of the contents of config['file'], the reader, the
+    tree type, weight type and top_k, so that a snapshot is only used for the
+    tree it was saved from.
+
+    Precondition: config['file'] is the path of a file.
+    """
+    digest = hashlib.sha256()
+    with open(config['file'], 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    key = (f"{SNAPSHOT_VERSION}:{read_items.__name__}:"
+           f"{config['autocompleter']}:{config['weight_type']}:"
+           f"{config.get('top_k')}")
+    digest.update(key.encode('utf8'))
+    return digest.hexdigest() + '.pickle'
+
+
+def load_snapshot(path: str) -> Optional[Autocompleter]:
+    """Return the tree pickled in the snapshot at <path>, or None if there is
+    no readable snapshot.
+
+    Garbage collection is disabled while unpickling, since none of the
+    objects created can be garbage.
+    """
+    try:
+        with open(path, 'rb') as f:
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return pickle.load(f)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def save_snapshot(tree: Autocompleter, path: str) -> None:
+    """Pickle <tree> into a snapshot at <path>.
+
+    The snapshot is written next to <path> and then renamed, so that
+    concurrent runs never load a partly written snapshot.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@lru_cache(maxsize=1 << 16)
+def word_distance(query_word: str, word: str, last: bool) -> float:
+    """Return the number of letters to insert, delete or substitute to turn
+    <query_word> into <word>, or into a prefix of <word> if <last> is True.
+
+    This is the cost of substituting words in the fuzzy matches of the
+    SentenceAutocompleteEngine, where the last word of a prefix may not be
+    typed in full.
+    """
+    row = list(range(len(query_word) + 1))
+    best = row[-1]
+    for j, letter in enumerate(word, 1):
+        new_row = [j]
+        for i, query_letter in enumerate(query_word, 1):
+            new_row.append(min(row[i] + 1, new_row[i - 1] + 1,
+                               row[i - 1] + (query_letter != letter)))
+        row = new_row
+        best = min(best, row[-1])
+
+    return float(best if last else row[-1])
+
+
+def read_query_log(path: str) -> List[Tuple[str, Optional[int]]]:
+    """Return the (prefix, limit) queries recorded in the query log at
+    <path>.
+
+    Each line of the log is a prefix string, followed by a tab and the limit
+    if there is one. Empty lines are skipped.
+    """
+    queries = []
+    with open(path, encoding='utf8') as f:
+        for line in f:
+            line = line.strip('\n')
+            if not line:
+                continue
+
+            prefix, _, limit = line.partition('\t')
+            queries.append((prefix, int(limit) if limit else None))
+
+    return queries
+
+
+def read_letter_items(source: Source,
+                      progress: Optional[ProgressCallback] = None
+                      ) -> Iterator[Tuple[str, float, List[str]]]:
+    """Yield the (value, weight, prefix) items stored by the letter
+    autocomplete engine for the lines of the text <source>, as they are read
+    by read_lines.
+    """
+    for line in read_lines(source, progress):
+        # sanitize the line
+        prefix = [char for char in line.lower().strip('\n')
+                  if char.isalnum() or char == ' ']
+        new_line = ''.join(prefix)
+
+        # no alphanumeric character in line, skip to next line
+        if not prefix:
+            continue
+
+        yield new_line, 1.0, prefix
+
+
+def read_sentence_items(source: Source,
+                        progress: Optional[ProgressCallback] = None
+                        ) -> Iterator[Tuple[str, float, List[str]]]:
+    """Yield the (value, weight, prefix) items stored by the sentence
+    autocomplete engine for the lines of the CSV <source>, as they are read
+    by read_lines.
+    """
+    for line, weight in csv.reader(read_lines(source, progress)):
+        # sanitize the line
+        words = line.lower().strip('\n').split()
+        prefix = []
+        for item in words:
+            chars = [char for char in item if char.isalnum()]
+            prefix.append(''.join(chars))
+        new_line = ' '.join(prefix)
+
+        # make sure prefix doesn't contain any empty strings
+        fixed_prefix = [word for word in prefix if word.isalnum()]
+
+        # no words in line, skip to next line
+        if not fixed_prefix:
+            continue
+
+        yield new_line, float(weight), fixed_prefix
+
+
+def read_melody_items(source: Source,
+                      progress: Optional[ProgressCallback] = None
+                      ) -> Iterator[Tuple[Melody, float, List[int]]]:
+    """Yield the (value, weight, prefix) items stored by the melody
+    autocomplete engine for the lines of the CSV <source>, as they are read
+    by read_lines.
+    """
+    for line in csv.reader(read_lines(source, progress)):
+        # separate name from notes
+        name = line[0]
+        notes = line[1:]
+
+        # process notes in form of (pitch, duration)
+        notes_lst = []
+        for index in range(0, len(notes), 2):
+            note = notes[index]
+            duration = notes[index + 1]
+            if not (note == '' or duration == ''):
+                notes_lst.append((int(note), int(duration)))
+
+        # each melody is prefixed by its interval sequence
+        value = Melody(name, notes_lst)
+        yield value, 1.0, melody_intervals(value)
+
+
+def melody_intervals(melody: Melody) -> List[int]:
+    """Return the interval sequence of <melody>, the differences between the
+    pitches of its consecutive notes.
+    """
+    notes = melody.notes
+    return [notes[i + 1][0] - notes[i][0] for i in range(len(notes) - 1)]
+
+
 ################################################################################
 # Text-based Autocomplete Engines
 ################################################################################
@@ -34,29 +372,59 @@ class LetterAutocompleteEngine:
         """Initialize this engine with the given configuration.
 
         <config> is a dictionary consisting of the following keys:
-            - 'file': the path to a text file
-            - 'autocompleter': either the string 'simple' or 'compressed',
-              specifying which subclass of Autocompleter to use.
+            - 'file': the path to a text file, which may be compressed with
+              gzip, bzip2 or xz, a file object or an iterable of its lines.
+              It is read one chunk of lines at a time.
+            - 'autocompleter': the string 'simple', 'compressed', 'burst',
+              'ternary', 'dawg' or 'disk', specifying which subclass of
+              Autocompleter to use. A 'burst' autocompleter is a BurstTrie
+              and a 'ternary' one a TernarySearchTree. A 'dawg'
+              autocompleter is a read-only DawgAutocompleter, sharing the
+              common endings of the lines as well as their beginnings. A
+              'disk' autocompleter stores its values in a SQLite database,
+              read back from the stored heaviest values of their prefix or
+              by a range query of their prefix keys.
             - 'weight_type': either 'sum' or 'average', which specifies the
               weight type for the prefix tree.
+            - 'index' (optional): the path to an index file saved by
+              FrozenPrefixTree.save. The read-only tree it stores is loaded
+              instead of building one, and the other keys are not used.
+            - 'cache_dir' (optional): a directory of snapshots of the trees
+              built by the engines. The snapshot of the tree for the same
+              file contents and configuration is loaded instead of building
+              the tree, and a new one is saved if there is none. 'file' must
+              be a path.
+            - 'cache_size' (optional): the number of autocomplete results
+              cached by (prefix, limit). Inserting and removing values only
+              drops the results of the prefixes they change.
+            - 'top_k' (optional): the number of heaviest values kept by
+              every tree of the prefix tree, so that autocomplete with a
+              limit of at most 'top_k' does not search the matching tree.
+            - 'query_log' (optional): the path to a log of recorded queries,
+              read by read_query_log, whose results are cached at startup.
+            - 'workers' (optional): the number of processes building the
+              prefix tree, each from the lines whose prefix sequences start
+              with different elements, or None for one per CPU. The tree is
+              the same as the one built by a single process.
+            - 'shards' (optional): the number of worker processes storing
+              the values, each for a range of the first elements of their
+              prefix sequences. Queries are answered by the worker owning
+              the first element of their prefix, or by every worker for the
+              empty prefix. 'cache_dir' and 'workers' are not used.
+            - 'disk_path' (optional): the path of the database of a 'disk'
+              autocompleter. An existing database is opened instead of
+              reading 'file'. A temporary database is used if it is not
+              given.
+            - 'progress' (optional): a function called with the progress of
+              reading 'file', as reported by read_lines, such as
+              ingest.print_progress.
         """
-        with open(config['file'], encoding='utf8') as f:
-            if config['autocompleter'] == 'simple':
-                self.autocompleter = SimplePrefixTree(config['weight_type'])
-            else:
-                self.autocompleter = CompressedPrefixTree(config['weight_type'])
-
-            for line in f:
-                # sanitize the line
-                prefix = [char for char in line.lower().strip('\n')
-                          if char.isalnum() or char == ' ']
-                new_line = ''.join(prefix)
-
-                # no alphanumeric character in line, skip to next line
-                if not prefix:
-                    continue
+        self.autocompleter = build_autocompleter(config, read_letter_items)
 
-                self.autocompleter.insert(new_line, 1.0, prefix)
+        # answer the recorded queries to fill the result cache
+        if 'query_log' in config:
+            for prefix, limit in read_query_log(config['query_log']):
+                self.autocomplete(prefix, limit)
 
     def autocomplete(self, prefix: str,
                      limit: Optional[int] = None) -> List[Tuple[str, float]]:
@@ -77,6 +445,39 @@ class LetterAutocompleteEngine:
         prefix_seq = [char for char in prefix]
         return self.autocompleter.autocomplete(prefix_seq, limit)
 
+    def autocomplete_fuzzy(self, prefix: str, max_edits: int = 1,
+                           limit: Optional[int] = None
+                           ) -> List[Tuple[str, float]]:
+        """Return up to <limit> matches for the prefix strings within
+        <max_edits> letters inserted, deleted or substituted of the given
+        prefix string, in non-increasing weight order.
+
+        Preconditions:
+            limit is None or limit > 0
+            max_edits >= 0
+            <prefix> contains only lowercase alphanumeric characters and spaces
+        """
+        prefix_seq = [char for char in prefix]
+        return self.autocompleter.autocomplete_fuzzy(prefix_seq, max_edits,
+                                                     limit)
+
+    def autocomplete_many(self, prefixes: Iterable[str],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[str, float]]]:
+        """Return the autocomplete results of every prefix string in
+        <prefixes>, with the same <limit>, in the order of <prefixes>.
+
+        The prefixes are looked up together, so that the Autocompleter can
+        share the work of looking up prefixes that start the same way.
+
+        Preconditions:
+            limit is None or limit > 0
+            every prefix contains only lowercase alphanumeric characters and
+            spaces
+        """
+        return self.autocompleter.autocomplete_many(
+            [[char for char in prefix] for prefix in prefixes], limit)
+
     def remove(self, prefix: str) -> None:
         """Remove all strings that match the given prefix string.
 
@@ -100,6 +501,10 @@ class SentenceAutocompleteEngine:
     This autocomplete engine only stores and suggests strings with lowercase
     letters, numbers, and space characters; see the section on
 
+    The words of the prefix sequences are stored as their ids in a
+    Vocabulary by a VocabularyAutocompleter, unless the prefix tree is loaded
+    from an index file or stored on disk.
+
     === Attributes ===
     autocompleter: An Autocompleter used by this engine.
     """
@@ -109,11 +514,50 @@ class SentenceAutocompleteEngine:
         """Initialize this engine with the given configuration.
 
         <config> is a dictionary consisting of the following keys:
-            - 'file': the path to a CSV file
-            - 'autocompleter': either the string 'simple' or 'compressed',
-              specifying which subclass of Autocompleter to use.
+            - 'file': the path to a CSV file, which may be compressed with
+              gzip, bzip2 or xz, a file object or an iterable of its lines.
+              It is read one chunk of lines at a time.
+            - 'autocompleter': the string 'simple', 'compressed', 'burst',
+              'ternary' or 'disk', specifying which subclass of
+              Autocompleter to use. A 'burst' autocompleter is a BurstTrie
+              and a 'ternary' one a TernarySearchTree. A 'disk'
+              autocompleter stores its values in a SQLite database, read
+              back from the stored heaviest values of their prefix or by a
+              range query of their prefix keys.
             - 'weight_type': either 'sum' or 'average', which specifies the
               weight type for the prefix tree.
+            - 'index' (optional): the path to an index file saved by
+              FrozenPrefixTree.save. The read-only tree it stores is loaded
+              instead of building one, and the other keys are not used.
+            - 'cache_dir' (optional): a directory of snapshots of the trees
+              built by the engines. The snapshot of the tree for the same
+              file contents and configuration is loaded instead of building
+              the tree, and a new one is saved if there is none. 'file' must
+              be a path.
+            - 'cache_size' (optional): the number of autocomplete results
+              cached by (prefix, limit). Inserting and removing values only
+              drops the results of the prefixes they change.
+            - 'top_k' (optional): the number of heaviest values kept by
+              every tree of the prefix tree, so that autocomplete with a
+              limit of at most 'top_k' does not search the matching tree.
+            - 'query_log' (optional): the path to a log of recorded queries,
+              read by read_query_log, whose results are cached at startup.
+            - 'workers' (optional): the number of processes building the
+              prefix tree, each from the lines whose prefix sequences start
+              with different elements, or None for one per CPU. The tree is
+              the same as the one built by a single process.
+            - 'shards' (optional): the number of worker processes storing
+              the values, each for a range of the first elements of their
+              prefix sequences. Queries are answered by the worker owning
+              the first element of their prefix, or by every worker for the
+              empty prefix. 'cache_dir' and 'workers' are not used.
+            - 'disk_path' (optional): the path of the database of a 'disk'
+              autocompleter. An existing database is opened instead of
+              reading 'file'. A temporary database is used if it is not
+              given.
+            - 'progress' (optional): a function called with the progress of
+              reading 'file', as reported by read_lines, such as
+              ingest.print_progress.
 
         Precondition:
         The given file is a *CSV file* where each line has two entries:
@@ -121,30 +565,13 @@ class SentenceAutocompleteEngine:
             - the second entry is the a number representing the weight of that
               string
         """
-        with open(config['file'], encoding='utf8') as csvfile:
-            if config['autocompleter'] == 'simple':
-                self.autocompleter = SimplePrefixTree(config['weight_type'])
-            else:
-                self.autocompleter = CompressedPrefixTree(config['weight_type'])
-
-            reader = csv.reader(csvfile)
-            for line, weight in reader:
-                # sanitize the line
-                words = line.lower().strip('\n').split()
-                prefix = []
-                for item in words:
-                    chars = [char for char in item if char.isalnum()]
-                    prefix.append(''.join(chars))
-                new_line = ' '.join(prefix)
-
-                # make sure prefix doesn't contain any empty strings
-                fixed_prefix = [word for word in prefix if word.isalnum()]
-
-                # no words in line, skip to next line
-                if not fixed_prefix:
-                    continue
-
-                self.autocompleter.insert(new_line, float(weight), fixed_prefix)
+        self.autocompleter = build_autocompleter(config, read_sentence_items,
+                                                 vocabulary=True)
+
+        # answer the recorded queries to fill the result cache
+        if 'query_log' in config:
+            for prefix, limit in read_query_log(config['query_log']):
+                self.autocomplete(prefix, limit)
 
     def autocomplete(self, prefix: str,
                      limit: Optional[int] = None) -> List[Tuple[str, float]]:
@@ -165,6 +592,43 @@ class SentenceAutocompleteEngine:
         prefix_seq = prefix.split()
         return self.autocompleter.autocomplete(prefix_seq, limit)
 
+    def autocomplete_fuzzy(self, prefix: str, max_edits: int = 1,
+                           limit: Optional[int] = None
+                           ) -> List[Tuple[str, float]]:
+        """Return up to <limit> matches for the given prefix with misspelled
+        words, in non-increasing weight order.
+
+        The words of a match line up with the words of the prefix, and the
+        letters inserted, deleted or substituted to turn the words of the
+        prefix into them add up to at most <max_edits>. The last word of the
+        prefix only has to be within those edits of the start of a word.
+
+        Preconditions:
+            limit is None or limit > 0
+            max_edits >= 0
+            <prefix> contains only lowercase alphanumeric characters and spaces
+        """
+        prefix_seq = prefix.split()
+        return self.autocompleter.autocomplete_fuzzy(
+            prefix_seq, max_edits, limit, word_distance, math.inf)
+
+    def autocomplete_many(self, prefixes: Iterable[str],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[str, float]]]:
+        """Return the autocomplete results of every prefix string in
+        <prefixes>, with the same <limit>, in the order of <prefixes>.
+
+        The prefixes are looked up together, so that the Autocompleter can
+        share the work of looking up prefixes that start with the same words.
+
+        Preconditions:
+            limit is None or limit > 0
+            every prefix contains only lowercase alphanumeric characters and
+            spaces
+        """
+        return self.autocompleter.autocomplete_many(
+            [prefix.split() for prefix in prefixes], limit)
+
     def remove(self, prefix: str) -> None:
         """Remove all strings that match the given prefix.
 
@@ -193,18 +657,60 @@ class MelodyAutocompleteEngine:
 
     === Attributes ===
     autocompleter: An Autocompleter used by this engine.
+    intervals: An IntervalIndex of the interval sequences of the melodies,
+        used to find melodies by a run of intervals anywhere in them.
     """
     autocompleter: Autocompleter
+    intervals: IntervalIndex
 
     def __init__(self, config: Dict[str, Any]) -> None:
         """Initialize this engine with the given configuration.
 
         <config> is a dictionary consisting of the following keys:
-            - 'file': the path to a CSV file
-            - 'autocompleter': either the string 'simple' or 'compressed',
-              specifying which subclass of Autocompleter to use.
+            - 'file': the path to a CSV file, which may be compressed with
+              gzip, bzip2 or xz, a file object or an iterable of its lines.
+              It is read one chunk of lines at a time.
+            - 'autocompleter': the string 'simple', 'compressed', 'burst',
+              'ternary' or 'disk', specifying which subclass of
+              Autocompleter to use. A 'burst' autocompleter is a BurstTrie
+              and a 'ternary' one a TernarySearchTree. A 'disk'
+              autocompleter stores its values in a SQLite database, read
+              back from the stored heaviest values of their prefix or by a
+              range query of their prefix keys.
             - 'weight_type': either 'sum' or 'average', which specifies the
               weight type for the prefix tree.
+            - 'index' (optional): the path to an index file saved by
+              FrozenPrefixTree.save. The read-only tree it stores is loaded
+              instead of building one, and the other keys are not used.
+            - 'cache_dir' (optional): a directory of snapshots of the trees
+              built by the engines. The snapshot of the tree for the same
+              file contents and configuration is loaded instead of building
+              the tree, and a new one is saved if there is none. 'file' must
+              be a path.
+            - 'cache_size' (optional): the number of autocomplete results
+              cached by (prefix, limit). Inserting and removing values only
+              drops the results of the prefixes they change.
+            - 'top_k' (optional): the number of heaviest values kept by
+              every tree of the prefix tree, so that autocomplete with a
+              limit of at most 'top_k' does not search the matching tree.
+            - 'query_log' (optional): the path to a log of recorded queries,
+              read by read_query_log, whose results are cached at startup.
+            - 'workers' (optional): the number of processes building the
+              prefix tree, each from the lines whose prefix sequences start
+              with different elements, or None for one per CPU. The tree is
+              the same as the one built by a single process.
+            - 'shards' (optional): the number of worker processes storing
+              the values, each for a range of the first elements of their
+              prefix sequences. Queries are answered by the worker owning
+              the first element of their prefix, or by every worker for the
+              empty prefix. 'cache_dir' and 'workers' are not used.
+            - 'disk_path' (optional): the path of the database of a 'disk'
+              autocompleter. An existing database is opened instead of
+              reading 'file'. A temporary database is used if it is not
+              given.
+            - 'progress' (optional): a function called with the progress of
+              reading 'file', as reported by read_lines, such as
+              ingest.print_progress.
 
         Precondition:
         The given file is a *CSV file* where each line has the following format:
@@ -214,32 +720,22 @@ class MelodyAutocompleteEngine:
               and the second number is the corresponding duration.
 
         Each melody is be inserted into the Autocompleter with a weight of 1.
+        The interval n-grams of the melodies are indexed as they are read.
+        If the tree is loaded from an index or a snapshot instead, they are
+        indexed from the melodies stored in the tree.
         """
-        with open(config['file'], encoding='utf8') as csvfile:
-            if config['autocompleter'] == 'simple':
-                self.autocompleter = SimplePrefixTree(config['weight_type'])
-            else:
-                self.autocompleter = CompressedPrefixTree(config['weight_type'])
-
-            reader = csv.reader(csvfile)
-            for line in reader:
-                # separate name from notes
-                name = line[0]
-                notes = line[1:]
-
-                # process notes in form of (pitch, duration)
-                notes_lst = []
-                for index in range(0, len(notes), 2):
-                    note = notes[index]
-                    duration = notes[index + 1]
-                    if not (note == '' or duration == ''):
-                        notes_lst.append((int(note), int(duration)))
-
-                # insert value into auto completer
-                value = Melody(name, notes_lst)
-                prefix = [notes_lst[i + 1][0] - notes_lst[i][0]
-                          for i in range(len(notes_lst) - 1)]
-                self.autocompleter.insert(value, 1.0, prefix)
+        self.intervals = IntervalIndex()
+        self.autocompleter = build_autocompleter(config, self.read_items)
+
+        # the tree was loaded without reading the file
+        if not self.intervals:
+            self.index_tree()
+
+        # answer the recorded queries, interval sequences separated by
+        # spaces, to fill the result cache
+        if 'query_log' in config:
+            for prefix, limit in read_query_log(config['query_log']):
+                self.autocomplete([int(i) for i in prefix.split()], limit)
 
     def autocomplete(self, prefix: List[int],
                      limit: Optional[int] = None) -> List[Tuple[Melody, float]]:
@@ -256,7 +752,59 @@ class MelodyAutocompleteEngine:
         value = self.autocompleter.autocomplete(prefix, limit)
         return [(melody, weight) for melody, weight in value]
 
+    def autocomplete_many(self, prefixes: Iterable[List[int]],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[Melody, float]]]:
+        """Return the autocomplete results of every interval sequence in
+        <prefixes>, with the same <limit>, in the order of <prefixes>.
+
+        The interval sequences are looked up together, so that the
+        Autocompleter can share the work of looking up sequences that start
+        with the same intervals.
+
+        Precondition:
+            limit is None or limit > 0
+        """
+        values = self.autocompleter.autocomplete_many(prefixes, limit)
+        return [[(melody, weight) for melody, weight in value]
+                for value in values]
+
+    def search_intervals(self, intervals: List[int],
+                         limit: Optional[int] = None
+                         ) -> List[Tuple[Melody, float]]:
+        """Return up to <limit> melodies whose interval sequences contain
+        <intervals> as a contiguous run, anywhere from their start.
+
+        The return value is a list of tuples (melody, weight), ordered in
+        non-increasing weight.
+
+        Precondition:
+            limit is None or limit > 0
+        """
+        return self.intervals.search(intervals, limit)
+
+    def index_tree(self) -> None:
+        """Store the interval sequences of the melodies of the Autocompleter
+        in the interval index, with their weights.
+
+        The interval index then holds the same Melody objects as the
+        Autocompleter, so that a melody found by search_intervals can be
+        removed from it. Melodies of equal weight are stored in the order
+        the Autocompleter returns them.
+        """
+        for melody, weight in self.autocompleter.autocomplete([]):
+            self.intervals.insert(melody, weight, melody_intervals(melody))
+
+    def read_items(self, source: Source,
+                   progress: Optional[ProgressCallback] = None
+                   ) -> Iterator[Tuple[Melody, float, List[int]]]:
+        """Yield the items read by read_melody_items, storing their interval
+        sequences in the interval index as they are read.
+        """
+        return self.intervals.index_items(read_melody_items(source, progress))
+
     def remove(self, prefix: List[int]) -> None:
         """Remove all melodies that match the given interval sequence.
         """
         self.autocompleter.remove(prefix)
+        self.intervals.remove(prefix)
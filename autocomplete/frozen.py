@@ -0,0 +1,665 @@
+"""Frozen prefix tree
+
+=== Module description ===
+This file contains FrozenPrefixTree, a read-only Autocompleter compiled from
+a SimplePrefixTree or CompressedPrefixTree by their freeze method.
+
+The trees are numbered in depth-first preorder and stored in NumPy arrays
+instead of Python objects, so every tree and all of its descendants are one
+contiguous range of the arrays. Only the inserted values stay Python objects.
+
+A frozen tree can be saved to an index file and loaded back with mmap. The
+arrays of a loaded tree are views of the mapped file, and its values and
+prefix elements are only decoded when a query needs them, so loading takes
+the same time whatever the size of the tree, and processes loading the same
+file share its pages.
+"""
+from __future__ import annotations
+
+import heapq
+import mmap
+import os
+import pickle
+import struct
+import sys
+from bisect import bisect_left
+from typing import (Any, Callable, Dict, Iterator, List, Optional, Sequence,
+                    Tuple)
+
+import numpy as np
+
+from .prefix_tree import (Autocompleter, SimplePrefixTree, Substitution,
+                          fuzzy_step, unit_substitution)
+
+# The first bytes of an index file, and the version of its format
+INDEX_MAGIC = b'ACINDEX\0'
+INDEX_VERSION = 2
+
+# How the values and prefix elements of an index file are encoded: as UTF-8
+# if they are all strings, and pickled otherwise
+CODEC_UTF8 = 0
+CODEC_PICKLE = 1
+
+# The header of an index file: its magic, version and codec
+INDEX_HEADER = struct.Struct('<8sII')
+
+# The arrays stored in an index file, in order, with their little-endian
+# dtypes. Each one is stored as the (offset, length) of its data after the
+# header, and its data starts at a multiple of 8 bytes.
+INDEX_ARRAYS = [
+    ('ends', '<i4'),
+    ('label_offsets', '<i4'),
+    ('labels', '<i4'),
+    ('first_labels', '<i4'),
+    ('weights', '<f8'),
+    ('max_weights', '<f8'),
+    ('value_ids', '<i4'),
+    ('value_offsets', '<i8'),
+    ('value_bytes', 'u1'),
+    ('element_offsets', '<i8'),
+    ('element_bytes', 'u1'),
+    ('element_ids', '<i4')
+]
+
+
+class FrozenPrefixTree(Autocompleter):
+    """A read-only prefix tree stored in flat arrays.
+
+    Tree 0 is the root, and the descendants of tree i are the trees i + 1 to
+    ends[i] - 1, with the subtrees of every tree in non-increasing order of
+    their largest leaf weight, and subtrees of equal largest leaf weight in
+    the same order as in the tree it was compiled from. Tree i adds the
+    prefix elements labels[label_offsets[i]:label_offsets[i + 1]] to the
+    value of its parent, where every prefix element is replaced by its id in
+    <_element_ids>.
+
+    A tree whose only subtree is not a leaf is merged with that subtree, as
+    in a CompressedPrefixTree.
+
+    === Attributes ===
+    ends:
+        One more than the last descendant of each tree.
+    label_offsets:
+        The index in <labels> of the first prefix element added by each tree,
+        followed by the length of <labels>.
+    labels:
+        The ids of the prefix elements added by every tree.
+    first_labels:
+        The id of the first prefix element added by each tree, or -1 if the
+        tree does not add any.
+    weights:
+        The weight of each leaf, or -inf for non-leaf trees.
+    max_weights:
+        The largest weight of a leaf of each tree.
+    value_ids:
+        The index in <values> of the value stored in each leaf, or -1 for
+        non-leaf trees.
+    values:
+        The values stored in the leaves.
+    """
+    ends: np.ndarray
+    label_offsets: np.ndarray
+    labels: np.ndarray
+    first_labels: np.ndarray
+    weights: np.ndarray
+    max_weights: np.ndarray
+    value_ids: np.ndarray
+    values: List[Any]
+
+    # === Private Attributes ===
+    # Maps each prefix element stored in the tree to its id
+    _element_ids: Dict[Any, int]
+    # The prefix element with each id, once a fuzzy query needs them
+    _elements: Optional[List[Any]]
+
+    def __init__(self, tree: SimplePrefixTree,
+                 elements: Optional[Sequence] = None) -> None:
+        """Compile the given SimplePrefixTree or CompressedPrefixTree.
+
+        If <elements> is given, the prefix elements of <tree> are indices in
+        it, and the elements they index are stored instead.
+        """
+        self._element_ids = {}
+        self._elements = None
+        self.values = []
+
+        ends = []
+        label_offsets = [0]
+        labels = []
+        first_labels = []
+        weights = []
+        value_ids = []
+        parents = []
+
+        # trees still to number with the elements they add and their
+        # parents, and the trees
+        # whose end is the number of trees once the stack shrinks below them
+        stack = [(tree, tree.value, -1)]
+        open_trees = []
+        while stack:
+            subtree, label, parent = stack.pop()
+            while open_trees and open_trees[-1][1] > len(stack):
+                ends[open_trees.pop()[0]] = len(ends)
+
+            index = len(ends)
+            ends.append(index + 1)
+            parents.append(parent)
+
+            if subtree.is_leaf():
+                weights.append(subtree.weight)
+                value_ids.append(len(self.values))
+                self.values.append(subtree.value)
+            else:
+                # merge the chain of trees with a single non-leaf subtree
+                label = list(label)
+                while (len(subtree.subtrees) == 1
+                       and not subtree.subtrees[0].is_leaf()):
+                    label.extend(subtree.edge_label(subtree.subtrees[0]))
+                    subtree = subtree.subtrees[0]
+
+                weights.append(-np.inf)
+                value_ids.append(-1)
+                open_trees.append((index, len(stack)))
+                # heaviest subtrees first, keeping the order of equal ones
+                for sub in reversed(sorted(subtree.subtrees,
+                                           key=_max_leaf_weight,
+                                           reverse=True)):
+                    stack.append((sub, [] if sub.is_leaf()
+                                  else subtree.edge_label(sub), index))
+
+            for element in label:
+                labels.append(self._element_ids.setdefault(
+                    element, len(self._element_ids)))
+            first_labels.append(labels[label_offsets[-1]]
+                                if len(labels) > label_offsets[-1] else -1)
+            label_offsets.append(len(labels))
+
+        for index, _ in open_trees:
+            ends[index] = len(ends)
+        if elements is not None:
+            self._element_ids = {elements[element]: element_id
+                                 for element, element_id
+                                 in self._element_ids.items()}
+
+        self.ends = np.array(ends, dtype=np.int32)
+        self.label_offsets = np.array(label_offsets, dtype=np.int32)
+        self.labels = np.array(labels, dtype=np.int32)
+        self.first_labels = np.array(first_labels, dtype=np.int32)
+        self.weights = np.array(weights, dtype=np.float64)
+        self.value_ids = np.array(value_ids, dtype=np.int32)
+
+        # every tree after its descendants, updating its parent
+        max_weights = list(weights)
+        for index in range(len(ends) - 1, 0, -1):
+            parent = parents[index]
+            if max_weights[index] > max_weights[parent]:
+                max_weights[parent] = max_weights[index]
+        self.max_weights = np.array(max_weights, dtype=np.float64)
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        return len(self.values)
+
+    def save(self, path: str) -> None:
+        """Write this tree to an index file at <path>, which load maps back.
+
+        The file is written next to <path> and then renamed, so a process
+        loading <path> never sees a partly written index.
+
+        Values and prefix elements that are not all strings are pickled, and
+        are unpickled by load: only load index files you trust.
+        """
+        elements = list(self._element_ids.items())
+        if all(isinstance(item, str)
+               for item in list(self.values) + [e for e, _ in elements]):
+            codec = CODEC_UTF8
+        else:
+            codec = CODEC_PICKLE
+        encode = _encoders[codec]
+
+        # the element table is sorted by encoding, for binary search
+        elements = sorted((encode(element), element_id)
+                          for element, element_id in elements)
+        value_offsets, value_bytes = _pack([encode(v) for v in self.values])
+        element_offsets, element_bytes = _pack([e for e, _ in elements])
+        arrays = {
+            'ends': self.ends,
+            'label_offsets': self.label_offsets,
+            'labels': self.labels,
+            'first_labels': self.first_labels,
+            'weights': self.weights,
+            'max_weights': self.max_weights,
+            'value_ids': self.value_ids,
+            'value_offsets': value_offsets,
+            'value_bytes': value_bytes,
+            'element_offsets': element_offsets,
+            'element_bytes': element_bytes,
+            'element_ids': np.array([i for _, i in elements])
+        }
+
+        # lay out the arrays after the header and the table of arrays
+        table = []
+        offset = INDEX_HEADER.size + 16 * len(INDEX_ARRAYS)
+        for name, dtype in INDEX_ARRAYS:
+            offset += -offset % 8
+            table.extend([offset, len(arrays[name])])
+            offset += len(arrays[name]) * np.dtype(dtype).itemsize
+
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, codec))
+                f.write(struct.pack(f'<{len(table)}Q', *table))
+                for index, (name, dtype) in enumerate(INDEX_ARRAYS):
+                    f.write(bytes(table[2 * index] - f.tell()))
+                    f.write(np.ascontiguousarray(arrays[name],
+                                                 dtype=dtype).tobytes())
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @classmethod
+    def load(cls, path: str) -> FrozenPrefixTree:
+        """Return the tree saved to the index file at <path>, with its arrays
+        mapped from the file instead of read.
+
+        Raise ValueError if the file is not an index file of this version.
+        """
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(buffer) < INDEX_HEADER.size:
+            raise ValueError(f'{path} is not an index file')
+        magic, version, codec = INDEX_HEADER.unpack_from(buffer)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f'{path} is not an index file')
+        if version != INDEX_VERSION:
+            raise ValueError(f'{path} has index version {version}, '
+                             f'expected {INDEX_VERSION}')
+
+        table = struct.unpack_from(f'<{2 * len(INDEX_ARRAYS)}Q', buffer,
+                                   INDEX_HEADER.size)
+        arrays = {}
+        for index, (name, dtype) in enumerate(INDEX_ARRAYS):
+            arrays[name] = np.frombuffer(buffer, dtype=dtype,
+                                         count=table[2 * index + 1],
+                                         offset=table[2 * index])
+
+        tree = cls.__new__(cls)
+        tree.ends = arrays['ends']
+        tree.label_offsets = arrays['label_offsets']
+        tree.labels = arrays['labels']
+        tree.first_labels = arrays['first_labels']
+        tree.weights = arrays['weights']
+        tree.max_weights = arrays['max_weights']
+        tree.value_ids = arrays['value_ids']
+        tree.values = MappedValues(arrays['value_offsets'],
+                                   arrays['value_bytes'], _decoders[codec])
+        tree._element_ids = MappedElementIds(
+            arrays['element_offsets'], arrays['element_bytes'],
+            arrays['element_ids'], _encoders[codec], _decoders[codec])
+        tree._elements = None
+        return tree
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """A frozen tree cannot be changed.
+        """
+        raise NotImplementedError('FrozenPrefixTree is read-only')
+
+    def remove(self, prefix: List) -> None:
+        """A frozen tree cannot be changed.
+        """
+        raise NotImplementedError('FrozenPrefixTree is read-only')
+
+    def increment(self, value: Any, delta: float) -> None:
+        """A frozen tree cannot be changed.
+        """
+        raise NotImplementedError('FrozenPrefixTree is read-only')
+
+    def remove_value(self, value: Any) -> None:
+        """A frozen tree cannot be changed.
+        """
+        raise NotImplementedError('FrozenPrefixTree is read-only')
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix.
+
+        The return value is a list of tuples (value, weight), and must be
+        ordered in non-increasing weight. Values of equal weight are returned
+        in preorder, which is not always the order the tree this tree was
+        compiled from returns them in.
+
+        If limit is None, return *every* match for the given prefix.
+
+        Precondition: limit is None or limit > 0.
+        """
+        tree = self.find_tree(prefix)
+
+        # no match found
+        if tree is None:
+            return []
+
+        if limit is None:
+            return self.complete_all(tree)
+        return self.complete(tree, limit)
+
+    def complete(self, tree: int, limit: int) -> List[Tuple[Any, float]]:
+        """Return the <limit> heaviest values stored in <tree>, in
+        non-increasing weight order and ties in preorder.
+
+        The trees are expanded best-first from a heap keyed on their largest
+        leaf weight and then their number. The subtrees of a tree are sorted
+        by their largest leaf weight, so a tree only enters the heap with its
+        first subtree, and each tree popped pushes the subtree after it.
+        """
+        ends = self.ends.item
+        max_weights = self.max_weights.item
+        value_ids = self.value_ids.item
+
+        result = []
+        # (negated largest leaf weight, tree, end of its parent)
+        heap = [(-max_weights(tree), tree, ends(tree))]
+        while heap and len(result) < limit:
+            weight, tree, parent_end = heapq.heappop(heap)
+            end = ends(tree)
+            if end < parent_end:
+                heapq.heappush(heap, (-max_weights(end), end, parent_end))
+
+            value_id = value_ids(tree)
+            if value_id >= 0:
+                result.append((self.values[value_id], -weight))
+            else:
+                heapq.heappush(heap, (-max_weights(tree + 1), tree + 1, end))
+
+        return result
+
+    def complete_all(self, tree: int) -> List[Tuple[Any, float]]:
+        """Return every value stored in <tree>, in non-increasing weight order
+        and ties in preorder.
+        """
+        # the leaves under the tree, in preorder
+        weights = self.weights[tree:self.ends[tree]]
+        leaves = np.flatnonzero(self.value_ids[tree:self.ends[tree]] >= 0)
+
+        # heaviest first, ties in preorder
+        leaves = leaves[np.argsort(-weights[leaves], kind='stable')]
+        value_ids = self.value_ids[tree + leaves].tolist()
+        return list(zip([self.values[i] for i in value_ids],
+                        weights[leaves].tolist()))
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order.
+
+        The trees are searched best-first by their largest leaf weight, as
+        in SimplePrefixTree.autocomplete_fuzzy, keeping for each tree the
+        last row of the edit distance table between the given prefix and
+        its value, or None once every value of the tree matches. The
+        subtrees of a matching tree enter the heap one at a time, as in
+        complete. The prefix elements are decoded from their ids on the
+        first fuzzy query.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        if not self.values:
+            return []
+        if substitution is None:
+            substitution = unit_substitution
+        if limit is None:
+            limit = len(self)
+
+        ends = self.ends.item
+        max_weights = self.max_weights.item
+        value_ids = self.value_ids.item
+        elements = self.elements()
+
+        def label(tree: int) -> List:
+            return [elements[element_id] for element_id in self.labels[
+                self.label_offsets[tree]:self.label_offsets[tree + 1]
+            ].tolist()]
+
+        row = [0.0] + [gap * length for length in range(1, len(prefix) + 1)]
+        if row[-1] > max_edits:
+            step = fuzzy_step(row, label(0), prefix, max_edits,
+                              substitution, gap)
+            if step is None:
+                return []
+            row = None if step[1] else step[0]
+        else:
+            row = None
+
+        result = []
+        # (negated largest leaf weight, tree, end of its parent if its
+        # siblings enter the heap after it, row)
+        heap = [(-max_weights(0), 0, ends(0), row)]
+        while heap and len(result) < limit:
+            weight, tree, parent_end, row = heapq.heappop(heap)
+            end = ends(tree)
+            if end < parent_end:
+                heapq.heappush(heap, (-max_weights(end), end, parent_end,
+                                      None))
+
+            # the leaves popped are those of matching trees
+            value_id = value_ids(tree)
+            if value_id >= 0:
+                result.append((self.values[value_id], -weight))
+            elif row is None:
+                heapq.heappush(heap, (-max_weights(tree + 1), tree + 1, end,
+                                      None))
+            else:
+                subtree = tree + 1
+                while subtree < end:
+                    # a leaf of a tree that does not match is skipped
+                    subtree_end = ends(subtree)
+                    if value_ids(subtree) < 0:
+                        step = fuzzy_step(row, label(subtree), prefix,
+                                          max_edits, substitution, gap)
+                        if step is not None:
+                            heapq.heappush(heap, (
+                                -max_weights(subtree), subtree, subtree_end,
+                                None if step[1] else step[0]))
+                    subtree = subtree_end
+
+        return result
+
+    def elements(self) -> List[Any]:
+        """Return the prefix element with each id."""
+        if self._elements is None:
+            elements = [None] * len(self._element_ids)
+            for element, element_id in self._element_ids.items():
+                elements[element_id] = element
+            self._elements = elements
+        return self._elements
+
+    def find_tree(self, prefix: List) -> Optional[int]:
+        """Return the tree storing every value matching the given prefix, or
+        None if no value matches it.
+        """
+        if not self.values:
+            return None
+
+        # an element that is not stored cannot match anything
+        ids = []
+        for element in prefix:
+            element_id = self._element_ids.get(element)
+            if element_id is None:
+                return None
+            ids.append(element_id)
+
+        ends = self.ends.item
+        first_labels = self.first_labels.item
+        label_offsets = self.label_offsets.item
+        tree = 0
+        position = 0
+        while True:
+            # match the elements added by this tree
+            start = label_offsets(tree)
+            length = min(label_offsets(tree + 1) - start,
+                         len(ids) - position)
+            if length and self.labels[start:start + length].tolist() != \
+                    ids[position:position + length]:
+                return None
+            position += length
+
+            # prefix ends in this tree
+            if position == len(ids):
+                return tree
+
+            # find the subtree adding the next element of the prefix, moving
+            # from each subtree to the one after its descendants
+            element_id = ids[position]
+            subtree = tree + 1
+            end = ends(tree)
+            while subtree < end and first_labels(subtree) != element_id:
+                subtree = ends(subtree)
+            if subtree == end:
+                return None
+            tree = subtree
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the number of non-leaf trees ('nodes') and leaves ('leaves')
+        in this tree, and the approximate number of bytes they use ('bytes').
+
+        The bytes count the arrays, the value table and the element ids, but
+        not the values and prefix elements themselves.
+        """
+        arrays = [self.ends, self.label_offsets, self.labels,
+                  self.first_labels, self.weights, self.max_weights,
+                  self.value_ids]
+        return {
+            'nodes': len(self.ends) - len(self.values),
+            'leaves': len(self.values),
+            'bytes': (sum(array.nbytes for array in arrays)
+                      + sys.getsizeof(self.values)
+                      + sys.getsizeof(self._element_ids))
+        }
+
+
+class MappedValues(Sequence):
+    """The values of a tree loaded from an index file, each decoded from the
+    mapped file when it is read.
+
+    === Attributes ===
+    offsets:
+        The offset in <data> of the encoding of each value, followed by the
+        length of <data>.
+    data:
+        The encodings of the values.
+    """
+    offsets: np.ndarray
+    data: np.ndarray
+
+    # === Private Attributes ===
+    # Returns the value encoded in the given bytes
+    _decode: Callable[[bytes], Any]
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray,
+                 decode: Callable[[bytes], Any]) -> None:
+        """Initialize the values encoded in <data>."""
+        self.offsets = offsets
+        self.data = data
+        self._decode = decode
+
+    def __len__(self) -> int:
+        """Return the number of values."""
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Any:
+        """Return the value at <index>, decoded from the mapped file."""
+        if not 0 <= index < len(self):
+            raise IndexError('value index out of range')
+        return self._decode(
+            self.data[self.offsets[index]:self.offsets[index + 1]].tobytes())
+
+
+class MappedElementIds:
+    """The ids of the prefix elements of a tree loaded from an index file.
+
+    The encodings of the elements are sorted in the mapped file, and an
+    element is looked up by binary search.
+
+    === Attributes ===
+    offsets:
+        The offset in <data> of the encoding of each element, in sorted
+        order, followed by the length of <data>.
+    data:
+        The encodings of the elements.
+    ids:
+        The id of each element, in the same order.
+    """
+    offsets: np.ndarray
+    data: np.ndarray
+    ids: np.ndarray
+
+    # === Private Attributes ===
+    # Return the encoding of an element, and the element of an encoding
+    _encode: Callable[[Any], bytes]
+    _decode: Callable[[bytes], Any]
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray, ids: np.ndarray,
+                 encode: Callable[[Any], bytes],
+                 decode: Callable[[bytes], Any]) -> None:
+        """Initialize the element ids encoded in <data>."""
+        self.offsets = offsets
+        self.data = data
+        self.ids = ids
+        self._encode = encode
+        self._decode = decode
+
+    def __len__(self) -> int:
+        """Return the number of elements."""
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> bytes:
+        """Return the encoding of the element at <index> in sorted order."""
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+    def get(self, element: Any, default: Optional[int] = None
+            ) -> Optional[int]:
+        """Return the id of <element>, or <default> if it is not stored."""
+        try:
+            key = self._encode(element)
+        except (AttributeError, TypeError, pickle.PicklingError):
+            return default
+
+        # the elements in sorted order are read through __getitem__
+        index = bisect_left(self, key)
+        if index < len(self) and self[index] == key:
+            return int(self.ids[index])
+        return default
+
+    def items(self) -> Iterator[Tuple[Any, int]]:
+        """Return an iterator over the (element, id) pairs."""
+        for index in range(len(self)):
+            yield self._decode(self[index]), int(self.ids[index])
+
+
+def _max_leaf_weight(tree: Any) -> float:
+    """Return the largest weight of a leaf of a prefix tree."""
+    return tree.max_leaf_weight()
+
+
+def _pack(encodings: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the offsets of the given encodings in their concatenation,
+    followed by its length, and the concatenation itself.
+    """
+    offsets = np.zeros(len(encodings) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encodings], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encodings), dtype=np.uint8)
+
+
+# The functions encoding and decoding values and prefix elements for each
+# codec
+_encoders = {
+    CODEC_UTF8: lambda item: item.encode('utf8'),
+    CODEC_PICKLE: lambda item: pickle.dumps(item, protocol=4)
+}
+_decoders = {
+    CODEC_UTF8: lambda data: data.decode('utf8'),
+    CODEC_PICKLE: pickle.loads
+}
@@ -0,0 +1,198 @@
+"""Streaming ingestion
+
+=== Module description ===
+This file contains read_lines, which streams the lines of the sources the
+autocomplete engines are built from, and the progress reports made while
+reading them.
+
+A source is the path of a file, a file object opened in text or binary mode,
+or any iterable of lines. Files compressed with gzip, bzip2 or xz are
+recognized by their first bytes and decompressed as they are read. Files are
+read in chunks of lines, so only one chunk is held in memory at a time
+whatever the size of the source.
+"""
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, Optional, Union
+
+Source = Union[str, os.PathLike, IO, Iterable[str]]
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# The number of bytes of lines read from a file at a time
+CHUNK_SIZE = 1 << 16
+
+# The first bytes of the compressed files, and the functions opening them
+COMPRESSED_FORMATS = [
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open)
+]
+
+
+def read_lines(source: Source, progress: Optional[ProgressCallback] = None,
+               chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield the lines of <source>, reading its files in chunks of about
+    <chunk_size> bytes of lines.
+
+    If <progress> is given, it is called with the progress of the reading,
+    as returned by Progress.report, after every chunk and once the source is
+    exhausted. The files opened from a path are closed once the lines are
+    exhausted or the generator is closed.
+    """
+    tracker = Progress(progress)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as binary:
+            yield from tracker.track(text_chunks(binary, chunk_size),
+                                     binary)
+    elif hasattr(source, 'read'):
+        binary = None if isinstance(source, io.TextIOBase) else source
+        yield from tracker.track(text_chunks(source, chunk_size), binary)
+    else:
+        yield from tracker.track(iterable_chunks(source, chunk_size), None)
+
+    tracker.finish()
+
+
+def text_chunks(f: IO, chunk_size: int) -> Iterator[list]:
+    """Yield the lines of the text or binary file object <f> in chunks of
+    about <chunk_size> bytes.
+
+    Binary files are decompressed if they are compressed, and decoded as
+    UTF-8. They are not closed, so that their owners can keep using them.
+    """
+    if isinstance(f, io.TextIOBase):
+        yield from iter(lambda: f.readlines(chunk_size), [])
+        return
+
+    text = io.TextIOWrapper(decompress(f), encoding='utf8')
+    try:
+        yield from iter(lambda: text.readlines(chunk_size), [])
+    finally:
+        text.detach()
+
+
+def iterable_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[list]:
+    """Yield the lines of <lines> in chunks of about <chunk_size>
+    characters.
+    """
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield chunk
+            chunk = []
+            size = 0
+
+    if chunk:
+        yield chunk
+
+
+def decompress(binary: IO) -> IO:
+    """Return a binary file object reading the decompressed contents of
+    <binary> if they are compressed, and <binary> itself otherwise.
+    """
+    if hasattr(binary, 'peek'):
+        start = binary.peek(8)
+    elif binary.seekable():
+        position = binary.tell()
+        start = binary.read(8)
+        binary.seek(position)
+    else:
+        return binary
+
+    for magic, open_compressed in COMPRESSED_FORMATS:
+        if start.startswith(magic):
+            return open_compressed(binary, 'rb')
+
+    return binary
+
+
+class Progress:
+    """The progress of reading the lines of a source.
+
+    === Attributes ===
+    lines:
+        The number of lines read.
+    bytes:
+        The number of bytes read from the file of the source, before they
+        are decompressed, or the number of characters read if the source is
+        not a binary file.
+    """
+    lines: int
+    bytes: int
+
+    # === Private Attributes ===
+    # The function called with the progress reports, or None
+    _callback: Optional[ProgressCallback]
+    # The time reading started, from time.perf_counter
+    _start: float
+
+    def __init__(self, callback: Optional[ProgressCallback] = None) -> None:
+        """Initialize the progress of reading a source, reported to
+        <callback>.
+        """
+        self.lines = 0
+        self.bytes = 0
+        self._callback = callback
+        self._start = time.perf_counter()
+
+    def track(self, chunks: Iterator[list],
+              binary: Optional[IO]) -> Iterator[str]:
+        """Yield the lines of <chunks>, counting them and reporting the
+        progress after every chunk.
+
+        The bytes are read from the position of <binary> if it is a binary
+        file, and are the lengths of the lines otherwise.
+        """
+        for chunk in chunks:
+            self.lines += len(chunk)
+            if binary is not None:
+                self.bytes = binary.tell()
+            else:
+                self.bytes += sum(len(line) for line in chunk)
+
+            if self._callback is not None:
+                self._callback(self.report())
+            yield from chunk
+
+    def finish(self) -> None:
+        """Report the progress once the source is exhausted.
+        """
+        if self._callback is not None:
+            self._callback(dict(self.report(), done=True))
+
+    def report(self) -> Dict[str, Any]:
+        """Return the number of lines ('lines') and bytes ('bytes') read, the
+        seconds since reading started ('seconds'), the number of lines read
+        per second ('lines/sec') and whether the source is exhausted
+        ('done').
+        """
+        seconds = time.perf_counter() - self._start
+        return {
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'seconds': seconds,
+            'lines/sec': self.lines / seconds if seconds > 0 else 0.0,
+            'done': False
+        }
+
+
+def print_progress(report: Dict[str, Any]) -> None:
+    """Write a progress report returned by Progress.report to standard
+    error, on a single line rewritten by each report.
+    """
+    sys.stderr.write(f"\r{report['lines']} lines, "
+                     f"{report['bytes'] / 2 ** 20:.1f} MB read, "
+                     f"{report['lines/sec']:.0f} lines/sec")
+    if report['done']:
+        sys.stderr.write('\n')
+    sys.stderr.flush()
@@ -0,0 +1,198 @@
+"""Interval n-gram index
+
+=== Module description ===
+This file contains IntervalIndex, an inverted index from the n-grams of the
+interval sequences of melodies to the places they occur, used to find the
+melodies containing a run of intervals anywhere rather than only at their
+start.
+
+Every offset of an interval sequence is posted under the n intervals starting
+there, or fewer at the end of the sequence. A run of at least n intervals is
+looked up in the postings of its rarest n-gram, and a shorter run in the
+postings of the n-grams it starts, so no melody is scanned unless it has an
+n-gram of the run at the right offset.
+
+Removed entries are left in place until they are as many as the stored
+ones, and the index is then rebuilt from the stored entries, so that the
+postings of removed entries take at most as much memory as the others.
+"""
+from __future__ import annotations
+
+import heapq
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# The number of intervals of the n-grams indexed
+NGRAM_LENGTH = 3
+
+
+class IntervalIndex:
+    """An index of the runs of intervals of stored interval sequences.
+
+    === Attributes ===
+    n:
+        The number of intervals of the n-grams indexed.
+    """
+    n: int
+
+    # === Private Attributes ===
+    # The (value, weight, intervals) entries stored, by entry number, with
+    # None for the removed entries
+    _entries: List[Optional[Tuple[Any, float, Tuple[int, ...]]]]
+    # The postings of each n-gram, as consecutive entry numbers and offsets
+    _postings: Dict[Tuple[int, ...], array]
+    # The n-grams starting with each sequence of fewer than n intervals
+    _extensions: Dict[Tuple[int, ...], Set[Tuple[int, ...]]]
+    # The number of entries stored and not removed
+    _length: int
+
+    def __init__(self, n: int = NGRAM_LENGTH) -> None:
+        """Initialize an empty index of the <n>-grams of interval sequences.
+
+        Precondition: n > 0
+        """
+        self.n = n
+        self._entries = []
+        self._postings = {}
+        self._extensions = {}
+        self._length = 0
+
+    def __len__(self) -> int:
+        """Return the number of interval sequences stored in this index."""
+        return self._length
+
+    def insert(self, value: Any, weight: float, intervals: List[int]) -> None:
+        """Store <value> with <weight> under the interval sequence
+        <intervals>.
+        """
+        entry = len(self._entries)
+        intervals = tuple(intervals)
+        self._entries.append((value, weight, intervals))
+        self._length += 1
+
+        for offset in range(len(intervals)):
+            gram = intervals[offset:offset + self.n]
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('q')
+                for length in range(1, len(gram)):
+                    self._extensions.setdefault(gram[:length], set()).add(gram)
+            postings.append(entry)
+            postings.append(offset)
+
+    def index_items(self, items: Iterable[Tuple[Any, float, List[int]]]
+                    ) -> Iterator[Tuple[Any, float, List[int]]]:
+        """Yield the (value, weight, intervals) items of <items>, storing
+        each of them as it is yielded.
+        """
+        for value, weight, intervals in items:
+            self.insert(value, weight, intervals)
+            yield value, weight, intervals
+
+    def remove(self, prefix: List[int]) -> None:
+        """Remove every value whose interval sequence starts with <prefix>.
+
+        The entries starting with <prefix> are found in the postings of the
+        n-grams at offset 0, as in find_entries. The postings of the values
+        removed are skipped by search until the index is compacted.
+        """
+        prefix = tuple(prefix)
+        if not prefix:
+            self.__init__(self.n)
+            return
+
+        if len(prefix) < self.n:
+            grams = self._extensions.get(prefix, set())
+            if prefix in self._postings:
+                grams = grams | {prefix}
+        else:
+            grams = [prefix[:self.n]] if prefix[:self.n] in self._postings \
+                else []
+
+        for gram in grams:
+            postings = self._postings[gram]
+            for i in range(0, len(postings), 2):
+                entry = postings[i]
+                stored = self._entries[entry]
+                if postings[i + 1] == 0 and stored is not None and \
+                        stored[2][:len(prefix)] == prefix:
+                    self._entries[entry] = None
+                    self._length -= 1
+
+        if len(self._entries) > 2 * self._length:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rebuild this index from the entries stored, dropping the removed
+        entries and their postings.
+
+        Values of equal weight stay in the order they were stored.
+        """
+        entries = [stored for stored in self._entries if stored is not None]
+        self.__init__(self.n)
+        for value, weight, intervals in entries:
+            self.insert(value, weight, intervals)
+
+    def search(self, intervals: List[int],
+               limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> (value, weight) pairs of the values whose
+        interval sequences contain <intervals> as a contiguous run, in
+        non-increasing weight order.
+
+        Values of equal weight are in the order they were stored. Every value
+        is returned once, wherever the run occurs in its interval sequence.
+
+        Precondition: limit is None or limit > 0
+        """
+        matches = self.find_entries(tuple(intervals))
+        pairs = ((-self._entries[entry][1], entry) for entry in matches)
+        if limit is None:
+            best = sorted(pairs)
+        else:
+            best = heapq.nsmallest(limit, pairs)
+
+        return [self._entries[entry][:2] for _, entry in best]
+
+    def find_entries(self, intervals: Tuple[int, ...]) -> Set[int]:
+        """Return the numbers of the stored entries whose interval sequences
+        contain <intervals> as a contiguous run.
+        """
+        # every stored sequence contains the empty run
+        if not intervals:
+            return {entry for entry, stored in enumerate(self._entries)
+                    if stored is not None}
+
+        # the postings of the n-grams starting with a short run
+        if len(intervals) < self.n:
+            grams = self._extensions.get(intervals, set())
+            if intervals in self._postings:
+                grams = grams | {intervals}
+
+            matches = set()
+            for gram in grams:
+                matches.update(self._postings[gram][::2])
+            return {entry for entry in matches
+                    if self._entries[entry] is not None}
+
+        # the candidates of the rarest n-gram of the run, checked against the
+        # whole run
+        rarest = None
+        start = 0
+        for offset in range(len(intervals) - self.n + 1):
+            postings = self._postings.get(intervals[offset:offset + self.n])
+            if postings is None:
+                return set()
+            if rarest is None or len(postings) < len(rarest):
+                rarest = postings
+                start = offset
+
+        matches = set()
+        for i in range(0, len(rarest), 2):
+            entry = rarest[i]
+            stored = self._entries[entry]
+            offset = rarest[i + 1] - start
+            if stored is not None and offset >= 0 and \
+                    stored[2][offset:offset + len(intervals)] == intervals:
+                matches.add(entry)
+
+        return matches
@@ -0,0 +1,109 @@
+"""Parallel prefix tree building
+
+=== Module description ===
+This file contains from_items_parallel, which bulk loads a prefix tree in
+several processes.
+
+The items are partitioned into shards by the first element of their prefix
+sequence, so that no two shards store values under the same subtree of the
+root. Each shard is bulk loaded into its own tree by a worker process, and
+the subtrees of the roots of the shard trees are then grafted under a single
+root. The subtrees built from different shards are ordered by the first item
+they store, as the bulk loader orders them, so the tree is the same as the
+one built by from_items in a single process.
+
+Garbage collection is disabled in the worker processes and in this process
+while the shard trees are built and unpickled, as in load_snapshot, since
+none of the nodes created can be garbage, and the collections triggered by
+allocating them would otherwise take most of the build time.
+"""
+from __future__ import annotations
+
+import gc
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+from .prefix_tree import SimplePrefixTree
+
+
+def from_items_parallel(tree_class: Type[SimplePrefixTree],
+                        weight_type: str,
+                        items: Iterable[Tuple[Any, float, List]],
+                        top_k: Optional[int] = None,
+                        workers: Optional[int] = None) -> SimplePrefixTree:
+    """Return a new prefix tree of <tree_class> storing every
+    (value, weight, prefix) item, built by <workers> processes.
+
+    The tree is the same as tree_class.from_items(weight_type, items, top_k).
+    If <workers> is None, one process is used per CPU. The tree is built in
+    this process if the items cannot be split into more than one shard.
+
+    Preconditions: the arguments satisfy the preconditions of from_items,
+    and workers is None or workers > 0.
+    """
+    items = list(items)
+    shards = partition_items(items, workers or 0)
+    if len(shards) < 2:
+        return tree_class.from_items(weight_type, items, top_k)
+
+    pairs = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with ProcessPoolExecutor(len(shards), initializer=gc.disable) as pool:
+            jobs = [pool.submit(build_shard, tree_class, weight_type, shard)
+                    for shard in shards]
+            for job in jobs:
+                firsts, shard_tree = job.result()
+                pairs.extend(zip(firsts, shard_tree.subtrees))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    tree = tree_class(weight_type, top_k)
+    pairs.sort(key=lambda pair: (-pair[1].weight, pair[0]))
+    tree.graft([subtree for _, subtree in pairs])
+    return tree
+
+
+def partition_items(items: List[Tuple[Any, float, List]], count: int
+                    ) -> List[List[Tuple[int, Tuple[Any, float, List]]]]:
+    """Return the (index, item) pairs of <items> partitioned into at most
+    <count> non-empty shards by the first element of their prefix sequence.
+
+    All items whose prefix sequences start with the same element, or are
+    empty, are in the same shard. The largest groups of such items are
+    assigned first, each to the shard with the fewest items, to balance the
+    shards. If <count> is 0, one shard is made per CPU.
+    """
+    groups = {}
+    for index, item in enumerate(items):
+        prefix = item[2]
+        key = prefix[0] if prefix else None
+        groups.setdefault(key, []).append((index, item))
+
+    if count == 0:
+        count = os.cpu_count() or 1
+
+    shards = [[] for _ in range(min(count, len(groups)))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(shards, key=len).extend(group)
+
+    return shards
+
+
+def build_shard(tree_class: Type[SimplePrefixTree], weight_type: str,
+                shard: List[Tuple[int, Tuple[Any, float, List]]]
+                ) -> Tuple[List[int], SimplePrefixTree]:
+    """Return a tree of <tree_class> storing the items of <shard> and, for
+    each subtree of its root, the smallest index of the items it stores.
+
+    The root is not compressed, so that its subtrees can be grafted under
+    the root of the whole tree. This is run by the worker processes, and the
+    tree is returned to the parent process pickled.
+    """
+    tree = tree_class(weight_type)
+    pairs = tree.bulk_pairs(shard)
+    tree.set_subtrees([subtree for _, subtree in pairs], weight_type)
+    return [first for first, _ in pairs], tree
@@ -2,15 +2,38 @@
 
 This file contains the design of a public interface (Autocompleter) and two
 implementation of this interface, SimplePrefixTree and CompressedPrefixTree.
+
+The subtrees of both prefix trees are slotted SimplePrefixTreeNode and
+CompressedPrefixTreeNode objects, with their values stored in PrefixTreeLeaf
+records. Only the prefix trees themselves know their weight type.
 """
 from __future__ import annotations
 
-from typing import Any, List, Optional, Tuple, Union, Dict
+import heapq
+import sys
+from array import array
+from operator import itemgetter
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Sequence,
+                    Tuple, Union, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from .frozen import FrozenPrefixTree
+
+# The number of subtrees a tree needs before its non-leaf subtrees are indexed
+# in a dict. Smaller trees are scanned, which saves a dict in every tree of a
+# long chain.
+CHILD_INDEX_SIZE = 8
+
+# The cost of substituting an element of a prefix sequence for an element of
+# a query prefix, given the query element, the element and whether the query
+# element is the last one of the query prefix
+Substitution = Callable[[Any, Any, bool], float]
 
 
 class Autocompleter:
     """An abstract class representing the Autocompleter Abstract Data Type.
     """
+    __slots__ = ()
 
     def __len__(self) -> int:
         """Return the number of values stored in this Autocompleter."""
@@ -47,81 +70,216 @@ class Autocompleter:
         """
         raise NotImplementedError
 
+    def autocomplete_many(self, prefixes: Iterable[List],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[Any, float]]]:
+        """Return the autocomplete results of every prefix in <prefixes>,
+        with the same <limit>, in the order of <prefixes>.
+
+        Precondition: limit is None or limit > 0.
+        """
+        return [self.autocomplete(prefix, limit) for prefix in prefixes]
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order.
+
+        A value matches if its prefix sequence starts with a sequence that
+        the given prefix can be turned into by edits costing at most
+        <max_edits> in total. Inserting or deleting an element costs <gap>,
+        and substituting one costs what <substitution> returns for the query
+        element, the element and whether the query element is the last one,
+        or 1 for different elements if <substitution> is None.
+
+        Precondition: limit is None or limit > 0, and max_edits >= 0.
+        """
+        raise NotImplementedError
+
     def remove(self, prefix: List) -> None:
         """Remove all values that match the given prefix.
         """
         raise NotImplementedError
 
+    def increment(self, value: Any, delta: float) -> None:
+        """Add <delta> to the weight of the given value, which was already
+        inserted into this Autocompleter.
+
+        Raise a KeyError if the value is not in this Autocompleter.
+
+        Precondition: delta > 0
+        """
+        raise NotImplementedError
+
+    def remove_value(self, value: Any) -> None:
+        """Remove the given value, if it is in this Autocompleter.
+        """
+        raise NotImplementedError
+
+    def prefix_of(self, value: Any) -> Optional[List]:
+        """Return the prefix sequence the given value was inserted with, or
+        None if it is not in this Autocompleter.
+        """
+        raise NotImplementedError
+
 
 ################################################################################
-# SimplePrefixTree
+# PrefixTreeLeaf
 ################################################################################
-class SimplePrefixTree(Autocompleter):
-    """A simple prefix tree.
+class PrefixTreeLeaf:
+    """A leaf of a prefix tree, storing a value that was inserted into the
+    tree.
 
     === Attributes ===
     value:
-        The value stored at the root of this prefix tree, or [] if this
-        prefix tree is empty.
+        The value that was inserted into the tree.
     weight:
-        The weight of this prefix tree. If this tree is a leaf, this attribute
-        stores the weight of the value stored in the leaf. If this tree is
-        not a leaf and non-empty, this attribute stores the *aggregate weight*
-        of the leaf weights in this tree.
-    subtrees:
-        A list of subtrees of this prefix tree.
+        The weight of the value.
+    """
+    __slots__ = ('value', 'weight', '_parent', '_position')
+    value: Any
+    weight: float
 
-    === Representation invariants ===
-    - self.weight >= 0
+    # === Private Attributes ===
+    # The tree this leaf is a subtree of, or None if it is not a subtree
+    _parent: Optional[SimplePrefixTreeNode]
+    # The last known index of this leaf in the subtrees of its parent, see
+    # SimplePrefixTreeNode.position_of
+    _position: int
 
-    - (EMPTY TREE):
-        If self.weight == 0, then self.value == [] and self.subtrees == [].
-        This represents an empty simple prefix tree.
-    - (LEAF):
-        If self.subtrees == [] and self.weight > 0, this tree is a leaf.
-        (self.value is a value that was inserted into this tree.)
-    - (NON-EMPTY, NON-LEAF):
-        If len(self.subtrees) > 0, then self.value is a list (*common prefix*),
-        and self.weight > 0 (*aggregate weight*).
+    def __init__(self, value: Any, weight: float) -> None:
+        """Initialize a leaf storing <value> with the given weight.
 
-    - ("prefixes grow by 1")
-      If len(self.subtrees) > 0, and subtree in self.subtrees, and subtree
-      is non-empty and not a leaf, then
+        Precondition: weight > 0
+        """
+        self.value = value
+        self.weight = weight
+        self._parent = None
+        self._position = 0
 
-          subtree.value == self.value + [x], for some element x
+    def __len__(self) -> int:
+        """Return the number of values stored in this leaf."""
+        return 1
 
-    - self.subtrees does not contain any empty prefix trees.
-    - self.subtrees is *sorted* in non-increasing order of their weights.
-      Note that this applies to both leaves and non-leaf subtrees:
-      both can appear in the same self.subtrees list, and both have a `weight`
-      attribute.
+    @property
+    def subtrees(self) -> List:
+        """A leaf has no subtrees."""
+        return []
+
+    def is_empty(self) -> bool:
+        """Return whether this leaf is empty, which it never is."""
+        return False
+
+    def is_leaf(self) -> bool:
+        """Return whether this is a leaf, which it always is."""
+        return True
+
+    def max_leaf_weight(self) -> float:
+        """Return the largest weight of a leaf in this tree.
+        """
+        return self.weight
+
+    def get_leaf(self, value: Any) -> PrefixTreeLeaf:
+        """Return this leaf, which stores <value>.
+        """
+        return self
+
+    def get_total_leaf_weights(self) -> float:
+        """Return the total weights of the leaves of the tree.
+        """
+        return self.weight
+
+    def _str_indented(self, depth: int = 0) -> str:
+        """Return an indented string representation of this leaf.
+        """
+        return '  ' * depth + f'{self.value} ({self.weight})\n'
+
+
+Subtree = Union['SimplePrefixTreeNode', PrefixTreeLeaf]
+
+
+################################################################################
+# SimplePrefixTree
+################################################################################
+class SimplePrefixTreeNode:
+    """A non-leaf tree of a SimplePrefixTree.
+
+    Values can only be inserted into or removed from the SimplePrefixTree
+    itself, which passes its weight type down to its subtrees.
+
+    === Attributes ===
+    value:
+        The value stored at the root of this prefix tree, or [] if this
+        prefix tree is empty.
+    weight:
+        The *aggregate weight* of the leaf weights in this tree, or 0 if this
+        tree is empty.
+    subtrees:
+        A list of subtrees of this prefix tree.
     """
-    value: Any
+    __slots__ = ('_value', '_parent', '_position', 'weight', 'subtrees',
+                 '_length', '_leaf_sum', '_max_weight', '_children', '_top')
     weight: float
-    subtrees: List[SimplePrefixTree]
+    subtrees: List[Subtree]
 
     # === Private Attributes ===
-    # Specifies how the aggregate weight of non-leaf trees should be calculated
-    _weight_type: str
+    # The last element of the common prefix of this tree
+    _value: Any
+    # The tree this tree is a subtree of, or None if it is not a subtree
+    _parent: Optional[SimplePrefixTreeNode]
+    # The last known index of this tree in the subtrees of its parent, see
+    # position_of
+    _position: int
     # The number of values stored in the tree
     _length: int
-
-    def __init__(self, weight_type: str) -> None:
-        """Initialize an empty simple prefix tree.
-
-        Precondition: weight_type == 'sum' or weight_type == 'average'.
-
-        The given <weight_type> value specifies how the aggregate weight
-        of non-leaf trees should be calculated.
+    # The total weight of the values stored in the tree
+    _leaf_sum: float
+    # The largest leaf weight in this tree. This bounds the weight of every
+    # value below it, whatever the weight type is.
+    _max_weight: float
+    # Maps the prefix element that follows self.value in each non-leaf subtree
+    # to that subtree, so that descending one level does not scan subtrees.
+    # This is None until the tree has more than CHILD_INDEX_SIZE subtrees.
+    _children: Optional[Dict[Any, SimplePrefixTreeNode]]
+    # The (value, weight) pairs of the heaviest values stored in the tree, in
+    # non-increasing weight order, if the prefix tree keeps them, or None.
+    # These lists are replaced rather than changed, so that a tree with a
+    # single non-leaf subtree shares the list of its subtree.
+    _top: Optional[List[Tuple[Any, float]]]
+
+    def __init__(self) -> None:
+        """Initialize an empty tree.
         """
-        self.value = []
+        self._value = []
+        self._parent = None
+        self._position = 0
         self.weight = 0.0
         self.subtrees = []
-        self._weight_type = weight_type
         self._length = 0
+        self._leaf_sum = 0.0
+        self._max_weight = 0.0
+        self._children = None
+        self._top = None
+
+    @property
+    def value(self) -> Any:
+        """The value stored at the root of this prefix tree.
+
+        The common prefix of a tree is rebuilt from the elements stored by the
+        trees above it, which takes time linear in its length.
+        """
+        prefix = []
+        tree = self
+        while tree._parent is not None:
+            prefix.append(tree._value)
+            tree = tree._parent
+        prefix.reverse()
+        return prefix
 
     def __len__(self) -> int:
-        """Return the number of values stored in this Autocompleter."""
+        """Return the number of values stored in this tree."""
         return self._length
 
     def is_empty(self) -> bool:
@@ -129,8 +287,10 @@ class SimplePrefixTree(Autocompleter):
         return self.weight == 0.0
 
     def is_leaf(self) -> bool:
-        """Return whether this simple prefix tree is a leaf."""
-        return self.weight > 0 and self.subtrees == []
+        """Return whether this simple prefix tree is a leaf, which it never is
+        since leaves are PrefixTreeLeaf records.
+        """
+        return False
 
     def __str__(self) -> str:
         """Return a string representation of this tree.
@@ -150,110 +310,339 @@ class SimplePrefixTree(Autocompleter):
                 s += subtree._str_indented(depth + 1)
             return s
 
-    def insert(self, value: Any, weight: float, prefix: List) -> None:
-        """Insert the given value into this Autocompleter.
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the number of non-leaf trees ('nodes') and leaves ('leaves')
+        in this tree, and the approximate number of bytes they use ('bytes').
 
-        The value is inserted with the given weight, and is associated with
-        the prefix sequence <prefix>.
+        The bytes count the trees, leaves and the lists and dicts they own,
+        but not the inserted values, prefix elements and weights.
+        """
+        stats = {'nodes': 0, 'leaves': 0, 'bytes': 0}
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree.is_leaf():
+                stats['leaves'] += 1
+                stats['bytes'] += sys.getsizeof(tree)
+            else:
+                stats['nodes'] += 1
+                stats['bytes'] += tree.get_node_size()
+                stack.extend(tree.subtrees)
 
-        If the value has already been inserted into this prefix tree
-        (compare values using ==), then the given weight should be *added* to
-        the existing weight of this value.
+        return stats
 
-        Preconditions:
-            weight > 0
-            The given value is either:
-                1) not in this Autocompleter
-                2) was previously inserted with the SAME prefix sequence
+    def get_node_size(self) -> int:
+        """Return the number of bytes used by this tree, its subtrees list and
+        its <_children> index.
         """
-        # check whether prefix is empty or not
-        if prefix:
-            subtree = self.get_matching_subtree(prefix)
-
-            # found subtree that matches given prefix
-            if subtree is not None:
-                subtree.insert(value, weight, prefix)
-                self.subtrees.sort(key=lambda s: s.weight, reverse=True)
-                self._length = sum([len(s) for s in self.subtrees])
-                self.weight = self.get_aggr_weight()
-
-            # prefix matches exactly with subtree value
-            elif self.value == prefix:
-                # check if the value is already inserted
-                sub = self.get_matching_subtree(value)
-                if sub is not None:
-                    sub.weight += weight
-                    self.weight = self.get_aggr_weight()
-                else:
-                    self.insert_spt(value, weight, prefix, len(prefix))
+        size = sys.getsizeof(self) + sys.getsizeof(self.subtrees)
+        if self._children is not None:
+            size += sys.getsizeof(self._children)
+        return size
 
-            # no subtree matches, create a brand new subtree
-            else:
-                self.insert_spt(value, weight, prefix, len(self.value))
-        else:
-            self.insert_spt(value, weight, prefix, len(prefix))
+    def new_node(self) -> SimplePrefixTreeNode:
+        """Return a new empty tree to be used as a subtree of this tree.
+        """
+        return SimplePrefixTreeNode()
 
     def insert_spt(self, value: Any, weight: float, prefix: List,
-                   depth: int) -> None:
-        """Inserting a new SimplePrefixTree into subtrees list.
+                   depth: int, weight_type: str) -> PrefixTreeLeaf:
+        """Inserting a value into this SimplePrefixTree, and return the leaf
+        storing it.
+
+        The trees on the path of <prefix> are walked down and then updated
+        back up through their parents, so the length of <prefix> is not
+        limited by the recursion limit.
+
+        Precondition: <prefix> starts with self.value.
 
         === Attributes ===
         value:
-            The string value to be inserted.
+            The value to be inserted.
         weight:
-            The weight of the string value.
+            The weight of the value.
         prefix:
-            The prefix sequence of the string value.
+            The prefix sequence of the value.
         depth:
-            The current prefix sequence depth of the tree.
+            The length of self.value, which is not stored in this tree.
+        weight_type:
+            The weight type of the SimplePrefixTree.
         """
-        # create new subtree
-        subtree = SimplePrefixTree(self._weight_type)
-        self.value = prefix[:depth]
+        # walk down to the deepest tree whose value starts <prefix>
+        tree = self
+        while depth < len(prefix):
+            subtree = tree.get_child(prefix[depth])
+            if subtree is None:
+                break
+            tree = subtree
+            depth += 1
+
+        # prefix matches exactly with tree value
+        if depth == len(prefix):
+            # check if the value is already inserted
+            subtree = tree.get_matching_leaf(value)
+            if subtree is not None:
+                subtree.weight += weight
+                added = 0
+            else:
+                subtree = PrefixTreeLeaf(value, weight)
+                tree.add_subtree(subtree)
+                added = 1
 
-        # check to whether continue recur downward or insert value directly
-        if depth < len(prefix):
-            subtree.insert_spt(value, weight, prefix, depth + 1)
+        # no subtree matches, create a brand new branch
         else:
-            subtree.value = value
-            subtree.weight += weight
-            subtree._length += 1
+            subtree = tree.create_branch(value, weight, prefix, depth)
+            tree.add_subtree(subtree)
+            added = 1
 
-        # update size, subtree list and weight
-        self._length += 1
-        self.subtrees.append(subtree)
-        self.subtrees.sort(key=lambda s: s.weight, reverse=True)
-        self.weight = self.get_aggr_weight()
+        tree.update_inserted(subtree, added, weight, self, weight_type)
+        return subtree.get_leaf(value)
+
+    def update_inserted(self, subtree: Subtree, added: int, weight: float,
+                        top: SimplePrefixTreeNode, weight_type: str) -> None:
+        """Update this tree and the trees above it, up to <top>, after a
+        value was inserted into <subtree>.
+
+        Only the inserted weight changed along the way, so the aggregates of
+        every tree are updated in constant time, from the bottom up.
+
+        === Attributes ===
+        subtree:
+            The subtree of this tree the value was inserted into.
+        added:
+            The number of values added, 0 if the value was already stored.
+        weight:
+            The inserted weight.
+        top:
+            The highest tree to update.
+        weight_type:
+            The weight type of the prefix tree.
+        """
+        tree = self
+        while True:
+            tree._length += added
+            tree._leaf_sum += weight
+            tree._max_weight = max(tree._max_weight, subtree.max_leaf_weight())
+            tree.weight = tree.get_aggr_weight(weight_type)
+            tree.reposition_subtree(subtree)
+
+            if tree is top:
+                return
+            subtree, tree = tree, tree._parent
+
+    def create_branch(self, value: Any, weight: float, prefix: List,
+                      depth: int) -> SimplePrefixTreeNode:
+        """Return a new subtree of this tree that stores only <value>, with
+        one level for each element of <prefix> after self.value.
+
+        Precondition: <prefix> is longer than self.value, and <depth> is the
+        length of self.value.
+        """
+        subtree = PrefixTreeLeaf(value, weight)
+
+        # every tree of the branch stores the single value, so its aggregates
+        # are those of the leaf whatever the weight type is
+        for length in range(len(prefix), depth, -1):
+            tree = self.new_node()
+            tree._value = prefix[length - 1]
+            tree.weight = weight
+            tree.subtrees.append(subtree)
+            subtree._parent = tree
+            tree._length = 1
+            tree._leaf_sum = weight
+            tree._max_weight = weight
+            subtree = tree
+
+        return subtree
+
+    def create_subtree(self, value: Any, subtrees: List[Subtree],
+                       weight_type: str) -> SimplePrefixTreeNode:
+        """Return a new non-leaf tree of the same type created with given
+        properties, with its weight aggregated from the given subtrees.
+
+        === Attributes ===
+        value:
+            The value of the new tree.
+        subtrees:
+            The subtrees of the new tree.
+        weight_type:
+            The weight type of the prefix tree.
+        """
+        tree = self.new_node()
+        tree._value = value
+        tree.set_subtrees(subtrees, weight_type)
+
+        return tree
+
+    def set_subtrees(self, subtrees: List[Subtree], weight_type: str) -> None:
+        """Add the given subtrees to this empty tree, in their order, and
+        aggregate their weights.
+
+        Precondition: <subtrees> is sorted in non-increasing weight order.
+        """
+        for subtree in subtrees:
+            self.add_subtree(subtree)
+            self._length += len(subtree)
+            self._leaf_sum += subtree.get_total_leaf_weights()
+        self.update_max_weight()
+        self.weight = self.get_aggr_weight(weight_type)
+
+    def bulk_branch(self, prefix: Tuple, depth: int,
+                    leaves: List[PrefixTreeLeaf],
+                    weight_type: str) -> SimplePrefixTreeNode:
+        """Return a new subtree storing the given leaves under the whole of
+        <prefix>, with one level for each element after the first <depth>.
+
+        This is used by the bulk loader, like create_branch is by insert.
+        Precondition: <leaves> is sorted in non-increasing weight order.
+        """
+        subtree = self.bulk_subtree(prefix, len(prefix), leaves, weight_type)
+
+        # every tree of the branch stores the same leaves, so its aggregates
+        # are those of the tree below it
+        for length in range(len(prefix) - 1, depth, -1):
+            tree = self.new_node()
+            tree._value = prefix[length - 1]
+            tree.weight = subtree.weight
+            tree.subtrees.append(subtree)
+            subtree._parent = tree
+            tree._length = subtree._length
+            tree._leaf_sum = subtree._leaf_sum
+            tree._max_weight = subtree._max_weight
+            subtree = tree
+
+        return subtree
+
+    def bulk_subtree(self, prefix: Tuple, length: int,
+                     subtrees: List[Subtree],
+                     weight_type: str) -> SimplePrefixTreeNode:
+        """Return a new subtree storing the first <length> elements of
+        <prefix> as its value, with the given subtrees.
+
+        This is used by the bulk loader. Precondition: <subtrees> is sorted
+        in non-increasing weight order.
+        """
+        return self.create_subtree(prefix[length - 1], subtrees, weight_type)
 
-    def get_aggr_weight(self) -> float:
-        """Return the aggregated weight of the current tree.
+    def clear(self) -> None:
+        """Remove every value stored in this tree, making it empty.
+        """
+        self._value = []
+        self.weight = 0.0
+        self.subtrees = []
+        self._children = None
+        self._length = 0
+        self._leaf_sum = 0.0
+        self._max_weight = 0.0
+        self._top = None
+
+    def get_aggr_weight(self, weight_type: str) -> float:
+        """Return the aggregated weight of the current tree for the given
+        weight type.
+
+        The weight is computed from the running total and number of values
+        stored in the tree, so this takes constant time.
         """
         # sum aggregated weight
-        if self._weight_type == 'sum':
-            weight = sum([sub.weight for sub in self.subtrees])
+        if weight_type == 'sum':
+            return self._leaf_sum
         # average aggregated weight
+        elif self._length > 0:
+            return self._leaf_sum / self._length
         else:
-            if len(self.subtrees) == 0:
-                weight = self.weight
-            elif len(self.subtrees) == 1:
-                weight = self.subtrees[0].weight
-            else:
-                sub_weight = self.get_total_leaf_weights()
-                weight = sub_weight / len(self)
+            return 0.0
+
+    def update_max_weight(self) -> None:
+        """Recompute the largest leaf weight of this tree from its subtrees.
+        """
+        self._max_weight = max([sub.max_leaf_weight()
+                                for sub in self.subtrees], default=0.0)
 
-        return weight
+    def max_leaf_weight(self) -> float:
+        """Return the largest weight of a leaf in this tree.
+        """
+        return self._max_weight
 
     def get_total_leaf_weights(self) -> float:
         """Return the total weights of the leaves of the tree.
         """
-        weight = 0
+        return self._leaf_sum
+
+    def collect_top(self, top_k: int) -> List[Tuple[Any, float]]:
+        """Return the (value, weight) pairs of the <top_k> heaviest values
+        stored in this tree, merged from the leaves and top values of its
+        subtrees.
+        """
+        if len(self.subtrees) == 1 and not self.subtrees[0].is_leaf():
+            return self.subtrees[0]._top
+
+        pairs = []
         for subtree in self.subtrees:
             if subtree.is_leaf():
-                weight += subtree.weight
+                pairs.append((subtree.value, subtree.weight))
             else:
-                weight += subtree.weight * len(subtree)
+                pairs.extend(subtree._top)
+        return heapq.nlargest(top_k, pairs, key=itemgetter(1))
+
+    def reposition_subtree(self, subtree: Subtree) -> None:
+        """Move <subtree>, whose weight has just changed, to its place in
+        self.subtrees.
+
+        The rest of self.subtrees is still sorted, so the new place is found
+        by binary search instead of sorting the whole list again. Subtrees of
+        equal weight keep their relative order, as with a stable sort.
+        """
+        subtrees = self.subtrees
+        index = self.position_of(subtree)
+        weight = subtree.weight
+
+        # weight went up, move before the lighter subtrees preceding it
+        if index > 0 and subtrees[index - 1].weight < weight:
+            lo, hi = 0, index
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if subtrees[mid].weight < weight:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            subtrees.insert(lo, subtrees.pop(index))
+            moved = range(lo, index + 1)
+
+        # weight went down, move after the heavier subtrees following it
+        elif index + 1 < len(subtrees) and subtrees[index + 1].weight > weight:
+            lo, hi = index + 1, len(subtrees)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if subtrees[mid].weight > weight:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            subtrees.insert(lo - 1, subtrees.pop(index))
+            moved = range(index, lo)
+
+        else:
+            return
+
+        # only the subtrees between the old and new places moved
+        for position in moved:
+            subtrees[position]._position = position
 
-        return weight
+    def position_of(self, subtree: Subtree) -> int:
+        """Return the index of <subtree> in self.subtrees.
+
+        Every subtree stores its last known index, which is kept up to date
+        when it is added or repositioned, so it is found without scanning
+        self.subtrees. Removing a subtree or building the subtrees in bulk
+        leaves the stored indices out of date, so they are checked, and the
+        indices of every subtree stored again when they are wrong.
+        """
+        subtrees = self.subtrees
+        position = subtree._position
+        if position >= len(subtrees) or subtrees[position] is not subtree:
+            for position, sub in enumerate(subtrees):
+                sub._position = position
+            position = subtree._position
+        return position
 
     def autocomplete(self, prefix: List,
                      limit: Optional[int] = None) -> List[Tuple[Any, float]]:
@@ -266,31 +655,176 @@ class SimplePrefixTree(Autocompleter):
 
         Precondition: limit is None or limit > 0.
         """
+        # tree is empty
+        if self.is_empty():
+            return []
+
+        return self.complete(self.find_subtree(prefix), limit)
+
+    def autocomplete_many(self, prefixes: Iterable[List],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[Any, float]]]:
+        """Return the autocomplete results of every prefix in <prefixes>,
+        with the same <limit>, in the order of <prefixes>.
+
+        The prefixes are looked up in sorted order, keeping the path of trees
+        matched by the previous prefix, so that each prefix only descends
+        from where it leaves the previous one instead of from the root.
+
+        Precondition: limit is None or limit > 0.
+        """
+        prefixes = list(prefixes)
+        results = [[] for _ in prefixes]
+
+        # tree is empty
+        if self.is_empty():
+            return results
+
+        # prefixes whose elements cannot be compared are looked up in order
+        try:
+            order = sorted(range(len(prefixes)), key=prefixes.__getitem__)
+        except TypeError:
+            order = range(len(prefixes))
+
+        # path[depth] is the tree storing every value matching the first
+        # <depth> elements of the previous prefix
+        path = [self]
+        previous = []
+        for index in order:
+            prefix = prefixes[index]
+            del path[find_common_prefix_len(previous, prefix) + 1:]
+            previous = prefix
+
+            tree = path[-1]
+            while tree is not None and len(path) <= len(prefix):
+                tree = tree.descend(prefix, len(path) - 1)
+                if tree is not None:
+                    path.append(tree)
+
+            results[index] = self.complete(tree, limit)
+
+        return results
+
+    def complete(self, tree: Optional[SimplePrefixTreeNode],
+                 limit: Optional[int]) -> List[Tuple[Any, float]]:
+        """Return up to <limit> of the heaviest values stored in <tree>, a
+        tree returned by find_subtree, in non-increasing weight order.
+
+        Return an empty list if <tree> is None.
+        """
+        result = []
+
+        # no match found
+        if tree is None:
+            return result
+
+        # the heaviest values kept by the tree are enough
+        top = tree._top
+        if top is not None and (len(top) == len(tree)
+                                or (limit is not None and limit <= len(top))):
+            return top[:limit]
+
+        new_limit = limit if limit else float('inf')
+        tree.autocomplete_helper(new_limit, result)
+        return result
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order.
+
+        The trees are walked best-first by their largest leaf weight, like
+        autocomplete_helper, keeping for each tree the last row of the edit
+        distance table between the given prefix and its value. Trees whose
+        row exceeds <max_edits> everywhere are pruned, and every value of a
+        tree whose value is within <max_edits> of the whole prefix matches.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
         result = []
 
         # tree is empty
         if self.is_empty():
             return result
 
-        # prefix matches subtree value
-        elif prefix in (self.value, self.value[:len(prefix)]):
-            new_limit = limit if limit else float('inf')
-            self.autocomplete_helper(new_limit, result)
-            return sorted(result, key=lambda s: s[1], reverse=True)
+        if substitution is None:
+            substitution = unit_substitution
+        if limit is None:
+            limit = len(self)
+
+        # None stands for the row of a tree whose values all match
+        row = [0.0] + [gap * length for length in range(1, len(prefix) + 1)]
+        matched = row[-1] <= max_edits
+        if not matched:
+            step = fuzzy_step(row, self.value, prefix, max_edits,
+                              substitution, gap)
+            if step is None:
+                return result
+            row, matched = step
+
+        heap = [(-self.max_leaf_weight(), 0, self, None if matched else row)]
+        count = 0
+        while heap and len(result) < limit:
+            _, _, tree, row = heapq.heappop(heap)
+
+            # the leaves popped are those of matching trees
+            if tree.is_leaf():
+                result.append((tree.value, tree.weight))
+                continue
+
+            for subtree in reversed(tree.subtrees):
+                subtree_row = None
+                if row is not None:
+                    # a leaf of a tree that does not match
+                    if subtree.is_leaf():
+                        continue
+
+                    step = fuzzy_step(row, tree.edge_label(subtree), prefix,
+                                      max_edits, substitution, gap)
+                    if step is None:
+                        continue
+                    subtree_row = None if step[1] else step[0]
+
+                count -= 1
+                heapq.heappush(heap, (-subtree.max_leaf_weight(), count,
+                                      subtree, subtree_row))
 
-        # finding subtree that match the prefix
-        else:
-            # find the subtree that contains given prefix
-            subtree = self.get_matching_subtree(prefix)
-            if subtree is not None:
-                result.extend(subtree.autocomplete(prefix, limit))
+        return result
+
+    def find_subtree(self, prefix: List) -> Optional[SimplePrefixTreeNode]:
+        """Return the tree storing every value matching the given prefix, or
+        None if no value matches it.
+        """
+        # finding the subtree whose value is the prefix, one element at a time
+        tree = self
+        for depth in range(len(self.value), len(prefix)):
+            tree = tree.get_child(prefix[depth])
 
             # no match found
-            return result
+            if tree is None:
+                return None
+
+        return tree
+
+    def descend(self, prefix: List,
+                depth: int) -> Optional[SimplePrefixTreeNode]:
+        """Return the tree storing every value matching the first
+        <depth> + 1 elements of <prefix>, or None if no value matches them.
+
+        Precondition: this tree stores every value matching the first <depth>
+        elements of <prefix>, and depth < len(prefix).
+        """
+        return self.get_child(prefix[depth])
 
     def autocomplete_helper(self, limit: int, result: List) -> None:
-        """Find all values stored under current tree and add them to given
-        result list.
+        """Find the <limit> heaviest values stored under current tree and add
+        them to given result list in non-increasing weight order.
+
+        Subtrees are expanded best-first from a heap keyed on their largest
+        leaf weight, so only the subtrees that can still hold one of the
+        heaviest values are visited. Ties are expanded in subtree order.
 
         === Attributes ===
         limit:
@@ -298,79 +832,268 @@ class SimplePrefixTree(Autocompleter):
         result:
             The result list to put all the values found in.
         """
-        items = []
-        for subtree in self.subtrees:
-            # reaches limit - immediately returns
-            if len(items) == limit:
-                break
+        heap = [(-self.max_leaf_weight(), 0, self)]
+        count = 0
+        found = 0
+        while heap and found < limit:
+            _, _, tree = heapq.heappop(heap)
+
+            # tree value is actual word
+            if tree.is_leaf():
+                result.append((tree.value, tree.weight))
+                found += 1
+                continue
+
+            # tree value is prefix sequence, the first subtree is pushed last
+            # so that it is popped first among equal bounds
+            for subtree in reversed(tree.subtrees):
+                count -= 1
+                heapq.heappush(heap, (-subtree.max_leaf_weight(), count,
+                                      subtree))
+
+    def remove_spt(self, prefix: List, depth: int, weight_type: str
+                   ) -> Optional[SimplePrefixTreeNode]:
+        """Removing all values that match the given prefix from this
+        SimplePrefixTree.
+
+        Return the lowest tree still storing values that some were removed
+        from, this tree if it is empty, or None if no value was removed.
+
+        Precondition: <prefix> starts with self.value.
 
-            # subtree value is prefix sequence
-            if not subtree.is_leaf():
-                new_limit = limit - len(items)
-                subtree.autocomplete_helper(new_limit, items)
-            # subtree value is actual word
-            else:
-                items.append((subtree.value, subtree.weight))
-
-        result.extend(items)
+        === Attributes ===
+        prefix:
+            The prefix sequence of the values to remove.
+        depth:
+            The length of self.value, which is not stored in this tree.
+        weight_type:
+            The weight type of the SimplePrefixTree.
+        """
+        # find the tree whose value is the prefix, one element at a time
+        tree = self
+        while depth < len(prefix):
+            tree = tree.get_child(prefix[depth])
+
+            # no value matches
+            if tree is None:
+                return None
+            depth += 1
+
+        length = len(tree)
+        total = tree.get_total_leaf_weights()
+        tree.clear()
+
+        # the subtree on the path below each tree is indexed by the prefix
+        # element at its depth
+        lowest = None
+        while tree is not self:
+            depth -= 1
+            parent = tree._parent
+            parent.update_removed(tree, prefix[depth], length, total,
+                                  weight_type)
+            if lowest is None and len(parent) > 0:
+                lowest = parent
+            tree = parent
+
+        return self if lowest is None else lowest
+
+    def update_removed(self, subtree: SimplePrefixTreeNode, key: Any,
+                       length: int, total: float, weight_type: str) -> None:
+        """Update this tree after values were removed from <subtree>.
 
-    def remove(self, prefix: List) -> None:
-        """Remove all values that match the given prefix.
+        === Attributes ===
+        subtree:
+            The subtree values were removed from.
+        key:
+            The prefix element the subtree is indexed by.
+        length:
+            The number of values removed.
+        total:
+            The total weight of the values removed.
+        weight_type:
+            The weight type of the prefix tree.
         """
-        # tree is empty
-        if self.is_empty():
-            return
+        self._length -= length
+        self._leaf_sum -= total
 
-        # prefix equal to subtree value
-        elif prefix == self.value:
-            self.subtrees = []
-            self.weight = 0.0
-            self.value = []
-            self._length -= 1
+        # only remove subtree if it is a empty subtree
+        if subtree.is_empty():
+            self.remove_subtree(subtree, key)
+        else:
+            self.reposition_subtree(subtree)
 
-        # look for subtree with matching value
+        # update weight
+        if self._length == 0:
+            self.clear()
         else:
-            # find subtree and recur call into that subtree
-            subtree = self.get_matching_subtree(prefix)
-            if subtree is not None:
-                subtree.remove(prefix)
+            self.update_max_weight()
+            self.weight = self.get_aggr_weight(weight_type)
 
-                # only remove subtree if it is a empty subtree
-                if subtree.is_empty():
-                    self.subtrees.remove(subtree)
+    def remove_leaf(self, leaf: PrefixTreeLeaf, top: SimplePrefixTreeNode,
+                    weight_type: str) -> SimplePrefixTreeNode:
+        """Remove <leaf>, a subtree of this tree, and update this tree and
+        the trees above it, up to <top>.
 
-                # update weight
-                self._length = sum([len(sub) for sub in self.subtrees])
-                self.weight = self.get_aggr_weight()
+        Return the lowest tree still storing values, or <top> if it is empty.
+        Only the trees on the path from <leaf> to <top> are updated, so this
+        takes time linear in the depth of <leaf>.
+        """
+        # the prefix elements the trees on the path are indexed by, read
+        # before the trees are emptied
+        path = []
+        tree = self
+        while tree is not top:
+            path.append((tree, tree._parent.edge_key(tree)))
+            tree = tree._parent
+
+        self.remove_subtree(leaf)
+        self._length -= 1
+        self._leaf_sum -= leaf.weight
+        if self._length == 0:
+            self.clear()
+        else:
+            self.update_max_weight()
+            self.weight = self.get_aggr_weight(weight_type)
+        self.compress()
+
+        lowest = self if len(self) > 0 else None
+        for tree, key in path:
+            parent = tree._parent
+            parent.update_removed(tree, key, 1, leaf.weight, weight_type)
+            parent.compress()
+            if lowest is None and len(parent) > 0:
+                lowest = parent
+
+        return top if lowest is None else lowest
+
+    def compress(self) -> None:
+        """Merge the only subtree of this tree into it, if it is a non-leaf
+        tree. Simple prefix trees are never compressed.
+        """
 
-    def get_matching_subtree(self, prefix: Union[List, str],
+    def get_matching_subtree(self, prefix: List,
                              both_way: bool = False) -> Optional[Any]:
         """Return the subtree that partially/fully matches with given prefix.
 
+        Precondition: <prefix> starts with self.value.
+
         === Attributes ===
         prefix:
-            The given prefix sequence or value to match with subtree values.
+            The given prefix sequence to match with subtree values.
         both_way:
             The condition variable to also check whether value contains prefix.
         """
+        depth = len(self.value)
+        if len(prefix) <= depth:
+            return None
+
+        # every non-leaf subtree value is self.value + [x], so the element
+        # after self.value is enough to identify the subtree
+        return self.get_child(prefix[depth])
+
+    def get_child(self, key: Any) -> Optional[SimplePrefixTreeNode]:
+        """Return the non-leaf subtree whose value continues self.value with
+        the prefix element <key>, or None if there is no such subtree.
+        """
+        if self._children is not None:
+            return self._children.get(key)
+
         for subtree in self.subtrees:
-            # check if subtree.value is part of prefix
-            if prefix[:len(subtree.value)] == subtree.value:
+            if not subtree.is_leaf() and self.edge_key(subtree) == key:
                 return subtree
 
-            # check if prefix is part of subtree.value
-            elif both_way and subtree.value[:len(prefix)] == prefix:
+        # no subtree found
+        return None
+
+    def edge_key(self, subtree: SimplePrefixTreeNode) -> Any:
+        """Return the element following self.value in the value of the
+        non-leaf <subtree>, which is the only element the subtree stores.
+        """
+        return subtree._value
+
+    def edge_label(self, subtree: SimplePrefixTreeNode) -> List:
+        """Return the elements following self.value in the value of the
+        non-leaf <subtree>.
+        """
+        return [subtree._value]
+
+    def get_leaf(self, value: Any) -> PrefixTreeLeaf:
+        """Return the leaf storing <value> in this branch, a chain of trees
+        created by create_branch.
+        """
+        tree = self
+        while not tree.is_leaf():
+            tree = tree.subtrees[0]
+        return tree
+
+    def get_matching_leaf(self, value: Any) -> Optional[PrefixTreeLeaf]:
+        """Return the leaf directly under this tree that stores <value>, or
+        None if there is no such leaf.
+        """
+        for subtree in self.subtrees:
+            if subtree.is_leaf() and subtree.value == value:
                 return subtree
 
-        # no subtree found
+        # no leaf found
         return None
 
+    def add_subtree(self, subtree: Subtree) -> None:
+        """Append <subtree> to self.subtrees and index it in <_children>.
 
-################################################################################
-# CompressedPrefixTree
-################################################################################
-class CompressedPrefixTree(SimplePrefixTree):
-    """A compressed prefix tree implementation.
+        The subtrees list is not re-sorted.
+        """
+        subtree._position = len(self.subtrees)
+        self.subtrees.append(subtree)
+        subtree._parent = self
+
+        if self._children is not None:
+            self._index_subtree(subtree)
+
+        # large enough to index every non-leaf subtree
+        elif len(self.subtrees) > CHILD_INDEX_SIZE:
+            self._children = {}
+            for sub in self.subtrees:
+                self._index_subtree(sub)
+
+    def remove_subtree(self, subtree: Subtree,
+                       key: Optional[Any] = None) -> None:
+        """Remove <subtree> from self.subtrees and from <_children>.
+
+        <key> is the prefix element <subtree> is indexed by. It has to be
+        given explicitly since an emptied subtree no longer has its value.
+        """
+        position = self.position_of(subtree)
+        del self.subtrees[position]
+        for position in range(position, len(self.subtrees)):
+            self.subtrees[position]._position = position
+        subtree._parent = None
+        if (key is not None and self._children is not None
+                and self._children.get(key) is subtree):
+            del self._children[key]
+
+    def replace_subtree(self, subtree: Subtree,
+                        new_subtree: SimplePrefixTreeNode) -> None:
+        """Put <new_subtree> in the place of <subtree> in self.subtrees.
+
+        Both subtrees must start with the same prefix element after
+        self.value.
+        """
+        position = self.position_of(subtree)
+        self.subtrees[position] = new_subtree
+        new_subtree._position = position
+        new_subtree._parent = self
+        if self._children is not None:
+            self._index_subtree(new_subtree)
+
+    def _index_subtree(self, subtree: Subtree) -> None:
+        """Index <subtree> in <_children> if it is not a leaf.
+        """
+        if not subtree.is_leaf():
+            self._children[self.edge_key(subtree)] = subtree
+
+
+class SimplePrefixTree(SimplePrefixTreeNode, Autocompleter):
+    """A simple prefix tree.
 
     === Attributes ===
     value:
@@ -397,34 +1120,152 @@ class CompressedPrefixTree(SimplePrefixTree):
         If len(self.subtrees) > 0, then self.value is a list (*common prefix*),
         and self.weight > 0 (*aggregate weight*).
 
-    - This tree does not contain any compressible internal values.
+    - ("prefixes grow by 1")
+      If len(self.subtrees) > 0, and subtree in self.subtrees, and subtree
+      is non-empty and not a leaf, then
+
+          subtree.value == self.value + [x], for some element x
 
     - self.subtrees does not contain any empty prefix trees.
     - self.subtrees is *sorted* in non-increasing order of their weights.
       Note that this applies to both leaves and non-leaf subtrees:
       both can appear in the same self.subtrees list, and both have a `weight`
       attribute.
+
+    Leaves are PrefixTreeLeaf records and non-leaf subtrees are
+    SimplePrefixTreeNode objects. A non-leaf tree does not keep a copy of its
+    common prefix. It only stores the element x it adds to the value of its
+    parent, and self.value is rebuilt from the trees above it whenever it is
+    read.
     """
-    value: Optional[Any]
-    weight: float
-    subtrees: List[CompressedPrefixTree]
-    _length: int
+    __slots__ = ('_weight_type', '_top_k', '_leaves')
+
+    # === Private Attributes ===
+    # Specifies how the aggregate weight of non-leaf trees should be
+    # calculated. It is only stored here and passed down to the subtrees.
     _weight_type: str
+    # The number of heaviest values every tree keeps in <_top>, or None if
+    # they are not kept
+    _top_k: Optional[int]
+    # Maps every value stored in the tree to its leaf, so that the leaf of a
+    # value is found without its prefix sequence. The path from a leaf to
+    # the root is followed through the parents of the trees.
+    _leaves: Dict[Any, PrefixTreeLeaf]
+
+    def __init__(self, weight_type: str, top_k: Optional[int] = None) -> None:
+        """Initialize an empty simple prefix tree.
 
-    def find_max_common_subtree(self, prefix: List
-                                ) -> Tuple[List, CompressedPrefixTree]:
-        """Returns the subtree with common prefix as the given prefix sequence.
+        Precondition: weight_type == 'sum' or weight_type == 'average', and
+        top_k is None or top_k > 0.
+
+        The given <weight_type> value specifies how the aggregate weight
+        of non-leaf trees should be calculated. If <top_k> is given, every
+        tree keeps its <top_k> heaviest values, and autocomplete returns them
+        without searching the tree when limit <= top_k.
+        """
+        super().__init__()
+        self._weight_type = weight_type
+        self._top_k = top_k
+        self._leaves = {}
+        if top_k:
+            self._top = []
+
+    def get_node_size(self) -> int:
+        """Return the number of bytes used by this tree, its subtrees list,
+        its <_children> index and the index of the leaves of its values.
         """
-        result = ([], None)
-        prefix_subtrees = [tree for tree in self.subtrees
-                           if isinstance(tree.value, list)]
+        return super().get_node_size() + sys.getsizeof(self._leaves)
 
-        for item in prefix_subtrees:
-            common_len = find_common_prefix_len(prefix, item.value)
-            if len(result[0]) < common_len:
-                result = prefix[:common_len], item
+    def __getstate__(self) -> Tuple:
+        """Return the state of this tree to pickle.
 
-        return result
+        The trees are listed in preorder, so that pickling a tree does not
+        recurse once per level. Each chain of trees with a single non-leaf
+        subtree is listed once, with the values of all of its trees, since
+        they share their aggregates.
+        """
+        # the number of subtrees of the last tree of each chain, or -1 for
+        # leaves, and the values of the trees of each chain or of each leaf
+        sizes = array('l')
+        values = []
+        weights = array('d')
+        lengths = array('l')
+        totals = array('d')
+        max_weights = array('d')
+
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            weights.append(tree.weight)
+            if tree.is_leaf():
+                sizes.append(-1)
+                values.append(tree.value)
+                continue
+
+            lengths.append(tree._length)
+            totals.append(tree._leaf_sum)
+            max_weights.append(tree._max_weight)
+            chain = [tree._value]
+            while len(tree.subtrees) == 1 and not tree.subtrees[0].is_leaf():
+                tree = tree.subtrees[0]
+                chain.append(tree._value)
+            sizes.append(len(tree.subtrees))
+            values.append(chain)
+            stack.extend(reversed(tree.subtrees))
+
+        return (self._weight_type, self._top_k, sizes, values, weights,
+                lengths, totals, max_weights)
+
+    def __setstate__(self, state: Tuple) -> None:
+        """Rebuild this tree from the state returned by __getstate__.
+
+        The heaviest values kept by the trees are collected again rather
+        than pickled.
+        """
+        weight_type, top_k, sizes, values, weights, lengths, totals, \
+            max_weights = state
+        SimplePrefixTree.__init__(self, weight_type, top_k)
+
+        # the trees still missing subtrees, with the number they miss
+        stack = []
+        parent = None
+        missing = 0
+        node_stats = zip(lengths, totals, max_weights)
+        for size, value, weight in zip(sizes, values, weights):
+            if size < 0:
+                tree = PrefixTreeLeaf(value, weight)
+                subtree = tree
+                self._leaves[value] = tree
+            else:
+                # every tree of a chain has the same aggregates, and only
+                # its last tree can have more than one subtree
+                length, total, max_weight = next(node_stats)
+                tree = self if parent is None else parent.new_node()
+                subtree = tree
+                for index, chain_value in enumerate(value):
+                    if index > 0:
+                        subtree.subtrees.append(subtree.new_node())
+                        subtree.subtrees[0]._parent = subtree
+                        subtree = subtree.subtrees[0]
+                    subtree._value = chain_value
+                    subtree.weight = weight
+                    subtree._length = length
+                    subtree._leaf_sum = total
+                    subtree._max_weight = max_weight
+
+            if parent is not None:
+                parent.add_subtree(tree)
+                missing -= 1
+            if size > 0:
+                if missing:
+                    stack.append((parent, missing))
+                parent, missing = subtree, size
+            else:
+                while missing == 0 and stack:
+                    parent, missing = stack.pop()
+
+        if top_k:
+            self.collect_all_top()
 
     def insert(self, value: Any, weight: float, prefix: List) -> None:
         """Insert the given value into this Autocompleter.
@@ -442,37 +1283,481 @@ class CompressedPrefixTree(SimplePrefixTree):
                 1) not in this Autocompleter
                 2) was previously inserted with the SAME prefix sequence
         """
+        # the value is already inserted, its leaf is found without the prefix
+        if value in self._leaves:
+            self.increment(value, weight)
+            return
+
+        leaf = self.insert_spt(value, weight, prefix, 0, self._weight_type)
+        self._leaves[value] = leaf
+        if self._top_k:
+            self.update_top_inserted(leaf)
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix.
+        """
         # tree is empty
         if self.is_empty():
-            self.value = prefix
-            self.weight = weight
-            subtree = self.create_subtree(value, weight)
-            self.subtrees.append(subtree)
-            self._length += 1
             return
 
-        # if self.value has values in it
-        elif self.value:
-            clone_tree = self.create_subtree(self.value, self.weight,
-                                             self.subtrees, self._length)
-            subtree = self.create_subtree([], self.weight, [clone_tree],
-                                          self._length)
-            subtree.insert_cpt(value, weight, prefix)
-            if len(subtree.subtrees) > 1:
-                self.value = []
-                self.subtrees = subtree.subtrees
-                self._length = subtree._length
+        self.forget_leaves(self.find_subtree(prefix))
+        tree = self.remove_spt(prefix, 0, self._weight_type)
+        if self._top_k and tree is not None:
+            self.update_top_removed(tree)
+
+    def increment(self, value: Any, delta: float) -> None:
+        """Add <delta> to the weight of the given value, which was already
+        inserted into this tree.
+
+        The leaf of the value is found in the index of leaves, and only the
+        trees above it are updated, so this takes time linear in the length
+        of its prefix sequence.
+
+        Raise a KeyError if the value is not in this tree.
+
+        Precondition: delta > 0
+        """
+        leaf = self._leaves[value]
+        leaf.weight += delta
+        leaf._parent.update_inserted(leaf, 0, delta, self, self._weight_type)
+        if self._top_k:
+            self.update_top_inserted(leaf)
+
+    def remove_value(self, value: Any) -> None:
+        """Remove the given value, if it is in this tree.
+
+        Like increment, this only updates the trees above the leaf of the
+        value.
+        """
+        leaf = self._leaves.pop(value, None)
+        if leaf is None:
+            return
+
+        tree = leaf._parent.remove_leaf(leaf, self, self._weight_type)
+        if self._top_k:
+            self.update_top_removed(tree)
+
+    def prefix_of(self, value: Any) -> Optional[List]:
+        """Return the prefix sequence the given value was inserted with, or
+        None if it is not in this tree.
+        """
+        leaf = self._leaves.get(value)
+        if leaf is None:
+            return None
+        return leaf._parent.value
+
+    def index_leaves(self) -> None:
+        """Index the leaves of every value stored in this tree.
+        """
+        self._leaves = {}
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree.is_leaf():
+                self._leaves[tree.value] = tree
             else:
-                self.value = subtree.subtrees[0].value
-                self.subtrees = subtree.subtrees[0].subtrees
-                self._length = subtree.subtrees[0]._length
+                stack.extend(tree.subtrees)
 
-            self.weight = self.get_aggr_weight()
-        else:
-            self.insert_cpt(value, weight, prefix)
+    def forget_leaves(self, tree: Optional[SimplePrefixTreeNode]) -> None:
+        """Remove the leaves of the values stored in <tree> from the index of
+        leaves, before they are removed from this tree.
+        """
+        stack = [] if tree is None else [tree]
+        while stack:
+            tree = stack.pop()
+            if tree.is_leaf():
+                del self._leaves[tree.value]
+            else:
+                stack.extend(tree.subtrees)
+
+    def update_top_inserted(self, leaf: PrefixTreeLeaf) -> None:
+        """Update the heaviest values kept by the trees above <leaf>, whose
+        value was just inserted or had its weight increased.
+
+        The weights of the other values did not change, so the value only
+        has to be moved up or added in each list.
+        """
+        pair = (leaf.value, leaf.weight)
+        tree = leaf._parent
+        while tree is not None:
+            # the tree was just created, or has a single non-leaf subtree
+            if tree._top is None or (len(tree.subtrees) == 1
+                                     and not tree.subtrees[0].is_leaf()):
+                tree._top = tree.collect_top(self._top_k)
+
+            elif (len(tree._top) < self._top_k
+                  or tree._top[-1][1] < leaf.weight
+                  or any(value == leaf.value for value, _ in tree._top)):
+                top = [p for p in tree._top if p[0] != leaf.value]
+                index = 0
+                while index < len(top) and top[index][1] >= leaf.weight:
+                    index += 1
+                top.insert(index, pair)
+                tree._top = top[:self._top_k]
+
+            tree = tree._parent
+
+    def update_top_removed(self, tree: SimplePrefixTreeNode) -> None:
+        """Collect again the heaviest values kept by <tree> and the trees
+        above it, after values were removed from its subtrees.
+        """
+        while tree is not None:
+            tree._top = tree.collect_top(self._top_k)
+            tree = tree._parent
+
+    def collect_all_top(self) -> None:
+        """Collect the heaviest values kept by every tree, from the bottom
+        up.
+        """
+        trees = []
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            trees.append(tree)
+            stack.extend(sub for sub in tree.subtrees if not sub.is_leaf())
+
+        for tree in reversed(trees):
+            tree._top = tree.collect_top(self._top_k)
+
+    def top_memory(self) -> int:
+        """Return the approximate number of bytes used by the heaviest values
+        kept by the trees, counting the lists and pairs shared by several
+        trees once, but not the values themselves.
+        """
+        seen = set()
+        size = 0
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            stack.extend(sub for sub in tree.subtrees if not sub.is_leaf())
+            if tree._top is None or id(tree._top) in seen:
+                continue
+
+            seen.add(id(tree._top))
+            size += sys.getsizeof(tree._top)
+            for pair in tree._top:
+                if id(pair) not in seen:
+                    seen.add(id(pair))
+                    size += sys.getsizeof(pair)
+
+        return size
+
+    @classmethod
+    def from_items(cls, weight_type: str,
+                   items: Iterable[Tuple[Any, float, List]],
+                   top_k: Optional[int] = None) -> SimplePrefixTree:
+        """Return a new prefix tree storing every (value, weight, prefix)
+        item, as if each was inserted in turn.
+
+        The tree is built bottom-up in a single pass over the items sorted
+        by prefix, instead of walking down from the root for every item.
+        Values of equal weight are ordered by the first item they appear in,
+        which is not always the order insert would leave them in.
+
+        Preconditions: weight_type and top_k satisfy the preconditions of
+        __init__, and the items satisfy the preconditions of insert.
+        """
+        tree = cls(weight_type, top_k)
+        tree.graft(tree.bulk_subtrees(items))
+        return tree
+
+    def graft(self, subtrees: List[Subtree]) -> None:
+        """Add the given subtrees, built by the bulk loader, to this empty
+        tree.
+
+        Precondition: <subtrees> is sorted in non-increasing weight order,
+        and no two non-leaf subtrees start with the same prefix element.
+        """
+        self.set_subtrees(subtrees, self._weight_type)
+        self.index_leaves()
+        if self._top_k:
+            self.collect_all_top()
+
+    def bulk_subtrees(self, items: Iterable[Tuple[Any, float, List]]
+                      ) -> List[Subtree]:
+        """Return the subtrees of a tree of this type storing every
+        (value, weight, prefix) item, in the order this tree would keep them.
+
+        Only the weight type of this tree is used.
+        """
+        return [subtree for _, subtree in self.bulk_pairs(enumerate(items))]
+
+    def bulk_pairs(self, items: Iterable[Tuple[int, Tuple[Any, float, List]]]
+                   ) -> List[Tuple[int, Subtree]]:
+        """Return the subtrees of a tree of this type storing every item of
+        the (index, (value, weight, prefix)) pairs, each paired with the
+        smallest index of the items it stores, in the order this tree would
+        keep them.
+
+        Subtrees of equal weight are ordered by that index, so the subtrees
+        built from different parts of the same items can be merged in the
+        order they would have been built in together.
+        """
+        # group the leaves by prefix, adding up the weights of duplicate
+        # values and remembering the first item each value appears in
+        leaves = {}
+        for index, (value, weight, prefix) in items:
+            group = leaves.setdefault(tuple(prefix), [])
+            for _, leaf in group:
+                if leaf.value == value:
+                    leaf.weight += weight
+                    break
+            else:
+                group.append((index, PrefixTreeLeaf(value, weight)))
+
+        # path[d] collects the (first item, subtree) pairs of the tree whose
+        # value is the first d elements of the last prefix. Only the trees
+        # shared with a neighbouring prefix are kept in path, and they are
+        # completed once the next prefix leaves them. The rest of each prefix
+        # is a branch storing only its own leaves.
+        prefixes = sorted(leaves)
+        path = [[]]
+        previous = ()
+        for index, prefix in enumerate(prefixes):
+            common = find_common_prefix_len(previous, prefix)
+            while len(path) > common + 1:
+                self._complete_bulk_subtree(previous, path)
+
+            shared = common
+            if index + 1 < len(prefixes):
+                shared = max(shared, find_common_prefix_len(
+                    prefix, prefixes[index + 1]))
+            path.extend([] for _ in range(common, shared))
+
+            group = leaves[prefix]
+            if shared == len(prefix):
+                path[-1].extend(group)
+            else:
+                group.sort(key=lambda pair: -pair[1].weight)
+                path[-1].append((min(first for first, _ in group),
+                                 self.bulk_branch(
+                                     prefix, shared,
+                                     [leaf for _, leaf in group],
+                                     self._weight_type)))
+            previous = prefix
+
+        while len(path) > 1:
+            self._complete_bulk_subtree(previous, path)
+
+        path[0].sort(key=lambda pair: (-pair[1].weight, pair[0]))
+        return path[0]
+
+    def _complete_bulk_subtree(self, prefix: Tuple, path: List[List]) -> None:
+        """Build the subtree at the end of <path> and add it to the tree
+        before it in <path>.
+        """
+        children = path.pop()
+        children.sort(key=lambda pair: (-pair[1].weight, pair[0]))
+        subtree = self.bulk_subtree(prefix, len(path),
+                                    [sub for _, sub in children],
+                                    self._weight_type)
+        path[-1].append((min(first for first, _ in children), subtree))
+
+    def freeze(self, elements: Optional[Sequence] = None) -> FrozenPrefixTree:
+        """Return a read-only copy of this tree stored in flat NumPy arrays,
+        which answers the same autocomplete queries with less memory.
+
+        If <elements> is given, the prefix elements of this tree are indices
+        in it, and the copy stores the elements they index instead.
+
+        NumPy is only imported once a tree is frozen.
+        """
+        from .frozen import FrozenPrefixTree
+        return FrozenPrefixTree(self, elements)
+
+
+################################################################################
+# CompressedPrefixTree
+################################################################################
+class CompressedPrefixTreeNode(SimplePrefixTreeNode):
+    """A non-leaf tree of a CompressedPrefixTree.
+
+    === Attributes ===
+    value:
+        The value stored at the root of this prefix tree, or [] if this
+        prefix tree is empty.
+    weight:
+        The *aggregate weight* of the leaf weights in this tree, or 0 if this
+        tree is empty.
+    subtrees:
+        A list of subtrees of this prefix tree.
+    """
+    __slots__ = ()
+    subtrees: List[Union[CompressedPrefixTreeNode, PrefixTreeLeaf]]
+
+    @property
+    def value(self) -> Any:
+        """The value stored at the root of this prefix tree.
+
+        Compressed trees keep their whole value, as it is usually longer than
+        a single prefix element.
+        """
+        return self._value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self._value = value
+
+    def get_node_size(self) -> int:
+        """Return the number of bytes used by this tree, its subtrees list,
+        its <_children> index and its value.
+        """
+        return super().get_node_size() + sys.getsizeof(self._value)
+
+    def new_node(self) -> CompressedPrefixTreeNode:
+        """Return a new empty tree to be used as a subtree of this tree.
+        """
+        return CompressedPrefixTreeNode()
+
+    def edge_key(self, subtree: CompressedPrefixTreeNode) -> Any:
+        """Return the element following self.value in the value of the
+        non-leaf <subtree>.
+        """
+        return subtree.value[len(self.value)]
+
+    def edge_label(self, subtree: CompressedPrefixTreeNode) -> List:
+        """Return the elements following self.value in the value of the
+        non-leaf <subtree>.
+        """
+        return subtree.value[len(self.value):]
+
+    def bulk_subtree(self, prefix: Tuple, length: int,
+                     subtrees: List[Subtree],
+                     weight_type: str) -> CompressedPrefixTreeNode:
+        """Return a new subtree storing the first <length> elements of
+        <prefix> as its value, with the given subtrees.
+
+        A single non-leaf subtree is returned as it is, so that the chain it
+        would start is compressed.
+        """
+        if len(subtrees) == 1 and not subtrees[0].is_leaf():
+            return subtrees[0]
+        return self.create_subtree(list(prefix[:length]), subtrees,
+                                   weight_type)
+
+    def bulk_branch(self, prefix: Tuple, depth: int,
+                    leaves: List[PrefixTreeLeaf],
+                    weight_type: str) -> CompressedPrefixTreeNode:
+        """Return a new subtree storing the given leaves with the whole of
+        <prefix> as its compressed value.
+
+        Precondition: <leaves> is sorted in non-increasing weight order.
+        """
+        return self.create_subtree(list(prefix), leaves, weight_type)
+
+    def find_max_common_subtree(self, prefix: List
+                                ) -> Tuple[List, CompressedPrefixTreeNode]:
+        """Returns the subtree with common prefix as the given prefix sequence.
+
+        Subtree values under this tree only share self.value with each other,
+        so the only candidate is the subtree indexed by the prefix element
+        that follows self.value.
+        """
+        depth = len(self.value)
+        if len(prefix) > depth:
+            item = self.get_child(prefix[depth])
+            if item is not None:
+                common_len = find_common_prefix_len(prefix, item.value)
+                return prefix[:common_len], item
+
+        return [], None
 
-    def insert_cpt(self, value: Any, weight: float, prefix: List) -> None:
-        """Inserting a new ComplexPrefixTree into subtrees list.
+    def get_matching_subtree(self, prefix: List,
+                             both_way: bool = False) -> Optional[Any]:
+        """Return the subtree that partially/fully matches with given prefix.
+
+        === Attributes ===
+        prefix:
+            The given prefix sequence to match with subtree values.
+        both_way:
+            The condition variable to also check whether value contains prefix.
+        """
+        depth = len(self.value)
+        if len(prefix) <= depth:
+            return None
+
+        subtree = self.get_child(prefix[depth])
+        if subtree is None:
+            return None
+
+        # the subtree value can be several elements longer than self.value
+        if prefix[:len(subtree.value)] == subtree.value:
+            return subtree
+        elif both_way and subtree.value[:len(prefix)] == prefix:
+            return subtree
+
+        # no subtree found
+        return None
+
+    def compress(self) -> None:
+        """Merge the only subtree of this tree into it, if it is a non-leaf
+        tree, so that the tree has no compressible internal values.
+
+        Both trees store the same values, so the aggregates do not change.
+        """
+        if len(self.subtrees) == 1 and not self.subtrees[0].is_leaf():
+            only_sub = self.subtrees[0]
+            self.value = only_sub.value
+            self.subtrees = only_sub.subtrees
+            self._children = only_sub._children
+            for sub in self.subtrees:
+                sub._parent = self
+
+    def push_down(self, length: int) -> None:
+        """Move the contents of this tree into a new subtree, keeping only
+        the first <length> elements of self.value as the value of this tree.
+
+        The aggregated weights of this tree do not change.
+        """
+        subtree = self.new_node()
+        subtree.value = self.value
+        subtree.weight = self.weight
+        subtree.subtrees = self.subtrees
+        subtree._children = self._children
+        subtree._length = self._length
+        subtree._leaf_sum = self._leaf_sum
+        subtree._max_weight = self._max_weight
+        subtree._top = self._top
+        for sub in subtree.subtrees:
+            sub._parent = subtree
+
+        self.value = self.value[:length]
+        self.subtrees = []
+        self._children = None
+        self.add_subtree(subtree)
+
+    def create_branch(self, value: Any, weight: float, prefix: List,
+                      depth: int) -> CompressedPrefixTreeNode:
+        """Return a new subtree of this tree that stores only <value>, with
+        the whole of <prefix> as its compressed value.
+
+        Precondition: <prefix> is longer than self.value, and <depth> is the
+        length of self.value.
+        """
+        leaf = PrefixTreeLeaf(value, weight)
+
+        # the branch stores the single value, so its aggregates are those of
+        # the leaf whatever the weight type is
+        tree = self.new_node()
+        tree.value = prefix
+        tree.weight = weight
+        tree.subtrees.append(leaf)
+        leaf._parent = tree
+        tree._length = 1
+        tree._leaf_sum = weight
+        tree._max_weight = weight
+
+        return tree
+
+    def insert_cpt(self, value: Any, weight: float, prefix: List,
+                   weight_type: str) -> PrefixTreeLeaf:
+        """Inserting a value into this CompressedPrefixTree, and return the
+        leaf storing it.
+
+        Like insert_spt, this walks down the path of <prefix> and updates the
+        trees back up through their parents.
+
+        Precondition: <prefix> starts with self.value.
 
         === Attributes ===
         value:
@@ -481,163 +1766,205 @@ class CompressedPrefixTree(SimplePrefixTree):
             The weight of the string value.
         prefix:
             The prefix sequence of the string value.
+        weight_type:
+            The weight type of the CompressedPrefixTree.
         """
-        common, found = self.find_max_common_subtree(prefix)
-        # find more than parent node
-        if found is not None and self.value != common:
-            data = {"prefix": prefix, "value": value, "weight": weight}
-            node = self.merge_value(found, common, data)
-            # If found and node is the same, we don't need to remove, append
-            # same address in memory
-            if found != node:
-                self.subtrees.remove(found)
-                self.subtrees.append(node)
+        # walk down to the deepest tree whose value starts <prefix>,
+        # splitting the subtree that <prefix> leaves part way
+        tree = self
+        while len(tree.value) < len(prefix):
+            common, subtree = tree.find_max_common_subtree(prefix)
+            if subtree is None:
+                break
+
+            # given prefix leaves the subtree value part way, split it
+            if len(common) < len(subtree.value):
+                new_subtree = tree.create_subtree(common, [subtree],
+                                                  weight_type)
+                tree.replace_subtree(subtree, new_subtree)
+                subtree = new_subtree
+            tree = subtree
+
+        # prefix matches exactly with tree value
+        if len(tree.value) == len(prefix):
+            # check if the value is already inserted
+            subtree = tree.get_matching_leaf(value)
+            if subtree is not None:
+                subtree.weight += weight
+                added = 0
+            else:
+                subtree = PrefixTreeLeaf(value, weight)
+                tree.add_subtree(subtree)
+                added = 1
 
+        # no subtree shares the next element, the rest of the prefix becomes
+        # a single new subtree
         else:
-            node = CompressedPrefixTree(self._weight_type)
-            node.insert(value, weight, prefix)
-            self.subtrees.append(node)
+            subtree = tree.create_branch(value, weight, prefix,
+                                         len(tree.value))
+            tree.add_subtree(subtree)
+            added = 1
+
+        tree.update_inserted(subtree, added, weight, self, weight_type)
+        return subtree.get_leaf(value)
+
+    def find_subtree(self, prefix: List) -> Optional[CompressedPrefixTreeNode]:
+        """Return the tree storing every value matching the given prefix, or
+        None if no value matches it.
+        """
+        # finding the subtree whose value contains the prefix
+        tree = self
+        while tree.value[:len(prefix)] != prefix:
+            tree = tree.get_matching_subtree(prefix, both_way=True)
+
+            # no match found
+            if tree is None:
+                return None
+
+        return tree
+
+    def descend(self, prefix: List,
+                depth: int) -> Optional[CompressedPrefixTreeNode]:
+        """Return the tree storing every value matching the first
+        <depth> + 1 elements of <prefix>, or None if no value matches them.
 
-        # update weight and sort subtree by weight
-        self._length += 1
-        self.weight = self.get_aggr_weight()
-        self.subtrees.sort(key=lambda s: s.weight, reverse=True)
+        The tree itself is returned while <depth> is within its value.
 
-    def merge_value(self, found: CompressedPrefixTree, common: List,
-                    data: Dict[str, Union[List, str, float]]
-                    ) -> CompressedPrefixTree:
-        """Return a subtree that contains common prefix tree and current tree.
+        Precondition: this tree stores every value matching the first <depth>
+        elements of <prefix>, and depth < len(prefix).
+        """
+        if depth < len(self._value):
+            return self if self._value[depth] == prefix[depth] else None
+        return self.get_child(prefix[depth])
+
+    def remove_cpt(self, prefix: List, weight_type: str
+                   ) -> Optional[CompressedPrefixTreeNode]:
+        """Removing all values that match the given prefix from this
+        CompressedPrefixTree.
+
+        Return the lowest tree still storing values that some were removed
+        from, this tree if it is empty, or None if no value was removed.
 
         === Attributes ===
-        found:
-            The subtree with common prefix.
         prefix:
-            The prefix sequence of the value to be inserted.
-        value:
-            The value to be inserted.
-        weight:
-            The weight of the value.
-        common:
-            The common prefix between <found> value and given prefix.
+            The prefix sequence of the values to remove.
+        weight_type:
+            The weight type of the CompressedPrefixTree.
         """
-        prefix = data['prefix']
-        value = data['value']
-        weight = data['weight']
+        tree = self.find_subtree(prefix)
 
-        # common prefix tree have same value as given prefix
-        if found.value == prefix:
-            if found.subtrees[0].value == value:
-                found.subtrees[0].weight += weight
-            else:
-                new_tree = self.create_subtree(value, weight)
-                found.subtrees.append(new_tree)
-                found._length += 1
-
-            found.weight = found.get_aggr_weight()
-            return found
-
-        # common prefix tree value contains given prefix
-        elif found.value[:len(prefix)] == prefix:
-            new_tree = self.create_subtree(value, weight)
-            subtree = self.create_subtree(common, 0.0, [new_tree, found],
-                                          found._length + new_tree._length)
-            return subtree
+        # no value matches
+        if tree is None:
+            return None
 
-        # given prefix contains common prefix tree value
-        elif prefix[:len(found.value)] == found.value:
-            found.insert_cpt(value, weight, prefix)
-            return found
+        length = len(tree)
+        total = tree.get_total_leaf_weights()
+        tree.clear()
 
-        # common prefix tree value have some common prefix with given prefix
-        else:
-            # common prefix
-            new_tree_sub = self.create_subtree(value, weight)
-            new_tree = self.create_subtree(prefix, weight, [new_tree_sub])
-            subtree = self.create_subtree(common, 0.0, [new_tree, found],
-                                          found._length + new_tree._length)
-            return subtree
+        lowest = None
+        while tree is not self:
+            parent = tree._parent
+            parent.update_removed(tree, prefix[len(parent.value)], length,
+                                  total, weight_type)
+            if lowest is None and len(parent) > 0:
+                lowest = parent
 
-    def create_subtree(self, value: Union[List, str], weight: float,
-                       subtrees: Optional[List] = None,
-                       length: int = 1) -> CompressedPrefixTree:
-        """Return a CompressedPrefixTree created with given properties.
+            # compress tree left with a single non-leaf subtree
+            parent.compress()
+            tree = parent
 
-        === Attributes ===
-        value:
-            The value of the new tree.
-        weight:
-            The weight of the new tree.
-        length:
-            The length of the tree
-        """
-        subtrees = list() if subtrees is None else subtrees
+        return self if lowest is None else lowest
 
-        # initialize tree
-        tree = CompressedPrefixTree(self._weight_type)
-        tree.value = value
-        tree.subtrees = subtrees
-        tree._length = length
-        tree.weight = weight if weight != 0.0 else tree.get_aggr_weight()
 
-        return tree
+class CompressedPrefixTree(CompressedPrefixTreeNode, SimplePrefixTree):
+    """A compressed prefix tree implementation.
 
-    def autocomplete(self, prefix: List,
-                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
-        """Return up to <limit> matches for the given prefix.
+    === Attributes ===
+    value:
+        The value stored at the root of this prefix tree, or [] if this
+        prefix tree is empty.
+    weight:
+        The weight of this prefix tree. If this tree is a leaf, this attribute
+        stores the weight of the value stored in the leaf. If this tree is
+        not a leaf and non-empty, this attribute stores the *aggregate weight*
+        of the leaf weights in this tree.
+    subtrees:
+        A list of subtrees of this prefix tree.
 
-        The return value is a list of tuples (value, weight), and must be
-        ordered in non-increasing weight. (You can decide how to break ties.)
+    === Representation invariants ===
+    - self.weight >= 0
 
-        If limit is None, return *every* match for the given prefix.
+    - (EMPTY TREE):
+        If self.weight == 0, then self.value == [] and self.subtrees == [].
+        This represents an empty simple prefix tree.
+    - (LEAF):
+        If self.subtrees == [] and self.weight > 0, this tree is a leaf.
+        (self.value is a value that was inserted into this tree.)
+    - (NON-EMPTY, NON-LEAF):
+        If len(self.subtrees) > 0, then self.value is a list (*common prefix*),
+        and self.weight > 0 (*aggregate weight*).
 
-        Precondition: limit is None or limit > 0.
+    - This tree does not contain any compressible internal values.
+
+    - self.subtrees does not contain any empty prefix trees.
+    - self.subtrees is *sorted* in non-increasing order of their weights.
+      Note that this applies to both leaves and non-leaf subtrees:
+      both can appear in the same self.subtrees list, and both have a `weight`
+      attribute.
+
+    Leaves are PrefixTreeLeaf records and non-leaf subtrees are
+    CompressedPrefixTreeNode objects.
+    """
+    __slots__ = ()
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value into this Autocompleter.
+
+        The value is inserted with the given weight, and is associated with
+        the prefix sequence <prefix>.
+
+        If the value has already been inserted into this prefix tree
+        (compare values using ==), then the given weight should be *added* to
+        the existing weight of this value.
+
+        Preconditions:
+            weight > 0
+            The given value is either:
+                1) not in this Autocompleter
+                2) was previously inserted with the SAME prefix sequence
         """
-        result = []
+        # the value is already inserted, its leaf is found without the prefix
+        if value in self._leaves:
+            self.increment(value, weight)
+            return
 
         # tree is empty
         if self.is_empty():
-            return result
-
-        # prefix matches subtree value
-        elif prefix in (self.value, self.value[:len(prefix)]):
-            new_limit = limit if limit else float('inf')
-            self.autocomplete_helper(new_limit, result)
-            return sorted(result, key=lambda s: s[1], reverse=True)
+            self.value = prefix
 
-        # finding subtree that match the prefix
+        # given prefix leaves the compressed value of this tree
         else:
-            # find the subtree that contains given prefix
-            subtree = self.get_matching_subtree(prefix, both_way=True)
-            if subtree is not None:
-                result.extend(subtree.autocomplete(prefix, limit))
+            common_len = find_common_prefix_len(self.value, prefix)
+            if common_len < len(self.value):
+                self.push_down(common_len)
 
-            # no match found
-            return result
+        leaf = self.insert_cpt(value, weight, prefix, self._weight_type)
+        self._leaves[value] = leaf
+        if self._top_k:
+            self.update_top_inserted(leaf)
 
-    def autocomplete_helper(self, limit: int, result: List) -> None:
-        """Find all values stored under current tree.
+    def graft(self, subtrees: List[Subtree]) -> None:
+        """Add the given subtrees, built by the bulk loader, to this empty
+        tree.
 
-        === Attributes ===
-        limit:
-            The limit for the number of autocomplete result.
-        result:
-            The result list to put all the values found in.
+        See SimplePrefixTree.graft. A single non-leaf subtree is compressed
+        into this tree.
         """
-        items = []
-        for subtree in self.subtrees:
-            # reaches limit - immediately returns
-            if len(items) == limit:
-                break
-
-            # subtree value is prefix sequence
-            if not subtree.is_leaf():
-                new_limit = limit - len(items)
-                subtree.autocomplete_helper(new_limit, items)
-            # subtree value is actual word
-            else:
-                items.append((subtree.value, subtree.weight))
+        if len(subtrees) == 1 and not subtrees[0].is_leaf():
+            self.value = subtrees[0].value
+            subtrees = subtrees[0].subtrees
 
-        result.extend(items)
+        super().graft(subtrees)
 
     def remove(self, prefix: List) -> None:
         """Remove all values that match the given prefix.
@@ -646,34 +1973,48 @@ class CompressedPrefixTree(SimplePrefixTree):
         if self.is_empty():
             return
 
-        # prefix equal to subtree value or subtree value contains prefix
-        elif prefix in (self.value, self.value[:len(prefix)]):
-            self.subtrees = []
-            self.weight = 0.0
-            self.value = []
-            self._length -= 1
+        self.forget_leaves(self.find_subtree(prefix))
+        tree = self.remove_cpt(prefix, self._weight_type)
+        if self._top_k and tree is not None:
+            self.update_top_removed(tree)
 
-        # look for subtree with matching value
-        else:
-            # find subtree and recur call into that subtree
-            subtree = self.get_matching_subtree(prefix, both_way=True)
-            if subtree is not None:
-                subtree.remove(prefix)
-
-                # only remove subtree if it is a empty subtree
-                if subtree.is_empty():
-                    self.subtrees.remove(subtree)
-
-                # compress subtree
-                if len(self.subtrees) == 1:
-                    only_sub = self.subtrees[0]
-                    self.value = only_sub.value
-                    self.weight = only_sub.weight
-                    self.subtrees.extend(only_sub.subtrees)
-                    self.subtrees.remove(only_sub)
-
-                # update weight
-                self.weight = self.get_aggr_weight()
+
+def unit_substitution(query_element: Any, element: Any, last: bool) -> float:
+    """Return the cost of substituting <element> for <query_element>, 0 if
+    they are equal and 1 otherwise.
+    """
+    return 0.0 if query_element == element else 1.0
+
+
+def fuzzy_step(row: List[float], elements: List, prefix: List,
+               max_edits: float, substitution: Substitution,
+               gap: float) -> Optional[Tuple[List[float], bool]]:
+    """Extend the last <row> of an edit distance table between <prefix> and
+    a sequence with each of <elements> in turn.
+
+    row[i] is the cost of editing the first i elements of <prefix> into the
+    sequence. Return the new row and whether the whole prefix was within
+    <max_edits> of the sequence extended by some of <elements>, stopping at
+    the first such element, or None if every cost of a row exceeds
+    <max_edits>.
+    """
+    last = len(prefix)
+    for element in elements:
+        new_row = [row[0] + gap]
+        for i in range(1, last + 1):
+            cost = min(row[i], new_row[i - 1]) + gap
+            if row[i - 1] <= max_edits:
+                cost = min(cost, row[i - 1] + substitution(
+                    prefix[i - 1], element, i == last))
+            new_row.append(cost)
+
+        if new_row[last] <= max_edits:
+            return new_row, True
+        if min(new_row) > max_edits:
+            return None
+        row = new_row
+
+    return row, False
 
 
 def find_common_prefix_len(prefix1: List, prefix2: List) -> int:
@@ -0,0 +1,286 @@
+"""Autocomplete server
+
+=== Module description ===
+This file contains AutocompleteServer, an asyncio server answering the
+autocomplete queries of clients with one of the autocomplete engines.
+
+Clients connect over TCP and send one JSON request per line:
+
+    {"id": 1, "session": "user 1", "prefix": "how t", "limit": 10}
+
+The prefix is a string for the letter and sentence engines, and a list of
+intervals for the melody engine. "session" and "limit" are optional, and
+"id" is sent back unchanged. The server answers each request with one JSON
+line, in the order the answers are ready:
+
+    {"id": 1, "results": [["how to", 3.0], ...]}
+
+Melodies are sent back by name. A request is answered with
+{"id": 1, "cancelled": true} if a later request of the same session (or of
+the same connection, if it has no session) arrived before it was answered,
+as when a user keeps typing, and with {"id": 1, "error": message} if it is
+not a valid request.
+
+Requests for the same prefix and limit that arrive while it is looked up
+share the same lookup. Heavy queries, those without a limit or with a short
+prefix, are looked up in a worker thread so that they do not hold up the
+other requests. The engine is used by one thread at a time, so a light query
+arriving while the worker thread is looking up another query is looked up
+by the worker thread after it.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .engine import (
+    LetterAutocompleteEngine,
+    SentenceAutocompleteEngine,
+    MelodyAutocompleteEngine
+)
+
+# The engine classes a server can be run with, by name
+ENGINES = {
+    'letter': LetterAutocompleteEngine,
+    'sentence': SentenceAutocompleteEngine,
+    'melody': MelodyAutocompleteEngine
+}
+
+Prefix = Union[str, List[int]]
+
+
+class AutocompleteServer:
+    """An asyncio server answering autocomplete requests with an engine.
+
+    === Attributes ===
+    engine:
+        The autocomplete engine answering the requests.
+    inline_length:
+        The length of the shortest prefix looked up by the event loop. Shorter
+        prefixes, queries without a limit, and queries arriving while the
+        engine is in use, are looked up in the worker thread.
+    """
+    engine: Any
+    inline_length: int
+
+    # === Private Attributes ===
+    # The worker thread looking up the heavy queries
+    _executor: ThreadPoolExecutor
+    # The lock held by every call of the engine
+    _engine_lock: threading.Lock
+    # The lookups in flight, by (prefix, limit)
+    _lookups: Dict[Tuple[Any, Optional[int]], asyncio.Future]
+    # The request in flight of each session
+    _sessions: Dict[Any, asyncio.Future]
+    # The number of requests received, answered by the lookup of an earlier
+    # request, cancelled by a later request, and looked up in the worker
+    # thread
+    _requests: int
+    _coalesced: int
+    _cancelled: int
+    _offloaded: int
+
+    def __init__(self, engine: Any, inline_length: int = 3) -> None:
+        """Initialize a server answering requests with <engine>, looking up
+        heavy queries in a worker thread.
+
+        The engines are not safe to use from several threads at once, as
+        when they cache results or are changed, so every call of <engine>,
+        by the event loop or by the worker thread, holds the same lock.
+
+        Precondition: inline_length >= 0
+        """
+        self.engine = engine
+        self.inline_length = inline_length
+        self._executor = ThreadPoolExecutor(1)
+        self._engine_lock = threading.Lock()
+        self._lookups = {}
+        self._sessions = {}
+        self._requests = 0
+        self._coalesced = 0
+        self._cancelled = 0
+        self._offloaded = 0
+
+    async def serve(self, host: str = '127.0.0.1',
+                    port: int = 8765) -> asyncio.AbstractServer:
+        """Start accepting connections on <host> and <port>, and return the
+        asyncio server accepting them.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self) -> None:
+        """Stop the worker thread, once the lookups it is running are done.
+        """
+        self._executor.shutdown()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of requests received ('requests'), answered by
+        the lookup of an earlier request ('coalesced'), cancelled by a later
+        request of their session ('cancelled'), and looked up in the worker
+        thread ('offloaded').
+        """
+        return {
+            'requests': self._requests,
+            'coalesced': self._coalesced,
+            'cancelled': self._cancelled,
+            'offloaded': self._offloaded
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer the requests sent through a connection until the client
+        closes it.
+
+        Every request is answered by its own task, so that the next requests
+        are read while it is looked up.
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                task = asyncio.ensure_future(
+                    self._respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter,
+                       lock: asyncio.Lock) -> None:
+        """Answer the request in <line>, sent through the connection of
+        <writer>.
+        """
+        try:
+            request = json.loads(line)
+            response = {'id': request.get('id')}
+            session = request.get('session', id(writer))
+            prefix = request['prefix']
+            limit = request.get('limit')
+        except (ValueError, KeyError, AttributeError) as error:
+            response = {'id': None, 'error': f'invalid request: {error}'}
+        else:
+            try:
+                results = await self.answer(session, prefix, limit)
+                response['results'] = [[getattr(value, 'name', value), weight]
+                                       for value, weight in results]
+            except asyncio.CancelledError:
+                response['cancelled'] = True
+            except Exception as error:
+                response['error'] = repr(error)
+
+        async with lock:
+            writer.write(json.dumps(response).encode('utf8') + b'\n')
+            await writer.drain()
+
+    async def answer(self, session: Any, prefix: Prefix,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return the autocomplete results of <prefix> and <limit>, for a
+        request of <session>.
+
+        The request in flight of the same session is cancelled, and raises
+        asyncio.CancelledError.
+        """
+        self._requests += 1
+        previous = self._sessions.get(session)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self._cancelled += 1
+
+        task = asyncio.ensure_future(self.autocomplete(prefix, limit))
+        self._sessions[session] = task
+        try:
+            return await task
+        finally:
+            if self._sessions.get(session) is task:
+                del self._sessions[session]
+
+    async def autocomplete(self, prefix: Prefix, limit: Optional[int] = None
+                           ) -> List[Tuple[Any, float]]:
+        """Return the autocomplete results of <prefix> and <limit>, sharing
+        the lookup in flight of the same query if there is one.
+
+        Cancelling the call does not cancel the lookup, which other calls
+        may be waiting for.
+        """
+        key = (prefix if isinstance(prefix, str) else tuple(prefix), limit)
+        lookup = self._lookups.get(key)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._lookup(prefix, limit))
+            self._lookups[key] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(key))
+        else:
+            self._coalesced += 1
+
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, prefix: Prefix,
+                      limit: Optional[int]) -> List[Tuple[Any, float]]:
+        """Return the autocomplete results of <prefix> and <limit> from the
+        engine, in the worker thread if the query is heavy or the engine is
+        in use.
+
+        The event loop never waits for the engine lock.
+        """
+        if limit is not None and len(prefix) >= self.inline_length \
+                and self._engine_lock.acquire(blocking=False):
+            try:
+                return self.engine.autocomplete(prefix, limit)
+            finally:
+                self._engine_lock.release()
+
+        self._offloaded += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+                                          self._locked_autocomplete,
+                                          prefix, limit)
+
+    def _locked_autocomplete(self, prefix: Prefix, limit: Optional[int]
+                             ) -> List[Tuple[Any, float]]:
+        """Return the autocomplete results of <prefix> and <limit> from the
+        engine, holding the engine lock.
+        """
+        with self._engine_lock:
+            return self.engine.autocomplete(prefix, limit)
+
+
+def run_server(engine: str, file: str, autocompleter: str = 'compressed',
+               weight_type: str = 'sum', host: str = '127.0.0.1',
+               port: int = 8765, inline_length: int = 3,
+               **config: Any) -> None:
+    """Build the <engine> ('letter', 'sentence' or 'melody') engine from
+    <file>, and serve its autocomplete results on <host> and <port> until
+    interrupted.
+
+    The other keyword arguments are added to the configuration of the
+    engine, e.g. top_k=10.
+    """
+    server = AutocompleteServer(ENGINES[engine](dict(
+        config, file=file, autocompleter=autocompleter,
+        weight_type=weight_type)), inline_length)
+
+    async def main() -> None:
+        listener = await server.serve(host, port)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    import fire
+    fire.Fire(run_server)
@@ -0,0 +1,310 @@
+"""Sharded autocompleter
+
+=== Module description ===
+This file contains ShardedAutocompleter, an Autocompleter whose values are
+stored in several prefix trees, each owned by its own worker process.
+
+Each worker owns a range of the first elements of the prefix sequences, so a
+query with a non-empty prefix is answered by the single worker owning its
+first element. Queries with an empty prefix are sent to every worker, which
+answer them at the same time, and their results are merged by weight.
+
+The words of prefix sequences of words can be interned in a vocabulary of
+each shard, which stores the words of its own values, so that the words are
+sent to the workers with the queries rather than a vocabulary with every
+fuzzy query.
+"""
+from __future__ import annotations
+
+import heapq
+import multiprocessing
+from bisect import bisect_right
+from itertools import islice
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+from .prefix_tree import Autocompleter, SimplePrefixTree, Substitution
+from .vocabulary import Vocabulary, VocabularyAutocompleter
+
+
+class ShardedAutocompleter(Autocompleter):
+    """An Autocompleter storing its values in prefix trees owned by worker
+    processes, one for each range of first prefix elements.
+
+    The workers are stopped by close, or when the ShardedAutocompleter is
+    used as a context manager and the block ends.
+
+    === Attributes ===
+    bounds:
+        The first prefix element of every shard but the first, in increasing
+        order. Values whose prefix sequence is empty or starts with an
+        element smaller than bounds[0] are stored by the first shard, and the
+        values whose prefix sequence starts with an element x such that
+        bounds[i - 1] <= x < bounds[i] are stored by shard i.
+    """
+    bounds: List[Any]
+
+    # === Private Attributes ===
+    # The worker processes owning the shards, in order
+    _workers: List[multiprocessing.Process]
+    # The connections to the worker processes, in the same order
+    _connections: List[Any]
+
+    def __init__(self, tree_class: Type[SimplePrefixTree], weight_type: str,
+                 shards: List[List[Tuple[Any, float, List]]],
+                 bounds: List[Any], top_k: Optional[int] = None,
+                 vocabulary: bool = False) -> None:
+        """Initialize a sharded autocompleter with a worker process for each
+        list of (value, weight, prefix) items in <shards>, storing them in a
+        prefix tree of <tree_class> bulk loaded from the items.
+
+        If <vocabulary> is True, the prefix elements are words, and each
+        worker stores them as their ids in its own Vocabulary, as a
+        VocabularyAutocompleter does.
+
+        Precondition: the items of <shards> are partitioned by <bounds> as
+        described in the class docstring, and <weight_type> and <top_k>
+        satisfy the preconditions of tree_class.
+        """
+        self.bounds = bounds
+        self._workers = []
+        self._connections = []
+        for items in shards:
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=serve_shard,
+                args=(worker_connection, tree_class, weight_type, items,
+                      top_k, vocabulary),
+                daemon=True)
+            worker.start()
+            worker_connection.close()
+            self._workers.append(worker)
+            self._connections.append(connection)
+
+    @classmethod
+    def from_items(cls, tree_class: Type[SimplePrefixTree], weight_type: str,
+                   items: Iterable[Tuple[Any, float, List]],
+                   top_k: Optional[int] = None, shards: int = 2,
+                   vocabulary: bool = False) -> ShardedAutocompleter:
+        """Return a new sharded autocompleter storing every
+        (value, weight, prefix) item in up to <shards> prefix trees of
+        <tree_class>, with the words of the prefixes interned by each shard
+        if <vocabulary> is True.
+
+        The ranges of first prefix elements are chosen so that the shards
+        store about as many items each.
+
+        Precondition: shards > 0, and the first elements of the prefix
+        sequences can be compared with each other.
+        """
+        items = list(items)
+        counts = {}
+        for _, _, prefix in items:
+            if prefix:
+                counts[prefix[0]] = counts.get(prefix[0], 0) + 1
+
+        # start a new shard at the first element whose items would take the
+        # current shard past its share of the items
+        keys = sorted(counts)
+        share = len(items) / shards
+        bounds = []
+        total = len(items) - sum(counts.values())
+        for key in keys:
+            if total >= share * (len(bounds) + 1) and len(bounds) + 1 < shards:
+                bounds.append(key)
+            total += counts[key]
+
+        shard_items = [[] for _ in range(len(bounds) + 1)]
+        for item in items:
+            shard_items[shard_of(bounds, item[2])].append(item)
+
+        return cls(tree_class, weight_type, shard_items, bounds, top_k,
+                   vocabulary)
+
+    def __enter__(self) -> ShardedAutocompleter:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes. The values they store are lost.
+        """
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._connections = []
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        return sum(self._scatter([('__len__', ())] * len(self._connections)))
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value into the shard owning <prefix>.
+
+        See Autocompleter.insert.
+        """
+        self._call(shard_of(self.bounds, prefix), 'insert',
+                   (value, weight, prefix))
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix, from the shard
+        owning <prefix>, or merged from every shard if <prefix> is empty.
+
+        Values of equal weight from different shards are ordered by shard.
+        See Autocompleter.autocomplete.
+        """
+        if prefix:
+            return self._call(shard_of(self.bounds, prefix), 'autocomplete',
+                              (prefix, limit))
+
+        return merge_results(self._scatter(
+            [('autocomplete', (prefix, limit))] * len(self._connections)),
+            limit)
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> fuzzy matches for the given prefix, merged
+        from every shard since a match may start with any element.
+
+        <substitution> must be picklable, such as a module-level function.
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        return merge_results(self._scatter(
+            [('autocomplete_fuzzy', (prefix, max_edits, limit, substitution,
+                                     gap))] * len(self._connections)),
+            limit)
+
+    def autocomplete_many(self, prefixes: Iterable[List],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[Any, float]]]:
+        """Return the autocomplete results of every prefix in <prefixes>,
+        with the same <limit>, in the order of <prefixes>.
+
+        Every shard looks up all of its prefixes together, at the same time
+        as the other shards.
+        """
+        prefixes = list(prefixes)
+
+        # the indices of the prefixes sent to each shard
+        indices = [[] for _ in self._connections]
+        for index, prefix in enumerate(prefixes):
+            if prefix:
+                indices[shard_of(self.bounds, prefix)].append(index)
+            else:
+                for shard in indices:
+                    shard.append(index)
+
+        found = self._scatter(
+            [('autocomplete_many', ([prefixes[index] for index in shard],
+                                    limit))
+             for shard in indices])
+
+        # the results of each prefix, one from every shard it was sent to
+        results = [[] for _ in prefixes]
+        for shard, shard_results in zip(indices, found):
+            for index, result in zip(shard, shard_results):
+                results[index].append(result)
+
+        return [merge_results(result, limit) for result in results]
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix, from the shard
+        owning <prefix>, or from every shard if <prefix> is empty.
+        """
+        if prefix:
+            self._call(shard_of(self.bounds, prefix), 'remove', (prefix,))
+        else:
+            self._scatter([('remove', (prefix,))] * len(self._connections))
+
+    def _call(self, shard: int, method: str, args: Tuple) -> Any:
+        """Return the result of calling <method> with <args> on the tree of
+        <shard>.
+        """
+        self._connections[shard].send((method, args))
+        return receive(self._connections[shard])
+
+    def _scatter(self, calls: List[Tuple[str, Tuple]]) -> List[Any]:
+        """Return the results of the (method, args) calls on the tree of each
+        shard, in order.
+
+        Every call is sent before any result is received, so that the
+        shards run their calls at the same time.
+        """
+        for connection, call in zip(self._connections, calls):
+            connection.send(call)
+        return [receive(connection) for connection in self._connections]
+
+
+def shard_of(bounds: List[Any], prefix: List) -> int:
+    """Return the index of the shard storing the values of <prefix> for the
+    given shard <bounds>. The values of an empty prefix are stored by the
+    first shard.
+    """
+    if not prefix:
+        return 0
+    return bisect_right(bounds, prefix[0])
+
+
+def merge_results(results: List[List[Tuple[Any, float]]],
+                  limit: Optional[int]) -> List[Tuple[Any, float]]:
+    """Return up to <limit> of the (value, weight) pairs of <results>, each
+    of which is in non-increasing weight order, in non-increasing weight
+    order.
+    """
+    if len(results) == 1:
+        return results[0]
+
+    merged = heapq.merge(*results, key=lambda pair: -pair[1])
+    return list(islice(merged, limit))
+
+
+def receive(connection: Any) -> Any:
+    """Return the result received from a worker process through
+    <connection>, raising the exception it raised instead if it failed.
+    """
+    ok, result = connection.recv()
+    if not ok:
+        raise result
+    return result
+
+
+def serve_shard(connection: Any, tree_class: Type[SimplePrefixTree],
+                weight_type: str, items: List[Tuple[Any, float, List]],
+                top_k: Optional[int], vocabulary: bool) -> None:
+    """Bulk load a prefix tree of <tree_class> from <items>, and answer the
+    (method, args) calls received through <connection> until None is
+    received.
+
+    If <vocabulary> is True, the words of the prefixes are interned in a
+    Vocabulary of this shard, and the calls are answered by a
+    VocabularyAutocompleter of the tree.
+
+    This is run by the worker processes. The result of each call is sent
+    back as (True, result), or (False, exception) if it raised one.
+    """
+    if vocabulary:
+        words = Vocabulary()
+        tree = VocabularyAutocompleter(
+            tree_class.from_items(weight_type, words.intern_items(items),
+                                  top_k), words)
+    else:
+        tree = tree_class.from_items(weight_type, items, top_k)
+
+    while True:
+        call = connection.recv()
+        if call is None:
+            break
+
+        method, args = call
+        try:
+            connection.send((True, getattr(tree, method)(*args)))
+        except Exception as error:
+            connection.send((False, error))
+
+    connection.close()
@@ -0,0 +1,558 @@
+"""Ternary search tree
+
+=== Module description ===
+This file contains TernarySearchTree, an Autocompleter storing its values in
+a ternary search tree.
+
+Every node holds one prefix element and three children: the nodes for the
+smaller and larger elements at the same position of the prefix sequences,
+and the nodes for the next position. A node only stores the elements its
+prefix sequences actually use, so the children of a sequence are found by
+comparing elements along a binary search tree rather than in a list as long
+as the alphabet, which suits the words of the sentence engine and the
+intervals of the melody engine.
+
+Every node keeps the largest weight of the values below it, through any of
+its children, so autocomplete with a limit searches the nodes best-first by
+that weight and returns its matches in non-increasing weight order, without
+visiting the nodes lighter than the values it returns. Without a limit,
+every value below the prefix is collected and then sorted once. As in the other
+prefix trees, a top_k keeps the heaviest values of every prefix sequence,
+which answer the queries with a limit of at most top_k directly.
+"""
+from __future__ import annotations
+
+import heapq
+import sys
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .prefix_tree import (Autocompleter, Substitution, fuzzy_step,
+                          unit_substitution)
+
+
+class TernaryNode:
+    """A node of a ternary search tree.
+
+    === Attributes ===
+    element:
+        The prefix element of this node.
+    low:
+        The node of the smaller elements at the same position, or None.
+    equal:
+        The node of the elements following this one, or None.
+    high:
+        The node of the larger elements at the same position, or None.
+    leaves:
+        The weight of each value whose prefix sequence ends with this
+        element, or None if there is none.
+    max_weight:
+        The largest weight of the values stored in this node and below it,
+        through any of its children.
+    top:
+        The (value, weight) pairs of the heaviest values whose prefix
+        sequences start with the sequence ending at this node, in
+        non-increasing weight order, if the tree keeps them.
+    """
+    __slots__ = ('element', 'low', 'equal', 'high', 'leaves', 'max_weight',
+                 'top')
+    element: Any
+    low: Optional[TernaryNode]
+    equal: Optional[TernaryNode]
+    high: Optional[TernaryNode]
+    leaves: Optional[Dict[Any, float]]
+    max_weight: float
+    top: Optional[List[Tuple[Any, float]]]
+
+    def __init__(self, element: Any) -> None:
+        """Initialize a node of <element> with no children or values."""
+        self.element = element
+        self.low = None
+        self.equal = None
+        self.high = None
+        self.leaves = None
+        self.max_weight = 0.0
+        self.top = None
+
+    def is_empty(self) -> bool:
+        """Return whether this node has no children and no values."""
+        return (self.low is None and self.equal is None and self.high is None
+                and not self.leaves)
+
+    def update_max_weight(self) -> None:
+        """Recompute the largest weight from the values and children."""
+        weights = [child.max_weight for child in (self.low, self.equal,
+                                                  self.high)
+                   if child is not None]
+        if self.leaves:
+            weights.append(max(self.leaves.values()))
+        self.max_weight = max(weights, default=0.0)
+
+
+class TernarySearchTree(Autocompleter):
+    """An Autocompleter storing its values in a ternary search tree.
+
+    === Attributes ===
+    weight_type:
+        The type of weight used to aggregate the weights of the values,
+        'sum' or 'average'.
+    top_k:
+        The number of heaviest values kept for every prefix sequence, or
+        None if they are not kept.
+    """
+    __slots__ = ('weight_type', 'top_k', '_root', '_leaves', '_top',
+                 '_length')
+    weight_type: str
+    top_k: Optional[int]
+
+    # === Private Attributes ===
+    # The node of the first elements, or None if no prefix sequence is
+    # stored
+    _root: Optional[TernaryNode]
+    # The weight of each value whose prefix sequence is empty
+    _leaves: Dict[Any, float]
+    # The heaviest values of the whole tree, if they are kept
+    _top: Optional[List[Tuple[Any, float]]]
+    # The number of values stored
+    _length: int
+
+    def __init__(self, weight_type: str, top_k: Optional[int] = None) -> None:
+        """Initialize an empty ternary search tree with the given weight
+        type, keeping the <top_k> heaviest values of every prefix sequence
+        if <top_k> is given.
+
+        Precondition: weight_type == 'sum' or weight_type == 'average', and
+        top_k is None or top_k > 0.
+        """
+        self.weight_type = weight_type
+        self.top_k = top_k
+        self._root = None
+        self._leaves = {}
+        self._top = [] if top_k is not None else None
+        self._length = 0
+
+    @classmethod
+    def from_items(cls, weight_type: str,
+                   items: Iterable[Tuple[Any, float, List]],
+                   top_k: Optional[int] = None) -> TernarySearchTree:
+        """Return a new ternary search tree storing every
+        (value, weight, prefix) item.
+
+        See insert_balanced.
+        """
+        tree = cls(weight_type, top_k)
+        tree.insert_balanced(items)
+        return tree
+
+    def insert_balanced(self, items: Iterable[Tuple[Any, float, List]]
+                        ) -> None:
+        """Insert every (value, weight, prefix) item into this tree.
+
+        The items are sorted by prefix and inserted median first, range by
+        range, so that the searches along every position of an empty tree
+        are balanced. A list of items already sorted by prefix, such as
+        the ones pickled by __getstate__, is used as it is.
+        """
+        if not isinstance(items, list):
+            items = sorted(items, key=itemgetter(2))
+        elif any(items[index][2] < items[index - 1][2]
+                 for index in range(1, len(items))):
+            items = sorted(items, key=itemgetter(2))
+        ranges = [(0, len(items))]
+        while ranges:
+            start, end = ranges.pop()
+            if start < end:
+                middle = (start + end) // 2
+                self.insert(*items[middle])
+                ranges.append((middle + 1, end))
+                ranges.append((start, middle))
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        return self._length
+
+    def __getstate__(self) -> Tuple:
+        """Return the weight type, top_k and stored items, so that pickling
+        does not recurse through the nodes.
+        """
+        return self.weight_type, self.top_k, list(self.items())
+
+    def __setstate__(self, state: Tuple) -> None:
+        """Rebuild the tree pickled by __getstate__."""
+        weight_type, top_k, items = state
+        self.__init__(weight_type, top_k)
+        self.insert_balanced(items)
+
+    def items(self) -> Iterator[Tuple[Any, float, List]]:
+        """Yield the (value, weight, prefix) items stored in this tree."""
+        for value, weight in self._leaves.items():
+            yield value, weight, []
+
+        stack = [(self._root, [])] if self._root is not None else []
+        while stack:
+            node, prefix = stack.pop()
+            for child in (node.low, node.high):
+                if child is not None:
+                    stack.append((child, prefix))
+
+            prefix = prefix + [node.element]
+            if node.equal is not None:
+                stack.append((node.equal, prefix))
+            if node.leaves:
+                for value, weight in node.leaves.items():
+                    yield value, weight, prefix
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value into this Autocompleter.
+
+        See Autocompleter.insert.
+        """
+        # the nodes whose values include the new one, and the nodes ending
+        # the prefixes of its prefix sequence
+        path = []
+        ends = []
+        leaves = self._leaves
+        if prefix:
+            if self._root is None:
+                self._root = TernaryNode(prefix[0])
+            node = self._root
+            depth = 0
+            while True:
+                path.append(node)
+                element = prefix[depth]
+                if element < node.element:
+                    if node.low is None:
+                        node.low = TernaryNode(element)
+                    node = node.low
+                elif node.element < element:
+                    if node.high is None:
+                        node.high = TernaryNode(element)
+                    node = node.high
+                else:
+                    ends.append(node)
+                    depth += 1
+                    if depth == len(prefix):
+                        break
+                    if node.equal is None:
+                        node.equal = TernaryNode(prefix[depth])
+                    node = node.equal
+
+            if node.leaves is None:
+                node.leaves = {}
+            leaves = node.leaves
+
+        if value not in leaves:
+            self._length += 1
+        weight += leaves.get(value, 0.0)
+        leaves[value] = weight
+
+        for node in path:
+            node.max_weight = max(node.max_weight, weight)
+
+        if self.top_k is not None:
+            update_top(self._top, value, weight, self.top_k)
+            for node in ends:
+                if node.top is None:
+                    node.top = []
+                update_top(node.top, value, weight, self.top_k)
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix.
+
+        See Autocompleter.autocomplete.
+        """
+        if not prefix:
+            top = self._top
+            leaves = self._leaves
+            below = self._root
+        else:
+            node = self.find_node(prefix)
+            if node is None:
+                return []
+            top = node.top
+            leaves = node.leaves
+            below = node.equal
+
+        if top is not None and limit is not None and limit <= self.top_k:
+            return top[:limit]
+
+        return self.search(leaves, below, limit)
+
+    def search(self, leaves: Optional[Dict[Any, float]],
+               below: Optional[TernaryNode],
+               limit: Optional[int]) -> List[Tuple[Any, float]]:
+        """Return up to <limit> of the values of <leaves> and of <below> and
+        all of its children, in non-increasing weight order.
+
+        Without a limit, the values of every node are collected and sorted
+        once. Otherwise the nodes are searched best-first by their largest
+        weight, and the values of each node reached enter the heap one at a
+        time, heaviest first, so the search stops as soon as no node or
+        value left can be heavier than the <limit> values found.
+        """
+        if limit is None:
+            # in order of their prefix sequences, the values of a node after
+            # the smaller elements and before the longer sequences
+            result = list((leaves or {}).items())
+            stack = [below] if below is not None else []
+            while stack:
+                node = stack.pop()
+                if isinstance(node, dict):
+                    result.extend(node.items())
+                    continue
+
+                if node.high is not None:
+                    stack.append(node.high)
+                if node.equal is not None:
+                    stack.append(node.equal)
+                if node.leaves:
+                    stack.append(node.leaves)
+                if node.low is not None:
+                    stack.append(node.low)
+            result.sort(key=itemgetter(1), reverse=True)
+            return result
+
+        # the heap holds nodes, and lists of values sorted by weight with the
+        # index of the next value to pop
+        heap = []
+        count = 0
+        push_values(heap, leaves, count)
+        if below is not None:
+            count += 1
+            heap.append((-below.max_weight, count, below, 0))
+        heapq.heapify(heap)
+
+        result = []
+        while heap and len(result) < limit:
+            _, _, node, index = heapq.heappop(heap)
+            if isinstance(node, list):
+                result.append(node[index])
+                index += 1
+                if index < len(node):
+                    count += 1
+                    heapq.heappush(heap, (-node[index][1], count, node,
+                                          index))
+                continue
+
+            count += 1
+            push_values(heap, node.leaves, count)
+            for child in (node.low, node.equal, node.high):
+                if child is not None:
+                    count += 1
+                    heapq.heappush(heap, (-child.max_weight, count, child, 0))
+
+        return result
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for prefixes within <max_edits> edits
+        of the given prefix, in non-increasing weight order.
+
+        The nodes are searched best-first by their largest weight, keeping
+        for each the last row of the edit distance table between the given
+        prefix and the elements before its position, which its smaller and
+        larger nodes share, or None once every value below it matches. The
+        element of a node extends the row for the values ending with it and
+        the node of the next position.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        if substitution is None:
+            substitution = unit_substitution
+
+        row = [0.0] + [gap * length for length in range(1, len(prefix) + 1)]
+        if row[-1] <= max_edits:
+            return self.search(self._leaves, self._root, limit)
+        if self._root is None:
+            return []
+
+        # the heap holds nodes with their rows, and lists of matching values
+        # sorted by weight with the index of the next value to pop
+        result = []
+        heap = [(-self._root.max_weight, 0, self._root, row)]
+        count = 0
+        while heap and (limit is None or len(result) < limit):
+            _, _, node, row = heapq.heappop(heap)
+            if isinstance(node, list):
+                # the row of a list is the index of its next value
+                result.append(node[row])
+                if row + 1 < len(node):
+                    count += 1
+                    heapq.heappush(heap, (-node[row + 1][1], count, node,
+                                          row + 1))
+                continue
+
+            children = [(node.low, row), (node.high, row)]
+            if row is None:
+                count += 1
+                push_values(heap, node.leaves, count)
+                children.append((node.equal, None))
+            else:
+                step = fuzzy_step(row, [node.element], prefix, max_edits,
+                                  substitution, gap)
+                if step is not None and step[1]:
+                    count += 1
+                    push_values(heap, node.leaves, count)
+                    children.append((node.equal, None))
+                elif step is not None:
+                    children.append((node.equal, step[0]))
+
+            for child, child_row in children:
+                if child is not None:
+                    count += 1
+                    heapq.heappush(heap, (-child.max_weight, count, child,
+                                          child_row))
+
+        return result
+
+    def find_node(self, prefix: List) -> Optional[TernaryNode]:
+        """Return the node ending the non-empty <prefix>, or None if no
+        stored prefix sequence starts with it.
+        """
+        node = self._root
+        depth = 0
+        while node is not None:
+            element = prefix[depth]
+            if element < node.element:
+                node = node.low
+            elif node.element < element:
+                node = node.high
+            else:
+                depth += 1
+                if depth == len(prefix):
+                    return node
+                node = node.equal
+
+        return None
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix.
+
+        Nodes left without children and values are unlinked, and the largest
+        weights and heaviest values above the removed values are recomputed.
+        """
+        if not prefix:
+            self.__init__(self.weight_type, self.top_k)
+            return
+
+        # the nodes from the root to the node ending the prefix, and the
+        # nodes ending the prefixes of the prefix
+        path = []
+        ends = []
+        node = self._root
+        depth = 0
+        while node is not None:
+            path.append(node)
+            element = prefix[depth]
+            if element < node.element:
+                node = node.low
+            elif node.element < element:
+                node = node.high
+            else:
+                ends.append(node)
+                depth += 1
+                if depth == len(prefix):
+                    break
+                node = node.equal
+
+        if node is None:
+            return
+
+        self._length -= count_values(node.leaves, node.equal)
+        node.leaves = None
+        node.equal = None
+        node.top = None
+
+        # update the nodes above, unlinking the empty ones
+        for index in range(len(path) - 1, -1, -1):
+            node = path[index]
+            if node.is_empty():
+                if index == 0:
+                    self._root = None
+                else:
+                    parent = path[index - 1]
+                    if parent.low is node:
+                        parent.low = None
+                    elif parent.equal is node:
+                        parent.equal = None
+                    else:
+                        parent.high = None
+            else:
+                node.update_max_weight()
+
+        if self.top_k is not None:
+            self._top = self.search(self._leaves, self._root, self.top_k)
+            for node in ends[:-1]:
+                node.top = self.search(node.leaves, node.equal, self.top_k)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the number of nodes ('nodes') and values ('leaves') in this
+        tree, and the approximate number of bytes they use ('bytes').
+
+        The bytes count the nodes and the dicts and lists they own, but not
+        the inserted values, prefix elements and weights.
+        """
+        stats = {'nodes': 0, 'leaves': len(self._leaves),
+                 'bytes': sys.getsizeof(self._leaves)}
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            stats['nodes'] += 1
+            stats['bytes'] += sys.getsizeof(node)
+            if node.leaves is not None:
+                stats['leaves'] += len(node.leaves)
+                stats['bytes'] += sys.getsizeof(node.leaves)
+            if node.top is not None:
+                stats['bytes'] += sys.getsizeof(node.top)
+            stack.extend(child for child in (node.low, node.equal, node.high)
+                         if child is not None)
+
+        return stats
+
+
+def update_top(top: List[Tuple[Any, float]], value: Any, weight: float,
+               top_k: int) -> None:
+    """Update the heaviest values <top> after the weight of <value> grew to
+    <weight>, keeping at most <top_k> of them.
+    """
+    for index, (other, _) in enumerate(top):
+        if other == value:
+            del top[index]
+            break
+
+    # after the values at least as heavy, like the other prefix trees
+    index = 0
+    while index < len(top) and top[index][1] >= weight:
+        index += 1
+    if index < top_k:
+        top.insert(index, (value, weight))
+        del top[top_k:]
+
+
+def push_values(heap: List, leaves: Optional[Dict[Any, float]],
+                count: int) -> None:
+    """Push the values of <leaves>, sorted by weight, onto the search
+    <heap> as a single entry with <count>, keyed on the heaviest value.
+    """
+    if leaves:
+        values = sorted(leaves.items(), key=itemgetter(1), reverse=True)
+        heapq.heappush(heap, (-values[0][1], count, values, 0))
+
+
+def count_values(leaves: Optional[Dict[Any, float]],
+                 below: Optional[TernaryNode]) -> int:
+    """Return the number of values of <leaves> and of <below> and all of its
+    children.
+    """
+    count = len(leaves or ())
+    stack = [below] if below is not None else []
+    while stack:
+        node = stack.pop()
+        count += len(node.leaves or ())
+        stack.extend(child for child in (node.low, node.equal, node.high)
+                     if child is not None)
+
+    return count
@@ -0,0 +1,252 @@
+"""Word vocabulary
+
+=== Module description ===
+This file contains Vocabulary, which interns the words of the prefix
+sequences of the sentence engine as consecutive integer ids, and
+VocabularyAutocompleter, an Autocompleter storing its prefix sequences in
+another Autocompleter as lists of those ids.
+
+Every occurrence of a word in the prefix tree is then the same int object
+owned by the vocabulary, instead of a copy of the word read from each line,
+and every comparison of prefix elements while descending the tree is an int
+comparison. A prefix is translated to ids once per query, and a prefix with
+a word that is not in the vocabulary matches nothing without looking at the
+tree.
+"""
+from __future__ import annotations
+
+from functools import partial
+from typing import (Any, Dict, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple)
+
+from .prefix_tree import Autocompleter, Substitution, unit_substitution
+
+
+class Vocabulary:
+    """Words interned with consecutive integer ids, in the order they were
+    first added.
+
+    === Attributes ===
+    words:
+        The word with each id.
+    """
+    words: List[str]
+
+    # === Private Attributes ===
+    # The id of each word
+    _ids: Dict[str, int]
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        """Initialize a vocabulary of the given words, with ids in order.
+        """
+        self.words = []
+        self._ids = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        """Return the number of words in this vocabulary."""
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        """Return whether <word> is in this vocabulary."""
+        return word in self._ids
+
+    def __getstate__(self) -> Tuple[List[str]]:
+        """Return the words to pickle, without their ids, which are their
+        positions.
+        """
+        return (self.words,)
+
+    def __setstate__(self, state: Tuple[List[str]]) -> None:
+        """Restore a vocabulary of the pickled words."""
+        self.__init__(state[0])
+
+    def add(self, word: str) -> int:
+        """Return the id of <word>, adding it to this vocabulary with the next
+        id if it is not in it.
+        """
+        word_id = self._ids.get(word)
+        if word_id is None:
+            word_id = self._ids[word] = len(self.words)
+            self.words.append(word)
+        return word_id
+
+    def intern(self, words: List[str]) -> List[int]:
+        """Return the ids of <words>, adding the words not in this
+        vocabulary.
+        """
+        return [self.add(word) for word in words]
+
+    def intern_items(self, items: Iterable[Tuple[Any, float, List[str]]]
+                     ) -> Iterator[Tuple[Any, float, List[int]]]:
+        """Yield the given (value, weight, prefix) items with the words of
+        their prefixes interned, as they are read.
+        """
+        for value, weight, prefix in items:
+            yield value, weight, self.intern(prefix)
+
+    def encode(self, words: List[str]) -> Optional[List[int]]:
+        """Return the ids of <words>, or None if one of them is not in this
+        vocabulary.
+        """
+        ids = []
+        for word in words:
+            word_id = self._ids.get(word)
+            if word_id is None:
+                return None
+            ids.append(word_id)
+        return ids
+
+    def decode(self, ids: List[int]) -> List[str]:
+        """Return the words with the given ids."""
+        return [self.words[word_id] for word_id in ids]
+
+
+class VocabularyAutocompleter(Autocompleter):
+    """An Autocompleter storing the values of prefix sequences of words in
+    another Autocompleter, under the ids of the words in a vocabulary.
+
+    === Attributes ===
+    autocompleter:
+        The Autocompleter storing the values under prefix sequences of ids.
+    vocabulary:
+        The vocabulary of the words of the stored prefix sequences.
+    """
+    autocompleter: Autocompleter
+    vocabulary: Vocabulary
+
+    def __init__(self, autocompleter: Autocompleter,
+                 vocabulary: Vocabulary) -> None:
+        """Initialize an Autocompleter translating prefixes with <vocabulary>
+        for the given Autocompleter.
+
+        Precondition: the prefix sequences stored by <autocompleter> are ids
+        in <vocabulary>.
+        """
+        self.autocompleter = autocompleter
+        self.vocabulary = vocabulary
+
+    def __len__(self) -> int:
+        """Return the number of values stored in this Autocompleter."""
+        return len(self.autocompleter)
+
+    def insert(self, value: Any, weight: float, prefix: List) -> None:
+        """Insert the given value under the ids of the words of <prefix>,
+        adding the new words to the vocabulary.
+
+        See Autocompleter.insert.
+        """
+        self.autocompleter.insert(value, weight,
+                                  self.vocabulary.intern(prefix))
+
+    def autocomplete(self, prefix: List,
+                     limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Return up to <limit> matches for the given prefix, or none if one
+        of its words is not in the vocabulary.
+
+        See Autocompleter.autocomplete.
+        """
+        ids = self.vocabulary.encode(prefix)
+        if ids is None:
+            return []
+        return self.autocompleter.autocomplete(ids, limit)
+
+    def autocomplete_many(self, prefixes: Iterable[List],
+                          limit: Optional[int] = None
+                          ) -> List[List[Tuple[Any, float]]]:
+        """Return the autocomplete results of every prefix in <prefixes>, the
+        ones whose words are all in the vocabulary being looked up together.
+
+        See Autocompleter.autocomplete_many.
+        """
+        encoded = [self.vocabulary.encode(prefix) for prefix in prefixes]
+        known = [index for index, ids in enumerate(encoded) if ids is not None]
+        found = self.autocompleter.autocomplete_many(
+            [encoded[index] for index in known], limit)
+
+        results = [[] for _ in encoded]
+        for index, result in zip(known, found):
+            results[index] = result
+        return results
+
+    def autocomplete_fuzzy(self, prefix: List, max_edits: float,
+                           limit: Optional[int] = None,
+                           substitution: Optional[Substitution] = None,
+                           gap: float = 1.0) -> List[Tuple[Any, float]]:
+        """Return up to <limit> fuzzy matches for the given prefix, whose
+        words do not have to be in the vocabulary.
+
+        <substitution> is called with the words of the stored prefix
+        sequences, looked up by their ids. It is given to the Autocompleter
+        along with every word of the vocabulary, which is why the workers of
+        a ShardedAutocompleter keep vocabularies of their own instead of
+        the ShardedAutocompleter being wrapped.
+
+        See Autocompleter.autocomplete_fuzzy.
+        """
+        return self.autocompleter.autocomplete_fuzzy(
+            prefix, max_edits, limit,
+            partial(decoded_substitution, substitution or unit_substitution,
+                    self.vocabulary.words), gap)
+
+    def remove(self, prefix: List) -> None:
+        """Remove all values that match the given prefix, if its words are
+        all in the vocabulary.
+
+        Words are never removed from the vocabulary.
+        """
+        ids = self.vocabulary.encode(prefix)
+        if ids is not None:
+            self.autocompleter.remove(ids)
+
+    def increment(self, value: Any, delta: float) -> None:
+        """Add <delta> to the weight of the given value.
+
+        See Autocompleter.increment.
+        """
+        self.autocompleter.increment(value, delta)
+
+    def remove_value(self, value: Any) -> None:
+        """Remove the given value.
+
+        See Autocompleter.remove_value.
+        """
+        self.autocompleter.remove_value(value)
+
+    def prefix_of(self, value: Any) -> Optional[List]:
+        """Return the prefix sequence of words <value> is stored under, or
+        None if it is not stored.
+        """
+        ids = self.autocompleter.prefix_of(value)
+        return None if ids is None else self.vocabulary.decode(ids)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Return the memory statistics of the Autocompleter, which do not
+        count the prefix elements, and so the vocabulary.
+        """
+        return self.autocompleter.memory_stats()
+
+    def freeze(self) -> Autocompleter:
+        """Return a read-only copy of the prefix tree of ids, storing the
+        words instead of their ids, so that it answers queries of words
+        without the vocabulary.
+
+        See SimplePrefixTree.freeze.
+        """
+        return self.autocompleter.freeze(self.vocabulary.words)
+
+    def close(self) -> None:
+        """Close the Autocompleter, such as a ShardedAutocompleter stopping
+        its worker processes.
+        """
+        self.autocompleter.close()
+
+
+def decoded_substitution(substitution: Substitution, words: Sequence[str],
+                         query_element: Any, element: int,
+                         last: bool) -> float:
+    """Return the cost of substituting the word with id <element> in
+    <words> for <query_element>, according to <substitution>.
+    """
+    return substitution(query_element, words[element], last)
@@ -0,0 +1,710 @@
+"""Benchmarks
+
+=== Module description ===
+This file contains benchmarks for the prefix trees used by the autocomplete
+engines. The data for the benchmarks are in data folder.
+"""
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fire
+
+from autocomplete.burst import BurstTrie
+from autocomplete.cache import CachedAutocompleter
+from autocomplete.dawg import DawgAutocompleter
+from autocomplete.disk import DiskAutocompleter
+from autocomplete.engine import (
+    LetterAutocompleteEngine,
+    read_letter_items,
+    read_melody_items,
+    read_sentence_items
+)
+from autocomplete.parallel import from_items_parallel
+from autocomplete.prefix_tree import (
+    Autocompleter,
+    SimplePrefixTree,
+    SimplePrefixTreeNode,
+    CompressedPrefixTree,
+    CompressedPrefixTreeNode
+)
+from autocomplete.ternary import TernarySearchTree
+from autocomplete.vocabulary import Vocabulary, VocabularyAutocompleter
+
+
+################################################################################
+# Helpers
+################################################################################
+def build_tree(tree: Autocompleter,
+               items: List[Tuple[Any, float, List]]) -> Autocompleter:
+    """Insert every item into <tree> and return it.
+    """
+    for value, weight, prefix in items:
+        tree.insert(value, weight, prefix)
+
+    return tree
+
+
+def best_time(func: Callable[[], Any], repeat: int,
+              collect: bool = False) -> float:
+    """Return the shortest time in seconds taken by <repeat> calls of <func>.
+
+    Garbage collection is disabled while timing, as timeit does, unless
+    <collect> is True, as when an engine builds its tree.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        if not collect:
+            gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    return min(times)
+
+
+def traced_memory(func: Callable[[], Any]) -> int:
+    """Return the number of bytes allocated by a call of <func> that are
+    still in use by its return value.
+
+    Prefix trees hold references to their parents, so garbage is collected
+    before measuring to free the trees <func> no longer uses.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    del result
+    return size
+
+
+class ResortingSimplePrefixTreeNode(SimplePrefixTreeNode):
+    """A SimplePrefixTreeNode that re-sorts its subtrees and re-aggregates
+    their weights at every level an insertion passes through.
+
+    This is how insert maintained the tree before running aggregates were
+    kept, and is only used as a baseline.
+    """
+    __slots__ = ()
+
+    def new_node(self) -> SimplePrefixTreeNode:
+        """Return a new re-sorting tree."""
+        return ResortingSimplePrefixTreeNode()
+
+    def reposition_subtree(self, subtree: Any) -> None:
+        """Sort all subtrees again."""
+        self.subtrees.sort(key=lambda s: s.weight, reverse=True)
+
+    def get_aggr_weight(self, weight_type: str) -> float:
+        """Return the aggregated weight computed from every subtree."""
+        total = sum([s.get_total_leaf_weights() for s in self.subtrees])
+        length = sum([len(s) for s in self.subtrees])
+        if weight_type == 'sum':
+            return total
+        return total / length if length else 0.0
+
+
+class ResortingSimplePrefixTree(ResortingSimplePrefixTreeNode,
+                                SimplePrefixTree):
+    """The SimplePrefixTree made of ResortingSimplePrefixTreeNode trees.
+    """
+    __slots__ = ()
+
+
+class ResortingCompressedPrefixTreeNode(CompressedPrefixTreeNode):
+    """The CompressedPrefixTreeNode counterpart of
+    ResortingSimplePrefixTreeNode.
+    """
+    __slots__ = ()
+    reposition_subtree = ResortingSimplePrefixTreeNode.reposition_subtree
+    get_aggr_weight = ResortingSimplePrefixTreeNode.get_aggr_weight
+
+    def new_node(self) -> CompressedPrefixTreeNode:
+        """Return a new re-sorting tree."""
+        return ResortingCompressedPrefixTreeNode()
+
+
+class ResortingCompressedPrefixTree(ResortingCompressedPrefixTreeNode,
+                                    CompressedPrefixTree):
+    """The CompressedPrefixTree made of ResortingCompressedPrefixTreeNode
+    trees.
+    """
+    __slots__ = ()
+
+
+class PrefixCopySimplePrefixTreeNode(SimplePrefixTreeNode):
+    """A SimplePrefixTreeNode that also keeps a copy of its whole common
+    prefix.
+
+    This is how every tree stored its value before only the last prefix
+    element was kept, and is only used as a baseline.
+    """
+    __slots__ = ('prefix_copy',)
+
+    def new_node(self) -> SimplePrefixTreeNode:
+        """Return a new tree keeping a prefix copy."""
+        return PrefixCopySimplePrefixTreeNode()
+
+    def create_branch(self, value: Any, weight: float, prefix: List,
+                      depth: int) -> SimplePrefixTreeNode:
+        """Create the branch and copy the prefix of each of its trees."""
+        subtree = SimplePrefixTreeNode.create_branch(self, value, weight,
+                                                     prefix, depth)
+        tree = subtree
+        for length in range(depth + 1, len(prefix) + 1):
+            tree.prefix_copy = prefix[:length]
+            tree = tree.subtrees[0]
+
+        return subtree
+
+
+class PrefixCopySimplePrefixTree(SimplePrefixTree):
+    """The SimplePrefixTree made of PrefixCopySimplePrefixTreeNode trees.
+    """
+    __slots__ = ()
+    new_node = PrefixCopySimplePrefixTreeNode.new_node
+    create_branch = PrefixCopySimplePrefixTreeNode.create_branch
+
+
+################################################################################
+# Benchmarks
+################################################################################
+@dataclass
+class Benchmarks:
+    """Class containing all benchmarks for the prefix trees.
+    """
+    weight_type: str = 'sum'
+    repeat: int = 1
+
+    def build(self, file: str = 'data/lotr.txt') -> Dict[str, float]:
+        """Time building each prefix tree from the lines of a text file, with
+        running aggregates and with the re-sorting baseline.
+
+        Returns the build time of each tree in seconds.
+        """
+        items = list(read_letter_items(file))
+        trees = {
+            'simple': SimplePrefixTree,
+            'simple (re-sorting)': ResortingSimplePrefixTree,
+            'compressed': CompressedPrefixTree,
+            'compressed (re-sorting)': ResortingCompressedPrefixTree
+        }
+
+        result = {}
+        for name, tree_class in trees.items():
+            result[name] = best_time(
+                lambda: build_tree(tree_class(self.weight_type), items),
+                self.repeat)
+
+        return result
+
+    def bulk(self, letter_file: str = 'data/lotr.txt',
+             sentence_file: str = 'data/google_searches.csv'
+             ) -> Dict[str, float]:
+        """Time building each prefix tree from the lines of a text file and
+        from the sentences of a CSV file, with the bulk loader and by
+        inserting one item at a time.
+
+        Returns the build time of each tree in seconds.
+        """
+        corpora = {
+            'letter': list(read_letter_items(letter_file)),
+            'sentence': list(read_sentence_items(sentence_file))
+        }
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree
+        }
+
+        result = {}
+        for corpus, items in corpora.items():
+            for name, tree_class in trees.items():
+                result[f'{corpus}: {name}'] = best_time(
+                    lambda: build_tree(tree_class(self.weight_type), items),
+                    self.repeat)
+                result[f'{corpus}: {name} (bulk)'] = best_time(
+                    lambda: tree_class.from_items(self.weight_type, items),
+                    self.repeat)
+
+        return result
+
+    def parallel(self, letter_file: str = 'data/lotr.txt',
+                 sentence_file: str = 'data/google_searches.csv',
+                 workers: Optional[int] = None) -> Dict[str, float]:
+        """Time bulk loading each prefix tree from the lines of a text file
+        and from the sentences of a CSV file, in this process and in
+        <workers> processes, or one per CPU if <workers> is None.
+
+        Garbage collection is left enabled, as when an engine builds its
+        tree, so that the parallel build saving the collections of the nodes
+        of the shard trees is counted.
+
+        Returns the build time of each tree in seconds.
+        """
+        corpora = {
+            'letter': list(read_letter_items(letter_file)),
+            'sentence': list(read_sentence_items(sentence_file))
+        }
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree
+        }
+
+        result = {}
+        for corpus, items in corpora.items():
+            for name, tree_class in trees.items():
+                result[f'{corpus}: {name}'] = best_time(
+                    lambda: tree_class.from_items(self.weight_type, items),
+                    self.repeat, collect=True)
+                result[f'{corpus}: {name} (parallel)'] = best_time(
+                    lambda: from_items_parallel(tree_class, self.weight_type,
+                                                items, workers=workers),
+                    self.repeat, collect=True)
+
+        return result
+
+    def memory(self, letter_file: str = 'data/lotr.txt',
+               sentence_file: str = 'data/google_searches.csv'
+               ) -> Dict[str, float]:
+        """Measure the memory used by each prefix tree built from the lines
+        of a text file and from the sentences of a CSV file. The
+        SimplePrefixTree is also measured with a copy of the whole prefix in
+        each of its trees.
+
+        Returns the memory used by each tree in megabytes.
+        """
+        corpora = {
+            'letter': list(read_letter_items(letter_file)),
+            'sentence': list(read_sentence_items(sentence_file))
+        }
+        trees = {
+            'simple': SimplePrefixTree,
+            'simple (prefix copies)': PrefixCopySimplePrefixTree,
+            'compressed': CompressedPrefixTree
+        }
+
+        result = {}
+        for corpus, items in corpora.items():
+            for name, tree_class in trees.items():
+                size = traced_memory(
+                    lambda: build_tree(tree_class(self.weight_type), items))
+                result[f'{corpus}: {name}'] = round(size / 2 ** 20, 1)
+
+        return result
+
+    def burst(self, letter_file: str = 'data/lotr.txt',
+              sentence_file: str = 'data/google_searches.csv',
+              limit: int = 10) -> Dict[str, Dict[str, float]]:
+        """Compare the burst trie with the other prefix trees built from the
+        lines of a text file and from the sentences of a CSV file, by the
+        time in seconds taken to build them with their bulk loaders, the
+        memory they use in megabytes, and the time in seconds taken to
+        autocomplete the first three elements of every prefix.
+        """
+        corpora = {
+            'letter': list(read_letter_items(letter_file)),
+            'sentence': list(read_sentence_items(sentence_file))
+        }
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree,
+            'burst': BurstTrie
+        }
+
+        result = {}
+        for corpus, items in corpora.items():
+            queries = [prefix[:3] for _, _, prefix in items]
+            for name, tree_class in trees.items():
+                build = best_time(
+                    lambda: tree_class.from_items(self.weight_type, items),
+                    self.repeat)
+                size = traced_memory(
+                    lambda: tree_class.from_items(self.weight_type, items))
+                tree = tree_class.from_items(self.weight_type, items)
+                result[f'{corpus}: {name}'] = {
+                    'build': build,
+                    'memory': round(size / 2 ** 20, 1),
+                    'query': best_time(
+                        lambda: [tree.autocomplete(query, limit)
+                                 for query in queries], self.repeat)
+                }
+                del tree
+
+        return result
+
+    def ternary(self, sentence_file: str = 'data/google_searches.csv',
+                melody_file: str = 'data/songbook.csv', limit: int = 10
+                ) -> Dict[str, Dict[str, float]]:
+        """Compare the ternary search tree with the other prefix trees built
+        from the sentences of a CSV file and from the melodies of another,
+        whose prefix elements are words and intervals.
+
+        Returns the bytes used per value stored, and the microseconds taken
+        by a query for the first two elements of a prefix sequence.
+        """
+        corpora = {
+            'sentence': list(read_sentence_items(sentence_file)),
+            'melody': list(read_melody_items(melody_file))
+        }
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree,
+            'ternary': TernarySearchTree
+        }
+
+        result = {}
+        for corpus, items in corpora.items():
+            queries = [prefix[:2] for _, _, prefix in items]
+            for name, tree_class in trees.items():
+                size = traced_memory(
+                    lambda: tree_class.from_items(self.weight_type, items))
+                tree = tree_class.from_items(self.weight_type, items)
+                query = best_time(
+                    lambda: [tree.autocomplete(prefix, limit)
+                             for prefix in queries], self.repeat)
+                result[f'{corpus}: {name}'] = {
+                    'bytes per value': round(size / len(tree)),
+                    'query (us)': round(query / len(queries) * 10 ** 6, 2)
+                }
+                del tree
+
+        return result
+
+    def dawg(self, file: str = 'data/lotr.txt', limit: int = 10
+             ) -> Dict[str, Dict[str, float]]:
+        """Compare the minimized automaton with the compressed prefix tree
+        built from the lines of a text file, by the time in seconds taken to
+        build them, the memory they use in megabytes, and the time in
+        seconds taken to autocomplete the first three letters of every line.
+        """
+        items = list(read_letter_items(file))
+        queries = [prefix[:3] for _, _, prefix in items]
+        trees = {
+            'compressed': CompressedPrefixTree,
+            'dawg': DawgAutocompleter
+        }
+
+        result = {}
+        for name, tree_class in trees.items():
+            build = best_time(
+                lambda: tree_class.from_items(self.weight_type, items),
+                self.repeat)
+            size = traced_memory(
+                lambda: tree_class.from_items(self.weight_type, items))
+            tree = tree_class.from_items(self.weight_type, items)
+            result[name] = {
+                'build': build,
+                'memory': round(size / 2 ** 20, 1),
+                'query': best_time(
+                    lambda: [tree.autocomplete(query, limit)
+                             for query in queries], self.repeat)
+            }
+            del tree
+
+        return result
+
+    def disk(self, file: str = 'data/lotr.txt', prefix: str = 'th',
+             limit: int = 10) -> Dict[str, Dict[str, float]]:
+        """Compare the database of a DiskAutocompleter with the compressed
+        prefix tree built from the lines of a text file, by the time in
+        seconds taken to build them, to autocomplete <prefix> with and
+        without <limit>, and to autocomplete it within one edit with
+        <limit>.
+        """
+        items = list(read_letter_items(file))
+        query = list(prefix)
+
+        result = {}
+        with tempfile.TemporaryDirectory() as directory:
+            builders = {
+                'compressed': lambda: CompressedPrefixTree.from_items(
+                    self.weight_type, items),
+                'disk': lambda: DiskAutocompleter.from_items(
+                    self.weight_type, items,
+                    os.path.join(directory, f'{time.time()}.db'))
+            }
+            for name, build in builders.items():
+                start = time.perf_counter()
+                tree = build()
+                result[name] = {
+                    'build': time.perf_counter() - start,
+                    'query': best_time(lambda: tree.autocomplete(query),
+                                       self.repeat),
+                    'limited': best_time(
+                        lambda: tree.autocomplete(query, limit), self.repeat),
+                    'fuzzy': best_time(
+                        lambda: tree.autocomplete_fuzzy(query, 1, limit),
+                        self.repeat)
+                }
+                if name == 'disk':
+                    tree.close()
+
+        return result
+
+    def vocabulary(self, file: str = 'data/google_searches.csv',
+                   limit: int = 10) -> Dict[str, Dict[str, float]]:
+        """Compare each prefix tree storing the words of the sentences of a
+        CSV file with the tree storing their ids in a vocabulary, by the
+        memory they use in megabytes, including the words, and the time in
+        seconds taken to autocomplete the first two words of every sentence
+        and the same prefixes with an unknown last word.
+        """
+        items = list(read_sentence_items(file))
+        queries = [prefix[:2] for _, _, prefix in items]
+        queries += [query[:-1] + ['unknownword'] for query in queries]
+
+        def build_words(tree_class: type) -> Autocompleter:
+            # the words are read again, as the engine reads them
+            return tree_class.from_items(self.weight_type,
+                                         read_sentence_items(file))
+
+        def build_ids(tree_class: type) -> Autocompleter:
+            vocabulary = Vocabulary()
+            return VocabularyAutocompleter(
+                tree_class.from_items(
+                    self.weight_type,
+                    vocabulary.intern_items(read_sentence_items(file))),
+                vocabulary)
+
+        result = {}
+        for name, tree_class in [('simple', SimplePrefixTree),
+                                 ('compressed', CompressedPrefixTree)]:
+            for encoding, build in [('words', build_words),
+                                    ('ids', build_ids)]:
+                size = traced_memory(lambda: build(tree_class))
+                tree = build(tree_class)
+                result[f'{name}: {encoding}'] = {
+                    'memory': round(size / 2 ** 20, 1),
+                    'query': best_time(
+                        lambda: [tree.autocomplete(query, limit)
+                                 for query in queries], self.repeat)
+                }
+                del tree
+
+        return result
+
+    def frozen(self, file: str = 'data/lotr.txt', limit: int = 10
+               ) -> Dict[str, Dict[str, float]]:
+        """Compare each prefix tree built from the lines of a text file with
+        its frozen copy, by the memory they use in megabytes and the time in
+        seconds taken to autocomplete the first three letters of every line.
+        """
+        items = list(read_letter_items(file))
+        queries = [prefix[:3] for _, _, prefix in items]
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree
+        }
+
+        result = {}
+        for name, tree_class in trees.items():
+            tree = build_tree(tree_class(self.weight_type), items)
+            for label, autocompleter in [(name, tree),
+                                         (name + ' (frozen)', tree.freeze())]:
+                result[label] = {'query': best_time(
+                    lambda: [autocompleter.autocomplete(query, limit)
+                             for query in queries], self.repeat)}
+            del tree
+
+            result[name]['memory'] = round(traced_memory(
+                lambda: build_tree(tree_class(self.weight_type), items)
+            ) / 2 ** 20, 1)
+            result[name + ' (frozen)']['memory'] = round(traced_memory(
+                lambda: build_tree(tree_class(self.weight_type),
+                                   items).freeze()) / 2 ** 20, 1)
+
+        return result
+
+    def startup(self, file: str = 'data/lotr.txt') -> Dict[str, float]:
+        """Time starting a letter autocomplete engine and answering its first
+        query, from the lines of a text file, from an index file saved from
+        its frozen tree and from its snapshot in a cache directory.
+
+        Returns the startup time of each engine in seconds.
+        """
+        config = {
+            'file': file,
+            'autocompleter': 'compressed',
+            'weight_type': self.weight_type
+        }
+
+        result = {'file': best_time(
+            lambda: LetterAutocompleteEngine(config).autocomplete('the', 10),
+            self.repeat)}
+
+        with tempfile.TemporaryDirectory() as directory:
+            index = os.path.join(directory, 'letter.index')
+            LetterAutocompleteEngine(config).autocompleter.freeze().save(index)
+            result['index'] = best_time(
+                lambda: LetterAutocompleteEngine(
+                    {'index': index}).autocomplete('the', 10),
+                self.repeat)
+
+            cached = dict(config, cache_dir=directory)
+            LetterAutocompleteEngine(cached)
+            result['cache'] = best_time(
+                lambda: LetterAutocompleteEngine(cached).autocomplete('the',
+                                                                      10),
+                self.repeat)
+
+        return result
+
+    def cache(self, file: str = 'data/google_searches.csv',
+              queries: int = 100000, size: int = 1024
+              ) -> Dict[str, float]:
+        """Time autocompleting skewed queries with a compressed prefix tree
+        built from the sentences of a CSV file, with and without a cache of
+        <size> results.
+
+        The queries are the first one or two words of the sentences, drawn
+        with Zipf-distributed frequencies. Returns the time of each run in
+        seconds and the hit rate of the cache.
+        """
+        items = list(read_sentence_items(file))
+        prefixes = list({tuple(prefix[:length]): None
+                         for _, _, prefix in items for length in [1, 2]})
+        rng = random.Random(0)
+        rng.shuffle(prefixes)
+        stream = rng.choices(prefixes, k=queries,
+                             weights=[1 / (rank + 1) ** 1.1
+                                      for rank in range(len(prefixes))])
+
+        tree = CompressedPrefixTree.from_items(self.weight_type, items)
+        result = {'tree': best_time(
+            lambda: [tree.autocomplete(list(q), 10) for q in stream],
+            self.repeat)}
+
+        cached = None
+
+        def run() -> None:
+            nonlocal cached
+            cached = CachedAutocompleter(tree, size)
+            for q in stream:
+                cached.autocomplete(list(q), 10)
+
+        result['cached'] = best_time(run, self.repeat)
+        result['hit rate'] = round(cached.cache_stats()['hits'] / queries, 3)
+        return result
+
+    def many(self, file: str = 'data/lotr.txt', length: int = 5,
+             limit: int = 10, top_k: Optional[int] = None
+             ) -> Dict[str, Dict[str, float]]:
+        """Compare autocompleting the first <length> letters of every line of
+        a text file one prefix at a time and all together with
+        autocomplete_many, with each prefix tree keeping the <top_k> heaviest
+        values of every tree if <top_k> is given.
+
+        Returns the number of prefixes autocompleted per second.
+        """
+        items = list(read_letter_items(file))
+        queries = [prefix[:length] for _, _, prefix in items]
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree
+        }
+
+        result = {}
+        for name, tree_class in trees.items():
+            tree = tree_class.from_items(self.weight_type, items, top_k)
+            loop = best_time(
+                lambda: [tree.autocomplete(query, limit) for query in queries],
+                self.repeat)
+            batch = best_time(lambda: tree.autocomplete_many(queries, limit),
+                              self.repeat)
+            result[name] = {'loop': round(len(queries) / loop),
+                            'batch': round(len(queries) / batch)}
+            del tree
+
+        return result
+
+    def fuzzy(self, file: str = 'data/lotr.txt', length: int = 5,
+              max_edits: int = 1, limit: int = 10
+              ) -> Dict[str, Dict[str, float]]:
+        """Compare autocompleting the first <length> letters of lines of a
+        text file, with a letter substituted, exactly and with up to
+        <max_edits> edits.
+
+        Returns the average milliseconds taken by each query.
+        """
+        items = list(read_letter_items(file))
+        queries = [prefix[:length - 1] + ['x'] + prefix[length:length]
+                   for _, _, prefix in items[::max(1, len(items) // 200)]]
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree
+        }
+
+        result = {}
+        for name, tree_class in trees.items():
+            tree = tree_class.from_items(self.weight_type, items)
+            exact = best_time(
+                lambda: [tree.autocomplete(query, limit) for query in queries],
+                self.repeat)
+            fuzzy = best_time(
+                lambda: [tree.autocomplete_fuzzy(query, max_edits, limit)
+                         for query in queries], self.repeat)
+            result[name] = {'exact': round(exact / len(queries) * 1000, 3),
+                            'fuzzy': round(fuzzy / len(queries) * 1000, 3)}
+            del tree
+
+        return result
+
+    def topk(self, file: str = 'data/lotr.txt', top_k: int = 10
+             ) -> Dict[str, Dict[str, float]]:
+        """Compare each prefix tree built from the lines of a text file with
+        the same tree keeping the <top_k> heaviest values of every tree, by
+        the time in seconds taken to autocomplete the first three letters of
+        every line with a limit of <top_k>, and by the megabytes used by the
+        heaviest values kept.
+        """
+        items = list(read_letter_items(file))
+        queries = [prefix[:3] for _, _, prefix in items]
+        trees = {
+            'simple': SimplePrefixTree,
+            'compressed': CompressedPrefixTree,
+            'burst': BurstTrie
+        }
+
+        result = {}
+        for name, tree_class in trees.items():
+            for label, k in [(name, None), (f'{name} (top {top_k})', top_k)]:
+                tree = tree_class.from_items(self.weight_type, items, k)
+                result[label] = {
+                    'query': best_time(
+                        lambda: [tree.autocomplete(query, top_k)
+                                 for query in queries], self.repeat),
+                    'top memory': round(tree.top_memory() / 2 ** 20, 1)
+                }
+                del tree
+
+        return result
+
+    def stats(self, file: str = 'data/lotr.txt') -> Dict[str, Dict[str, int]]:
+        """Return the memory_stats of each prefix tree built from the lines of
+        a text file.
+        """
+        items = list(read_letter_items(file))
+        return {
+            'simple': build_tree(SimplePrefixTree(self.weight_type),
+                                 items).memory_stats(),
+            'compressed': build_tree(CompressedPrefixTree(self.weight_type),
+                                     items).memory_stats()
+        }
+
+
+if __name__ == '__main__':
+    fire.Fire(Benchmarks)
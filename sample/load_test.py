@@ -0,0 +1,112 @@
+"""Load test
+
+=== Module description ===
+This file contains a load generator for the autocomplete server. Each client
+types lines of a text file one keystroke at a time, sending a request for
+every prefix typed, and the latencies of the answers are reported.
+
+Start a server first, e.g. from the sample folder:
+
+    python -m autocomplete.server letter data/lotr.txt --top_k=10
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+import fire
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the value at <fraction> of the sorted <values>, or nan if
+    there are none, such as when every request was cancelled.
+
+    Precondition: 0 <= fraction <= 1
+    """
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_client(session: int, lines: List[str], host: str, port: int,
+                     limit: int, delay: float,
+                     latencies: List[float], counts: Dict[str, int]) -> None:
+    """Type every line of <lines> through one connection, waiting <delay>
+    seconds between keystrokes, and record the latency of each answer.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    prefixes = [line[:length] for line in lines
+                for length in range(1, len(line) + 1)]
+    sent = {}
+
+    async def read_answers() -> None:
+        for _ in prefixes:
+            response = json.loads(await reader.readline())
+            start = sent.pop(response['id'])
+            if 'results' in response:
+                latencies.append(time.perf_counter() - start)
+            counts['cancelled' if 'cancelled' in response else 'answered'] += 1
+
+    answers = asyncio.ensure_future(read_answers())
+    for request_id, prefix in enumerate(prefixes):
+        sent[request_id] = time.perf_counter()
+        writer.write(json.dumps({
+            'id': request_id,
+            'session': session,
+            'prefix': prefix,
+            'limit': limit
+        }).encode('utf8') + b'\n')
+        await writer.drain()
+        if delay:
+            await asyncio.sleep(delay)
+
+    await answers
+    writer.close()
+
+
+def load_test(file: str = 'data/lotr.txt', clients: int = 20,
+              lines: int = 20, limit: int = 10, delay: float = 0.01,
+              host: str = '127.0.0.1', port: int = 8765,
+              seed: int = 0) -> Dict[str, float]:
+    """Run <clients> clients, each typing <lines> random lines of a text file
+    with <delay> seconds between keystrokes, against the server on <host>
+    and <port>. Without a delay, every request but the last of each line is
+    usually cancelled by the next keystroke before it is answered.
+
+    Returns the number of requests answered per second ('qps'), the median
+    and 99th percentile latencies in milliseconds, and the numbers of
+    requests answered and cancelled.
+    """
+    with open(file, encoding='utf8') as f:
+        corpus = [''.join(char for char in line.lower().strip('\n')
+                          if char.isalnum() or char == ' ')
+                  for line in f]
+    corpus = [line for line in corpus if line]
+    rng = random.Random(seed)
+
+    latencies = []
+    counts = {'answered': 0, 'cancelled': 0}
+
+    async def main() -> None:
+        await asyncio.gather(*[
+            run_client(session, rng.sample(corpus, lines), host, port, limit,
+                       delay, latencies, counts)
+            for session in range(clients)])
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - start
+
+    return {
+        'qps': round(len(latencies) / elapsed),
+        'p50 (ms)': round(percentile(latencies, 0.5) * 1000, 2),
+        'p99 (ms)': round(percentile(latencies, 0.99) * 1000, 2),
+        'answered': counts['answered'],
+        'cancelled': counts['cancelled']
+    }
+
+
+if __name__ == '__main__':
+    fire.Fire(load_test)
@@ -60,7 +60,4 @@ class Samples:
 
 
 if __name__ == '__main__':
-    import sys
-
-    sys.setrecursionlimit(5000)
     fire.Fire(Samples)
@@ -0,0 +1,50 @@
+"""Test helpers
+
+=== Module description ===
+This module contains the random items, prefixes and comparisons shared by the
+tests of the Autocompleters checked against a SimplePrefixTree.
+"""
+import random
+from typing import Any, List, Sequence
+
+from autocomplete.prefix_tree import Autocompleter, SimplePrefixTree
+
+# The elements of the prefixes of random letter and word items
+LETTERS = 'abc'
+WORDS = ['the', 'a', 'cat', 'dog', 'sat', 'on', 'mat', 'ran']
+
+# Prefixes of letters and of words, found and not found in random items
+PREFIXES = [[], ['a'], ['b', 'a'], ['c', 'c', 'c'], ['a', 'b', 'c', 'a'],
+            ['d'], list('abcabcabc'), ['the'], ['a', 'cat'],
+            ['dog', 'dog', 'dog'], ['zebra'], ['on', 'mat', 'sat', 'a', 'the']]
+
+
+def random_items(count: int, seed: int, elements: Sequence[Any] = LETTERS,
+                 max_length: int = 6) -> list:
+    """Return <count> items whose prefixes are up to <max_length> random
+    <elements>, with random weights and a few values sharing each prefix.
+    """
+    rng = random.Random(seed)
+    items = []
+    for index in range(count):
+        prefix = [rng.choice(elements)
+                  for _ in range(rng.randint(0, max_length))]
+        items.append((f'{" ".join(prefix)} {index % 7}',
+                      float(rng.randint(1, 9)), prefix))
+    return items
+
+
+def assert_same_results(tree: Autocompleter, expected: SimplePrefixTree,
+                        prefixes: List[List]) -> None:
+    """Assert that <tree> and <expected> return the same weights in the same
+    order, and the same values, for every prefix.
+    """
+    assert len(tree) == len(expected)
+    for prefix in prefixes:
+        for limit in [None, 1, 2, 3]:
+            result = tree.autocomplete(prefix, limit)
+            matches = expected.autocomplete(prefix, limit)
+            assert [weight for _, weight in result] == \
+                [weight for _, weight in matches]
+            if limit is None:
+                assert sorted(result) == sorted(matches)
@@ -3,11 +3,15 @@
 === Module description ===
 This module contains tests for engine.py module.
 """
+import pytest
+
+import autocomplete.engine as engine_module
 from autocomplete.engine import (
     LetterAutocompleteEngine,
     SentenceAutocompleteEngine,
     MelodyAutocompleteEngine
 )
+from autocomplete.prefix_tree import CompressedPrefixTree
 
 
 def test_letter_autocomplete() -> None:
@@ -59,6 +63,278 @@ def test_melody_autocomplete() -> None:
     assert result[1][0].name == 'Random melody 2'
 
 
+def test_melody_search_intervals() -> None:
+    for config in [{'autocompleter': 'simple', 'weight_type': 'sum'},
+                   {'autocompleter': 'compressed', 'weight_type': 'sum',
+                    'workers': 2}]:
+        engine = MelodyAutocompleteEngine(
+            dict(config, file='tests/data/test_melody.csv'))
+        melodies = [melody for melody, _ in engine.autocomplete([])]
+        for melody in melodies:
+            intervals = [second[0] - first[0] for first, second
+                         in zip(melody.notes, melody.notes[1:])]
+            found = engine.search_intervals(intervals[1:4])
+            assert melody.name in [value.name for value, _ in found]
+
+        assert len(engine.search_intervals([])) == len(melodies)
+        assert engine.search_intervals([99]) == []
+
+        engine.remove([])
+        assert engine.search_intervals([]) == []
+
+
+def test_melody_intervals_cached(tmp_path, monkeypatch) -> None:
+    config = {
+        'file': 'tests/data/test_melody.csv',
+        'autocompleter': 'simple',
+        'weight_type': 'sum',
+        'cache_dir': str(tmp_path / 'cache')
+    }
+    engine = MelodyAutocompleteEngine(config)
+    frozen = str(tmp_path / 'melody.index')
+    engine.autocompleter.freeze().save(frozen)
+
+    # the melodies are indexed from the tree instead of reading the file
+    def fail(*args):
+        raise AssertionError('file was read again')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(engine_module, 'read_lines', fail)
+        cached = MelodyAutocompleteEngine(config)
+        loaded = MelodyAutocompleteEngine({'index': frozen})
+    for other in [cached, loaded]:
+        assert len(other.intervals) == len(engine.intervals)
+        for run in [[], [0], [2, -2]]:
+            assert sorted((melody.name, weight) for melody, weight
+                          in other.search_intervals(run)) == \
+                sorted((melody.name, weight) for melody, weight
+                       in engine.search_intervals(run))
+
+    # a melody found by its intervals is the one stored in the tree
+    melody = cached.search_intervals([0])[0][0]
+    cached.autocompleter.remove_value(melody)
+    assert len(cached.autocompleter) == len(engine.autocompleter) - 1
+    assert melody not in [value for value, _ in cached.autocomplete([])]
+
+
+def test_autocomplete_many() -> None:
+    engines = [
+        (LetterAutocompleteEngine, 'tests/data/test_data.txt',
+         ['an', '', 'm', 'x', 'an']),
+        (SentenceAutocompleteEngine, 'tests/data/test_data.csv',
+         ['the', '', 'the animal', 'x']),
+        (MelodyAutocompleteEngine, 'tests/data/test_melody.csv',
+         [[0], [], [0, 2], [99]])
+    ]
+    for engine_class, file, prefixes in engines:
+        for autocompleter in ['simple', 'compressed']:
+            engine = engine_class({
+                'file': file,
+                'autocompleter': autocompleter,
+                'weight_type': 'sum'
+            })
+            for limit in [None, 1]:
+                assert engine.autocomplete_many(prefixes, limit) == \
+                    [engine.autocomplete(prefix, limit)
+                     for prefix in prefixes]
+
+
+@pytest.mark.parametrize('autocompleter', ['simple', 'compressed', 'burst',
+                                           'ternary', 'dawg', 'disk',
+                                           'index'])
+def test_autocomplete_fuzzy(autocompleter: str, tmp_path) -> None:
+    """Test typo-tolerant queries with every kind of autocompleter, and the
+    read-only trees loaded from an index file.
+    """
+    config = {
+        'autocompleter': autocompleter,
+        'weight_type': 'sum'
+    }
+    if autocompleter == 'index':
+        config = index_config(tmp_path, 'tests/data/test_data.txt',
+                              LetterAutocompleteEngine)
+    engine = LetterAutocompleteEngine(
+        dict(config, file='tests/data/test_data.txt'))
+    assert engine.autocomplete_fuzzy('an', 0) == engine.autocomplete('an')
+    assert [value for value, _ in engine.autocomplete_fuzzy('scool')] == \
+        ['school']
+    assert [value for value, _ in engine.autocomplete_fuzzy('hgi')] == \
+        ['high']
+    assert engine.autocomplete_fuzzy('xyz') == []
+    expected = LetterAutocompleteEngine({
+        'file': 'tests/data/test_data.txt',
+        'autocompleter': 'simple',
+        'weight_type': 'sum'
+    })
+    for prefix, max_edits in [('', 1), ('a', 1), ('th', 1), ('hihg', 2)]:
+        for limit in [None, 1, 3]:
+            result = engine.autocomplete_fuzzy(prefix, max_edits, limit)
+            assert [weight for _, weight in result] == \
+                [weight for _, weight
+                 in expected.autocomplete_fuzzy(prefix, max_edits, limit)]
+        assert sorted(engine.autocomplete_fuzzy(prefix, max_edits)) == \
+            sorted(expected.autocomplete_fuzzy(prefix, max_edits))
+
+    # the automaton only stores the lines of the letter engine
+    if autocompleter == 'dawg':
+        return
+    if autocompleter == 'index':
+        config = index_config(tmp_path, 'tests/data/test_data.csv',
+                              SentenceAutocompleteEngine)
+    engine = SentenceAutocompleteEngine(
+        dict(config, file='tests/data/test_data.csv'))
+    assert engine.autocomplete_fuzzy('thw anmal', 2) == \
+        [('the animal', 150.0)]
+    assert engine.autocomplete_fuzzy('tge an') == [('the animal', 150.0)]
+    assert engine.autocomplete_fuzzy('thw anmal', 1) == []
+    assert engine.autocomplete_fuzzy('helo b', 1) == \
+        [('hello   bye', 200.0)]
+    assert engine.autocomplete_fuzzy('bye', 1) == []
+
+
+def index_config(tmp_path, file: str, engine_class: type) -> dict:
+    """Return the configuration of an engine of <engine_class> loading the
+    frozen tree of the compressed engine of <file> from an index file.
+    """
+    engine = engine_class({
+        'file': file,
+        'autocompleter': 'compressed',
+        'weight_type': 'sum'
+    })
+    index = str(tmp_path / f'{engine_class.__name__}.index')
+    engine.autocompleter.freeze().save(index)
+    return {'index': index}
+
+
+def test_parallel_build() -> None:
+    engines = [
+        (LetterAutocompleteEngine, 'tests/data/test_data.txt', ''),
+        (SentenceAutocompleteEngine, 'tests/data/test_data.csv', ''),
+        (MelodyAutocompleteEngine, 'tests/data/test_melody.csv', [])
+    ]
+    for engine_class, file, prefix in engines:
+        for autocompleter in ['simple', 'compressed']:
+            config = {
+                'file': file,
+                'autocompleter': autocompleter,
+                'weight_type': 'sum'
+            }
+            engine = engine_class(config)
+            parallel = engine_class(dict(config, workers=2))
+            stats = parallel.autocompleter.memory_stats()
+            expected = engine.autocompleter.memory_stats()
+            assert (stats['nodes'], stats['leaves']) == \
+                (expected['nodes'], expected['leaves'])
+            assert [(getattr(value, 'name', value), weight)
+                    for value, weight in parallel.autocomplete(prefix)] == \
+                [(getattr(value, 'name', value), weight)
+                 for value, weight in engine.autocomplete(prefix)]
+
+
+def test_sharded_engine() -> None:
+    config = {
+        'file': 'tests/data/test_data.csv',
+        'autocompleter': 'compressed',
+        'weight_type': 'sum'
+    }
+    engine = SentenceAutocompleteEngine(config)
+    sharded = SentenceAutocompleteEngine(dict(config, shards=2))
+    try:
+        for prefix in ['', 'the', 'x']:
+            assert sharded.autocomplete(prefix, 3) == \
+                engine.autocomplete(prefix, 3)
+        for prefix in ['teh', 'the anmal', 'x']:
+            assert sharded.autocomplete_fuzzy(prefix, 2) == \
+                engine.autocomplete_fuzzy(prefix, 2)
+    finally:
+        sharded.autocompleter.close()
+
+
+def test_index_file(tmp_path) -> None:
+    engine = SentenceAutocompleteEngine({
+        'file': 'tests/data/test_data.csv',
+        'autocompleter': 'compressed',
+        'weight_type': 'sum'
+    })
+    index = str(tmp_path / 'sentence.index')
+    engine.autocompleter.freeze().save(index)
+
+    loaded = SentenceAutocompleteEngine({'index': index})
+    assert loaded.autocomplete('the') == engine.autocomplete('the')
+    assert loaded.autocomplete('', 3) == engine.autocomplete('', 3)
+
+    engine = MelodyAutocompleteEngine({
+        'file': 'tests/data/test_melody.csv',
+        'autocompleter': 'simple',
+        'weight_type': 'sum'
+    })
+    index = str(tmp_path / 'melody.index')
+    engine.autocompleter.freeze().save(index)
+
+    result = MelodyAutocompleteEngine({'index': index}).autocomplete([0])
+    assert [(melody.name, weight) for melody, weight in result] == \
+        [(melody.name, weight) for melody, weight in engine.autocomplete([0])]
+
+
+def test_cache_dir(tmp_path, monkeypatch) -> None:
+    data = tmp_path / 'data.txt'
+    data.write_text('an\nand\nmany\nan\n', encoding='utf8')
+    config = {
+        'file': str(data),
+        'autocompleter': 'compressed',
+        'weight_type': 'sum',
+        'cache_dir': str(tmp_path / 'cache')
+    }
+
+    engine = LetterAutocompleteEngine(config)
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+    # the snapshot is loaded instead of building the tree again
+    def fail(*args):
+        raise AssertionError('tree was built again')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(CompressedPrefixTree, 'from_items', fail)
+        cached = LetterAutocompleteEngine(config)
+    assert cached.autocomplete('') == engine.autocomplete('')
+    assert cached.autocomplete('an') == [('an', 2.0), ('and', 1.0)]
+
+    # a new snapshot is saved for other contents or configurations
+    LetterAutocompleteEngine(dict(config, weight_type='average'))
+    top = LetterAutocompleteEngine(dict(config, top_k=1))
+    assert top.autocomplete('an', 1) == [('an', 2.0)]
+    data.write_text('an\nant\n', encoding='utf8')
+    changed = LetterAutocompleteEngine(config)
+    assert changed.autocomplete('an') == [('an', 1.0), ('ant', 1.0)]
+    assert len(list((tmp_path / 'cache').iterdir())) == 4
+
+    # unreadable snapshots are built and saved again
+    for snapshot in (tmp_path / 'cache').iterdir():
+        snapshot.write_bytes(b'')
+    assert LetterAutocompleteEngine(config).autocomplete('an') == \
+        [('an', 1.0), ('ant', 1.0)]
+
+
+def test_query_log(tmp_path) -> None:
+    log = tmp_path / 'queries.log'
+    log.write_text('the\t2\n\nthe\n', encoding='utf8')
+    engine = SentenceAutocompleteEngine({
+        'file': 'tests/data/test_data.csv',
+        'autocompleter': 'compressed',
+        'weight_type': 'sum',
+        'cache_size': 10,
+        'query_log': str(log)
+    })
+    assert engine.autocompleter.cache_stats()['size'] == 2
+
+    result = engine.autocomplete('the', 2)
+    assert result[0] == ('the animal', 150.0)
+    assert engine.autocompleter.cache_stats()['hits'] == 1
+
+    engine.remove('the')
+    assert engine.autocomplete('the') == []
+
+
 if __name__ == '__main__':
     import pytest
 
@@ -0,0 +1,133 @@
+"""Test BurstTrie
+
+=== Module description ===
+This module contains tests for burst.py module.
+"""
+import pickle
+from typing import List
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import lists, text
+
+from autocomplete.burst import BURST_THRESHOLD, BurstNode, BurstTrie
+from autocomplete.engine import (LetterAutocompleteEngine,
+                                 SentenceAutocompleteEngine)
+from autocomplete.prefix_tree import SimplePrefixTree
+
+from .helpers import PREFIXES, assert_same_results, random_items
+
+
+def test_autocomplete() -> None:
+    """Test that a burst trie finds the values of a SimplePrefixTree, with
+    containers burst into nodes.
+    """
+    items = random_items(500, 0)
+    trie = BurstTrie.from_items('sum', items)
+    tree = SimplePrefixTree.from_items('sum', items)
+    assert isinstance(trie.root.children['a'], BurstNode)
+    assert trie.memory_stats()['leaves'] == len(tree)
+    assert_same_results(trie, tree, PREFIXES)
+
+
+def test_insert_adds_weight() -> None:
+    """Test that inserting a stored value adds to its weight, in a node and
+    in a container.
+    """
+    trie = BurstTrie('sum')
+    for _ in range(2):
+        trie.insert('top', 1.0, [])
+        trie.insert('cat', 2.0, ['c', 'a', 't'])
+    assert len(trie) == 2
+    assert trie.autocomplete([]) == [('cat', 4.0), ('top', 2.0)]
+    assert trie.autocomplete(['c', 'a']) == [('cat', 4.0)]
+
+    for index in range(BURST_THRESHOLD + 1):
+        trie.insert('cat', 1.0, ['c', 'a', 't'])
+        trie.insert(index, 0.5, ['c', 'a'])
+    assert isinstance(trie.root.children['c'], BurstNode)
+    assert trie.autocomplete(['c'], 1) == [('cat', 4.0 + BURST_THRESHOLD + 1)]
+
+
+def test_remove() -> None:
+    """Test removing the values of prefixes ending in nodes and in
+    containers.
+    """
+    items = random_items(500, 1)
+    trie = BurstTrie.from_items('sum', items)
+    tree = SimplePrefixTree.from_items('sum', items)
+    for prefix in [['d'], ['a', 'b', 'c'], ['b'], ['c', 'a', 'a', 'b'],
+                   ['a']]:
+        trie.remove(prefix)
+        tree.remove(prefix)
+        assert_same_results(trie, tree, PREFIXES)
+
+    trie.remove([])
+    assert len(trie) == 0
+    assert trie.autocomplete([]) == []
+    assert trie.root.children == {}
+
+
+def test_top_k() -> None:
+    """Test that the heaviest values kept by the nodes answer limited
+    queries, and follow inserts and removes.
+    """
+    items = random_items(500, 3)
+    trie = BurstTrie.from_items('sum', items, top_k=3)
+    tree = SimplePrefixTree.from_items('sum', items)
+    assert len(trie.root.top) == 3
+    assert trie.top_memory() > BurstTrie.from_items('sum', items).top_memory()
+    assert trie.root.children['a'].top == \
+        trie.root.children['a'].collect_top(3)
+    assert_same_results(trie, tree, PREFIXES)
+
+    for changed in [trie, tree]:
+        changed.insert('a 0', 100.0, ['a'])
+        changed.insert('new', 1000.0, ['b', 'a', 'c'])
+        changed.remove(['c'])
+        changed.remove(['a', 'b'])
+    assert trie.autocomplete([], 1) == [('new', 1000.0)]
+    assert trie.autocomplete(['a'], 1) == tree.autocomplete(['a'], 1)
+    assert_same_results(trie, tree, PREFIXES)
+
+    trie.remove([])
+    assert trie.root.top == []
+    assert trie.autocomplete([], 1) == []
+
+
+@given(lists(text('ab', max_size=5), max_size=60))
+def test_insert_random(words: List[str]) -> None:
+    """Test that inserting words one at a time gives the results of a
+    SimplePrefixTree.
+    """
+    trie = BurstTrie('sum')
+    tree = SimplePrefixTree('sum')
+    for word in words:
+        trie.insert(word, 1.0, list(word))
+        tree.insert(word, 1.0, list(word))
+    assert_same_results(trie, tree, [[], ['a'], ['a', 'b'], ['b', 'b']])
+
+
+def test_pickle() -> None:
+    """Test that a pickled burst trie gives the same results."""
+    trie = BurstTrie.from_items('sum', random_items(200, 2))
+    copy = pickle.loads(pickle.dumps(trie))
+    for prefix in PREFIXES:
+        assert copy.autocomplete(prefix) == trie.autocomplete(prefix)
+
+
+def test_burst_engines() -> None:
+    """Test engines using a burst trie.
+    """
+    config = {'autocompleter': 'burst', 'weight_type': 'sum'}
+    engine = LetterAutocompleteEngine(
+        dict(config, file='tests/data/test_data.txt', workers=2))
+    assert sorted(engine.autocomplete('an')) == [('an', 1.0), ('and', 1.0)]
+
+    engine = SentenceAutocompleteEngine(
+        dict(config, file='tests/data/test_data.csv'))
+    assert engine.autocomplete('the') == [('the animal', 150.0)]
+
+
+if __name__ == '__main__':
+    pytest.main(['test_burst.py'])
@@ -0,0 +1,200 @@
+"""Test CachedAutocompleter
+
+=== Module description ===
+This module contains tests for cache.py module.
+"""
+import pytest
+
+from autocomplete.cache import CachedAutocompleter
+from autocomplete.dawg import DawgAutocompleter
+from autocomplete.frozen import FrozenPrefixTree
+from autocomplete.prefix_tree import SimplePrefixTree, CompressedPrefixTree
+
+
+def build_cache(size: int = 10) -> CachedAutocompleter:
+    """Return a cache of a CompressedPrefixTree storing a few words.
+    """
+    t = CompressedPrefixTree('sum')
+    t.insert('car', 4.0, ['c', 'a', 'r'])
+    t.insert('cat', 2.0, ['c', 'a', 't'])
+    t.insert('door', 5.0, ['d', 'o', 'o', 'r'])
+    return CachedAutocompleter(t, size)
+
+
+def test_cache_hits() -> None:
+    """Test that repeated queries are answered from the cache.
+    """
+    cache = build_cache()
+    assert cache.autocomplete(['c']) == [('car', 4.0), ('cat', 2.0)]
+    assert cache.autocomplete(['c']) == [('car', 4.0), ('cat', 2.0)]
+    assert cache.autocomplete(['c'], 1) == [('car', 4.0)]
+    assert cache.autocomplete(['x']) == []
+    assert cache.autocomplete(['x']) == []
+    assert cache.cache_stats() == {'size': 3, 'hits': 2, 'misses': 3,
+                                   'evictions': 0, 'invalidations': 0}
+
+    # changing a returned result does not change the cache
+    cache.autocomplete(['c']).clear()
+    assert cache.autocomplete(['c']) == [('car', 4.0), ('cat', 2.0)]
+    assert len(cache) == 3
+
+
+def test_cache_evictions() -> None:
+    """Test that the least recently used results are evicted.
+    """
+    cache = build_cache(2)
+    cache.autocomplete(['c'])
+    cache.autocomplete(['d'])
+    cache.autocomplete(['c'])
+    cache.autocomplete([])
+    assert cache.cache_stats()['evictions'] == 1
+    assert cache.cache_stats()['size'] == 2
+
+    # ['d'] was evicted, ['c'] was not
+    cache.autocomplete(['c'])
+    assert cache.cache_stats()['hits'] == 2
+    cache.autocomplete(['d'])
+    assert cache.cache_stats()['misses'] == 4
+
+
+def test_cache_insert() -> None:
+    """Test that inserting a value only drops the results of the prefixes of
+    its prefix sequence.
+    """
+    cache = build_cache()
+    for prefix in [[], ['c'], ['c', 'a', 't'], ['d'], ['c', 'o']]:
+        cache.autocomplete(prefix)
+
+    cache.insert('cow', 9.0, ['c', 'o', 'w'])
+    assert cache.cache_stats()['invalidations'] == 3
+    assert cache.autocomplete(['c'])[0] == ('cow', 9.0)
+    assert cache.autocomplete([])[0] == ('cow', 9.0)
+    assert cache.autocomplete(['c', 'o']) == [('cow', 9.0)]
+    assert cache.autocomplete(['d']) == [('door', 5.0)]
+    assert cache.autocomplete(['c', 'a', 't']) == [('cat', 2.0)]
+    assert cache.cache_stats()['hits'] == 2
+
+
+def test_cache_remove() -> None:
+    """Test that removing values drops the results of the prefixes of the
+    removed prefix and of the prefixes starting with it.
+    """
+    cache = build_cache()
+    for prefix in [[], ['c'], ['c', 'a'], ['c', 'a', 't'], ['d']]:
+        cache.autocomplete(prefix)
+        cache.autocomplete(prefix, 1)
+
+    cache.remove(['c', 'a'])
+    assert cache.cache_stats()['invalidations'] == 8
+    assert cache.autocomplete(['c', 'a', 't']) == []
+    assert cache.autocomplete(['c'], 1) == []
+    assert cache.autocomplete([]) == [('door', 5.0)]
+    assert cache.autocomplete(['d'], 1) == [('door', 5.0)]
+    assert cache.cache_stats()['hits'] == 1
+    assert len(cache) == 1
+
+
+def test_cache_warm() -> None:
+    """Test that warmed queries are answered from the cache.
+    """
+    cache = CachedAutocompleter(SimplePrefixTree('sum'))
+    cache.insert('an', 1.0, ['a', 'n'])
+    cache.warm([(['a'], None), (['a'], 1), (['b'], 2)])
+    assert cache.cache_stats()['misses'] == 3
+
+    assert cache.autocomplete(['a'], 1) == [('an', 1.0)]
+    assert cache.cache_stats()['hits'] == 1
+
+
+def test_cache_autocomplete_many() -> None:
+    """Test that prefixes autocompleted together are answered from the cache
+    when they were already looked up, and cached otherwise.
+    """
+    cache = build_cache()
+    cache.autocomplete(['c'])
+    assert cache.autocomplete_many([['d'], ['c'], ['x'], ['d']]) == \
+        [[('door', 5.0)], [('car', 4.0), ('cat', 2.0)], [], [('door', 5.0)]]
+    assert cache.cache_stats()['hits'] == 1
+    assert cache.cache_stats()['size'] == 3
+
+    assert cache.autocomplete_many([['x'], ['d']], 1) == [[], [('door', 5.0)]]
+    assert cache.autocomplete(['d']) == [('door', 5.0)]
+    assert cache.cache_stats()['hits'] == 2
+
+
+def test_cache_increment_remove_value() -> None:
+    """Test that changing a value by value drops the results of the prefixes
+    of its prefix sequence.
+    """
+    cache = build_cache()
+    cache.autocomplete(['c'])
+    cache.autocomplete(['d'])
+    cache.increment('cat', 3.0)
+    assert cache.autocomplete(['c']) == [('cat', 5.0), ('car', 4.0)]
+    assert cache.cache_stats()['invalidations'] == 1
+
+    cache.remove_value('cat')
+    cache.remove_value('dog')
+    assert cache.autocomplete(['c']) == [('car', 4.0)]
+    assert cache.autocomplete(['d']) == [('door', 5.0)]
+    assert cache.cache_stats()['invalidations'] == 2
+    assert cache.cache_stats()['hits'] == 1
+
+    with pytest.raises(KeyError):
+        cache.increment('cat', 1.0)
+
+
+def test_cache_increment_unsupported() -> None:
+    """Test that changing a value by value raises a NotImplementedError, and
+    keeps the cached results, for an Autocompleter that cannot look up the
+    prefix sequences of its values.
+    """
+    cache = CachedAutocompleter(DawgAutocompleter(
+        'sum', [('car', 4.0, ['c', 'a', 'r']), ('cat', 2.0, ['c', 'a', 't'])]))
+    assert cache.autocomplete(['c']) == [('car', 4.0), ('cat', 2.0)]
+    with pytest.raises(NotImplementedError):
+        cache.increment('cat', 3.0)
+    with pytest.raises(NotImplementedError):
+        cache.remove_value('cat')
+    assert cache.autocomplete(['c']) == [('car', 4.0), ('cat', 2.0)]
+    assert cache.cache_stats()['invalidations'] == 0
+
+
+def test_cache_index() -> None:
+    """Test that the index of the cached prefixes only keeps the prefixes
+    with cached results.
+    """
+    cache = build_cache(3)
+    for prefix in [['c', 'a'], ['c', 'a', 't'], ['d'], ['c']]:
+        cache.autocomplete(prefix)
+    assert cache._extensions == {(): {('c', 'a', 't'), ('d',), ('c',)},
+                                 ('c',): {('c', 'a', 't')},
+                                 ('c', 'a'): {('c', 'a', 't')}}
+
+    cache.remove(['c'])
+    assert cache._extensions == {(): {('d',)}}
+    assert cache.cache_stats()['invalidations'] == 2
+
+
+def test_cache_freeze(tmp_path) -> None:
+    """Test that freezing a cache caches the frozen copy of its
+    Autocompleter, which can be saved.
+    """
+    cache = build_cache(5)
+    cache.autocomplete(['c'])
+    frozen = cache.freeze()
+    assert isinstance(frozen, CachedAutocompleter)
+    assert isinstance(frozen.autocompleter, FrozenPrefixTree)
+    assert frozen.size == 5
+    assert frozen.cache_stats()['size'] == 0
+    assert frozen.autocomplete(['c']) == [('car', 4.0), ('cat', 2.0)]
+    assert frozen.memory_stats() == frozen.autocompleter.memory_stats()
+
+    path = str(tmp_path / 'tree.index')
+    frozen.save(path)
+    assert FrozenPrefixTree.load(path).autocomplete(['d']) == \
+        [('door', 5.0)]
+
+
+if __name__ == '__main__':
+    pytest.main(['test_cache.py'])
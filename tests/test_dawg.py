@@ -0,0 +1,134 @@
+"""Test DawgAutocompleter
+
+=== Module description ===
+This module contains tests for dawg.py module.
+"""
+import pickle
+from typing import List
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import integers, lists, text, tuples
+
+from autocomplete.dawg import DawgAutocompleter, build_automaton
+from autocomplete.engine import LetterAutocompleteEngine
+from autocomplete.prefix_tree import SimplePrefixTree
+
+WORDS = ['walking', 'talking', 'walked', 'talked', 'walks', 'talks', 'tall',
+         'wall', 'wa', 't', '']
+
+PREFIXES = ['', 'w', 'wa', 'walk', 'walki', 'talked', 'talkeds', 'x', 'tal']
+
+
+def letter_items(words: List[str]) -> list:
+    """Return the (value, weight, prefix) items of the letter engine for
+    <words>, weighing the i-th word i + 1.
+    """
+    return [(word, float(index + 1), list(word))
+            for index, word in enumerate(words)]
+
+
+def test_suffixes_shared() -> None:
+    """Test that the common endings of the strings are stored once."""
+    start, first_edges, chars, targets, finals, counts = \
+        build_automaton(sorted(WORDS))
+    assert counts[start] == len(WORDS)
+    # walk and talk lead to the same state
+    assert len(counts) < sum(map(len, WORDS))
+    dawg = DawgAutocompleter('sum', letter_items(WORDS))
+    assert dawg.counts[0] == len(WORDS)
+    assert len(dawg.counts) < len(counts)
+
+
+def test_autocomplete() -> None:
+    """Test that an automaton finds the values of a SimplePrefixTree, with
+    strings of equal weight in sorted order.
+    """
+    items = letter_items(WORDS) + [('walks', 5.5, list('walks')),
+                                   ('wall', 1.5, list('wall'))]
+    dawg = DawgAutocompleter.from_items('sum', items)
+    tree = SimplePrefixTree.from_items('sum', items)
+    assert len(dawg) == len(tree)
+    for prefix in PREFIXES:
+        for limit in [None, 1, 2, 3]:
+            assert dawg.autocomplete(list(prefix), limit) == \
+                tree.autocomplete(list(prefix), limit)
+    assert dawg.autocomplete(['w', 'a', 'l']) == [
+        ('walks', 10.5), ('wall', 9.5), ('walked', 3.0), ('walking', 1.0)]
+
+
+@given(lists(tuples(text('abc', max_size=6),
+                    integers(min_value=1, max_value=4)),
+             max_size=40))
+def test_autocomplete_random(words: list) -> None:
+    """Test that an automaton returns the weights of a SimplePrefixTree, and
+    the same strings, breaking ties in sorted order.
+    """
+    items = [(word, float(weight), list(word)) for word, weight in words]
+    dawg = DawgAutocompleter('sum', items)
+    tree = SimplePrefixTree.from_items('sum', items)
+    assert len(dawg) == len(tree)
+    for prefix in ['', 'a', 'ab', 'cc', 'bca', 'd']:
+        for limit in [None, 1, 3]:
+            result = dawg.autocomplete(list(prefix), limit)
+            expected = tree.autocomplete(list(prefix), limit)
+            assert [weight for _, weight in result] == \
+                [weight for _, weight in expected]
+            assert result == sorted(result, key=lambda pair: (-pair[1],
+                                                              pair[0]))
+            if limit is None:
+                assert sorted(result) == sorted(expected)
+
+
+def test_not_letters() -> None:
+    """Test that only strings spelled by their prefixes are stored, and
+    that other prefix elements match nothing.
+    """
+    with pytest.raises(ValueError):
+        DawgAutocompleter('sum', [('the cat', 1.0, ['the', 'cat'])])
+    dawg = DawgAutocompleter('sum', letter_items(WORDS))
+    assert dawg.autocomplete(['wa', 'l']) == []
+    assert dawg.autocomplete([1]) == []
+
+
+def test_read_only() -> None:
+    """Test that an automaton cannot be changed."""
+    dawg = DawgAutocompleter('sum', letter_items(WORDS))
+    with pytest.raises(NotImplementedError):
+        dawg.insert('walker', 1.0, list('walker'))
+    with pytest.raises(NotImplementedError):
+        dawg.remove(['w'])
+    with pytest.raises(NotImplementedError):
+        dawg.increment('walks', 1.0)
+    with pytest.raises(NotImplementedError):
+        dawg.remove_value('walks')
+    assert len(DawgAutocompleter('sum', [])) == 0
+    assert DawgAutocompleter('sum', []).autocomplete([]) == []
+
+
+def test_pickle() -> None:
+    """Test that a pickled automaton gives the same results."""
+    dawg = DawgAutocompleter('sum', letter_items(WORDS))
+    copy = pickle.loads(pickle.dumps(dawg))
+    for prefix in PREFIXES:
+        assert copy.autocomplete(list(prefix)) == \
+            dawg.autocomplete(list(prefix))
+
+
+def test_dawg_engine() -> None:
+    """Test a letter engine compiling its lines into an automaton."""
+    config = {
+        'file': 'tests/data/test_data.txt',
+        'autocompleter': 'dawg',
+        'weight_type': 'sum'
+    }
+    engine = LetterAutocompleteEngine(config)
+    expected = LetterAutocompleteEngine(dict(config, autocompleter='simple'))
+    assert engine.autocomplete('an') == [('an', 1.0), ('and', 1.0)]
+    for prefix in ['', 'a', 'th', 'zz']:
+        assert sorted(engine.autocomplete(prefix)) == \
+            sorted(expected.autocomplete(prefix))
+
+
+if __name__ == '__main__':
+    pytest.main(['test_dawg.py'])
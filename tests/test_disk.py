@@ -0,0 +1,233 @@
+"""Test DiskAutocompleter
+
+=== Module description ===
+This module contains tests for disk.py module.
+"""
+import asyncio
+import random
+
+import pytest
+
+from autocomplete.disk import DiskAutocompleter
+from autocomplete.engine import (LetterAutocompleteEngine,
+                                 SentenceAutocompleteEngine)
+from autocomplete.prefix_tree import SimplePrefixTree
+from autocomplete.server import AutocompleteServer
+
+ITEMS = [
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('car', 3.0, ['c', 'a', 'r']),
+    ('door', 5.0, ['d', 'o', 'o', 'r']),
+    ('care', 1.0, ['c', 'a', 'r', 'e']),
+    ('c', 1.5, ['c']),
+    ('empty', 0.5, [])
+]
+
+PREFIXES = [[], ['c'], ['c', 'a'], ['c', 'a', 'r'], ['d', 'o'], ['x'],
+            ['c', 'a', 'r', 'e', 's']]
+
+
+def test_autocomplete() -> None:
+    """Test that the values are found like in a SimplePrefixTree, built one
+    value at a time and all together.
+    """
+    tree = SimplePrefixTree.from_items('sum', ITEMS)
+    inserted = DiskAutocompleter('sum')
+    for value, weight, prefix in ITEMS:
+        inserted.insert(value, weight, prefix)
+
+    for disk in [inserted, DiskAutocompleter.from_items('sum', ITEMS)]:
+        with disk:
+            assert len(disk) == len(ITEMS)
+            for prefix in PREFIXES:
+                for limit in [None, 1, 2]:
+                    assert disk.autocomplete(prefix, limit) == \
+                        tree.autocomplete(prefix, limit)
+
+
+def test_insert_adds_weight() -> None:
+    """Test that inserting a stored value adds to its weight.
+    """
+    with DiskAutocompleter.from_items('sum', ITEMS) as disk:
+        assert disk.autocomplete(['c'], 1) == [('car', 3.0)]
+        disk.insert('care', 4.0, ['c', 'a', 'r', 'e'])
+        assert len(disk) == len(ITEMS)
+        assert disk.autocomplete(['c'], 1) == [('care', 5.0)]
+        assert disk.autocomplete([], 1) == [('care', 5.0)]
+        disk.insert('cab', 0.25, ['c', 'a', 'b'])
+        assert disk.autocomplete(['c', 'a', 'b']) == [('cab', 0.25)]
+
+
+def test_remove() -> None:
+    """Test that removing a prefix removes exactly the values it matches.
+    """
+    tree = SimplePrefixTree.from_items('sum', ITEMS)
+    with DiskAutocompleter.from_items('sum', ITEMS) as disk:
+        for prefix in [['x'], ['c', 'a', 'r'], ['d']]:
+            disk.remove(prefix)
+            tree.remove(prefix)
+            assert len(disk) == len(tree)
+            for query in PREFIXES:
+                assert disk.autocomplete(query) == tree.autocomplete(query)
+
+        disk.remove([])
+        assert len(disk) == 0
+        assert disk.autocomplete([]) == []
+        disk.insert('cat', 2.0, ['c', 'a', 't'])
+        assert disk.autocomplete(['c']) == [('cat', 2.0)]
+
+
+def test_top_k_changes() -> None:
+    """Test that the stored heaviest values give the same matches as a
+    SimplePrefixTree while values are inserted, incremented and removed.
+
+    The weights are random, so that no two values tie.
+    """
+    rng = random.Random(7)
+    words = [''.join(rng.choice('abc') for _ in range(rng.randint(0, 5)))
+             for _ in range(60)]
+    tree = SimplePrefixTree('sum')
+    with DiskAutocompleter('sum', top_k=3, cache_size=4) as disk:
+        for step in range(400):
+            word = rng.choice(words)
+            value = f'{word}{step % 7}'
+            change = rng.random()
+            if change < 0.5 or tree.prefix_of(value) is None:
+                weight = rng.uniform(1.0, 5.0)
+                tree.insert(value, weight, list(word))
+                disk.insert(value, weight, list(word))
+            elif change < 0.75:
+                delta = rng.uniform(0.5, 2.0)
+                tree.increment(value, delta)
+                disk.increment(value, delta)
+            elif change < 0.95:
+                tree.remove_value(value)
+                disk.remove_value(value)
+            else:
+                tree.remove(list(word[:2]))
+                disk.remove(list(word[:2]))
+
+            assert len(disk) == len(tree)
+            assert disk.prefix_of(value) == tree.prefix_of(value)
+            query = list(rng.choice(words)[:rng.randint(0, 3)])
+            for limit in [None, 1, 3, 4]:
+                assert disk.autocomplete(query, limit) == \
+                    tree.autocomplete(query, limit)
+
+        with pytest.raises(KeyError):
+            disk.increment('missing', 1.0)
+        disk.remove_value('missing')
+        assert disk.prefix_of('missing') is None
+
+
+def test_autocomplete_fuzzy() -> None:
+    """Test that the fuzzy matches are found like in a SimplePrefixTree.
+    """
+    items = [('cart', 3.0, list('cart')), ('cat', 2.0, list('cat')),
+             ('dog', 4.0, list('dog')), ('door', 1.0, list('door')),
+             ('car', 2.0, list('car')), ('at', 5.0, list('at'))]
+    tree = SimplePrefixTree.from_items('sum', items)
+    with DiskAutocompleter.from_items('sum', items, top_k=2) as disk:
+        for prefix in ['', 'c', 'cst', 'dor', 'xyz', 'atc', 'carts']:
+            for max_edits in [0, 1, 2]:
+                for limit in [None, 1, 2, 3]:
+                    assert disk.autocomplete_fuzzy(
+                        list(prefix), max_edits, limit) == \
+                        tree.autocomplete_fuzzy(list(prefix), max_edits,
+                                                limit)
+
+
+def test_prefix_keys() -> None:
+    """Test that a prefix only matches the sequences starting with its
+    elements, whatever the elements are.
+    """
+    strings = [('a', 1.0, ['a']), ('ab', 2.0, ['ab']),
+               ('a b', 3.0, ['a', 'b']),
+               ('long', 6.0, ['x' * 200, '\xff']), ('end', 7.0, ['\xff'])]
+    numbers = [('one', 4.0, [1]), ('one two', 5.0, [1, 2]),
+               ('big', 1.0, [1 << 70])]
+    for items, prefixes in [
+            (strings, [[], ['a'], ['ab'], ['x' * 200], ['x' * 199],
+                       ['\xff'], ['x' * 200, '\xff']]),
+            (numbers, [[], [1], [1, 2], [2], [1 << 70]])]:
+        tree = SimplePrefixTree.from_items('sum', items)
+        with DiskAutocompleter.from_items('sum', items) as disk:
+            for prefix in prefixes:
+                assert disk.autocomplete(prefix) == tree.autocomplete(prefix)
+
+
+def test_reopen(tmp_path) -> None:
+    """Test that a database can be opened again, with the same weight type
+    only.
+    """
+    path = str(tmp_path / 'tree.db')
+    tree = SimplePrefixTree.from_items('sum', ITEMS)
+    with DiskAutocompleter.from_items('sum', ITEMS, path) as disk:
+        disk.insert('cot', 1.25, ['c', 'o', 't'])
+        tree.insert('cot', 1.25, ['c', 'o', 't'])
+
+    with DiskAutocompleter('sum', path) as disk:
+        assert len(disk) == len(tree)
+        for prefix in PREFIXES:
+            assert disk.autocomplete(prefix) == tree.autocomplete(prefix)
+    # the heaviest values are stored again for another top_k
+    with DiskAutocompleter('sum', path, top_k=1) as disk:
+        for prefix in PREFIXES:
+            assert disk.autocomplete(prefix, 1) == \
+                tree.autocomplete(prefix, 1)
+    with pytest.raises(ValueError):
+        DiskAutocompleter('average', path)
+
+
+def test_disk_engines(tmp_path) -> None:
+    """Test engines storing their values in a database.
+    """
+    path = str(tmp_path / 'letters.db')
+    config = {
+        'file': 'tests/data/test_data.txt',
+        'autocompleter': 'disk',
+        'weight_type': 'sum',
+        'disk_path': path
+    }
+    engine = LetterAutocompleteEngine(config)
+    assert engine.autocomplete('an') == [('an', 1.0), ('and', 1.0)]
+    engine.autocompleter.close()
+
+    # the existing database is opened instead of reading the file
+    engine = LetterAutocompleteEngine(dict(config, file='missing.txt'))
+    assert engine.autocomplete('an') == [('an', 1.0), ('and', 1.0)]
+    engine.autocompleter.close()
+
+    engine = SentenceAutocompleteEngine({
+        'file': 'tests/data/test_data.csv',
+        'autocompleter': 'disk',
+        'weight_type': 'sum'
+    })
+    assert engine.autocomplete('the') == [('the animal', 150.0)]
+    engine.autocompleter.close()
+
+
+def test_disk_server() -> None:
+    """Test that a server looks up queries of a disk engine in its thread
+    pool.
+    """
+    engine = LetterAutocompleteEngine({
+        'file': 'tests/data/test_data.txt',
+        'autocompleter': 'disk',
+        'weight_type': 'sum'
+    })
+    server = AutocompleteServer(engine)
+
+    async def run() -> list:
+        return await asyncio.gather(server.answer('a', 'an', None),
+                                    server.answer('b', 'a', 1))
+
+    assert asyncio.run(run()) == [engine.autocomplete('an'),
+                                  engine.autocomplete('a', 1)]
+    assert server.stats()['offloaded'] == 2
+    server.close()
+    engine.autocompleter.close()
+
+
+if __name__ == '__main__':
+    pytest.main(['test_disk.py'])
@@ -0,0 +1,168 @@
+"""Test FrozenPrefixTree
+
+=== Module description ===
+This module contains tests for frozen.py module.
+"""
+import pytest
+
+from autocomplete.frozen import FrozenPrefixTree
+from autocomplete.prefix_tree import SimplePrefixTree, CompressedPrefixTree
+
+
+def build_trees(weight_type: str) -> list:
+    """Return a SimplePrefixTree and a CompressedPrefixTree with the same
+    values.
+    """
+    trees = [SimplePrefixTree(weight_type), CompressedPrefixTree(weight_type)]
+    for t in trees:
+        t.insert('cate', 3.0, ['c', 'a', 't', 'e'])
+        t.insert('car', 4.0, ['c', 'a', 'r'])
+        t.insert('car', 4.0, ['c', 'a', 'r'])
+        t.insert('cat', 2.0, ['c', 'a', 't'])
+        t.insert('cater', 6.0, ['c', 'a', 't', 'e', 'r'])
+        t.insert('door', 5.0, ['d', 'o', 'o', 'r'])
+        t.insert('danger', 9.0, ['d', 'a', 'n', 'g', 'e', 'r'])
+        t.insert('dan', 5.0, ['d', 'a', 'n'])
+    return trees
+
+
+def test_frozen_autocomplete() -> None:
+    """Test that frozen trees autocomplete like the trees they come from.
+    """
+    for weight_type in ['sum', 'average']:
+        for t in build_trees(weight_type):
+            frozen = t.freeze()
+            assert len(frozen) == len(t) == 7
+
+            for prefix in [[], ['c'], ['c', 'a', 't'], ['d', 'a'],
+                           ['d', 'o', 'o', 'r']]:
+                for limit in [None, 1, 2, 3]:
+                    assert frozen.autocomplete(prefix, limit) == \
+                        t.autocomplete(prefix, limit)
+
+            assert frozen.autocomplete(['c', 'a', 't', 'e', 'r', 's']) == []
+            assert frozen.autocomplete(['x']) == []
+            assert frozen.autocomplete(['a']) == []
+
+
+def test_frozen_ties() -> None:
+    """Test that values of equal weight are returned in preorder.
+    """
+    t = CompressedPrefixTree('sum')
+    t.insert('an', 1.0, ['a', 'n'])
+    t.insert('and', 1.0, ['a', 'n', 'd'])
+    t.insert('as', 1.0, ['a', 's'])
+    frozen = t.freeze()
+
+    assert frozen.autocomplete(['a']) == [('an', 1.0), ('and', 1.0),
+                                          ('as', 1.0)]
+    assert frozen.autocomplete(['a'], 2) == [('an', 1.0), ('and', 1.0)]
+
+
+def test_frozen_limit() -> None:
+    """Test that the heaviest values of a wide tree are found best-first,
+    with the subtrees sorted by their largest leaf weight.
+    """
+    t = CompressedPrefixTree('sum')
+    for index in range(200):
+        word = f'{index % 7}{index % 11}{index}'
+        t.insert(word, float(index * 37 % 101 + 1), list(word))
+    frozen = t.freeze()
+    assert list(frozen.max_weights[:1]) == [101.0]
+
+    for prefix in [[], ['3'], ['3', '1'], ['3', '1', '0']]:
+        everything = frozen.autocomplete(prefix)
+        assert sorted(everything) == sorted(t.autocomplete(prefix))
+        for limit in [1, 5, 50, 500]:
+            assert frozen.autocomplete(prefix, limit) == everything[:limit]
+
+
+def test_frozen_empty() -> None:
+    """Test freezing an empty tree.
+    """
+    frozen = SimplePrefixTree('sum').freeze()
+    assert len(frozen) == 0
+    assert frozen.autocomplete([]) == []
+    assert frozen.memory_stats()['leaves'] == 0
+
+
+def test_frozen_read_only() -> None:
+    """Test that frozen trees cannot be changed.
+    """
+    frozen = build_trees('sum')[0].freeze()
+    with pytest.raises(NotImplementedError):
+        frozen.insert('cab', 1.0, ['c', 'a', 'b'])
+    with pytest.raises(NotImplementedError):
+        frozen.remove(['c'])
+    assert len(frozen) == 7
+
+
+def test_frozen_memory_stats() -> None:
+    """Test that chains of trees are merged when freezing.
+    """
+    simple, compressed = build_trees('sum')
+    stats = simple.freeze().memory_stats()
+    assert stats == compressed.freeze().memory_stats()
+    assert stats['leaves'] == 7
+    assert stats['nodes'] == compressed.memory_stats()['nodes']
+    assert stats['bytes'] > 0
+
+
+def test_index_file(tmp_path) -> None:
+    """Test that trees saved to an index file are loaded back with the same
+    values.
+    """
+    for t in build_trees('average') + [SimplePrefixTree('sum')]:
+        frozen = t.freeze()
+        path = str(tmp_path / 'tree.index')
+        frozen.save(path)
+        loaded = FrozenPrefixTree.load(path)
+
+        assert len(loaded) == len(frozen)
+        assert loaded.memory_stats()['nodes'] == \
+            frozen.memory_stats()['nodes']
+        for prefix in [[], ['c'], ['c', 'a', 't'], ['d', 'o'], ['x'], [1]]:
+            for limit in [None, 1, 2]:
+                assert loaded.autocomplete(prefix, limit) == \
+                    frozen.autocomplete(prefix, limit)
+
+        # an index file can be saved again from a loaded tree
+        loaded.save(path)
+        assert FrozenPrefixTree.load(path).autocomplete(['c']) == \
+            frozen.autocomplete(['c'])
+
+
+def test_index_file_pickled(tmp_path) -> None:
+    """Test index files of values and prefix elements that are not strings.
+    """
+    t = CompressedPrefixTree('sum')
+    t.insert(('up', 1), 2.0, [1, 2])
+    t.insert(('down', 2), 1.0, [-1, 2])
+    t.insert(('up', 3), 3.0, [1, 2, 3])
+    path = str(tmp_path / 'tree.index')
+    t.freeze().save(path)
+    loaded = FrozenPrefixTree.load(path)
+
+    assert loaded.autocomplete([1]) == [(('up', 3), 3.0), (('up', 1), 2.0)]
+    assert loaded.autocomplete([-1, 2]) == [(('down', 2), 1.0)]
+    assert loaded.autocomplete(['1']) == []
+
+
+def test_index_file_version(tmp_path) -> None:
+    """Test that files of another format or version are not loaded.
+    """
+    path = tmp_path / 'tree.index'
+    path.write_bytes(b'not an index file')
+    with pytest.raises(ValueError):
+        FrozenPrefixTree.load(str(path))
+
+    build_trees('sum')[0].freeze().save(str(path))
+    data = bytearray(path.read_bytes())
+    data[8] += 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        FrozenPrefixTree.load(str(path))
+
+
+if __name__ == '__main__':
+    pytest.main(['test_frozen.py'])
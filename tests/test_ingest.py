@@ -0,0 +1,100 @@
+"""Test streaming ingestion
+
+=== Module description ===
+This module contains tests for ingest.py module.
+"""
+import bz2
+import gzip
+import io
+import lzma
+from itertools import cycle
+
+import pytest
+
+from autocomplete.engine import LetterAutocompleteEngine, read_sentence_items
+from autocomplete.ingest import read_lines
+
+LINES = ['an\n', 'and\n', 'many\n', 'an']
+DATA = ''.join(LINES).encode('utf8')
+
+
+def test_read_lines_sources(tmp_path) -> None:
+    """Test reading the lines of paths, compressed files, file objects and
+    iterables.
+    """
+    paths = []
+    for name, compress in [('plain.txt', bytes),
+                           ('gzip.txt.gz', gzip.compress),
+                           ('bz2.txt', bz2.compress), ('xz', lzma.compress)]:
+        path = tmp_path / name
+        path.write_bytes(compress(DATA))
+        paths.append(path)
+
+    for path in paths:
+        assert list(read_lines(path)) == LINES
+        assert list(read_lines(str(path))) == LINES
+        with open(path, 'rb') as f:
+            assert list(read_lines(f)) == LINES
+            assert not f.closed
+
+    binary = io.BytesIO(gzip.compress(DATA))
+    assert list(read_lines(binary)) == LINES
+    assert not binary.closed
+    assert list(read_lines(io.BytesIO(DATA))) == LINES
+    assert list(read_lines(io.StringIO(''.join(LINES)))) == LINES
+    assert list(read_lines(iter(LINES), chunk_size=3)) == LINES
+    assert list(read_lines([])) == []
+
+
+def test_read_lines_progress(tmp_path) -> None:
+    """Test that the progress is reported after every chunk of lines and
+    once the source is exhausted.
+    """
+    path = tmp_path / 'data.txt.gz'
+    path.write_bytes(gzip.compress(DATA * 1000))
+
+    reports = []
+    assert len(list(read_lines(path, reports.append, 1000))) == 3001
+    assert len(reports) > 2
+    assert [report['done'] for report in reports] == \
+        [False] * (len(reports) - 1) + [True]
+    assert reports[-1]['lines'] == 3001
+    assert reports[-1]['bytes'] == path.stat().st_size
+    lines = [report['lines'] for report in reports]
+    assert lines == sorted(lines)
+
+    reports = []
+    list(read_lines(LINES, reports.append, 5))
+    assert [(report['lines'], report['bytes']) for report in reports] == \
+        [(2, 7), (3, 12), (4, 14), (4, 14)]
+
+
+def test_read_items_streaming() -> None:
+    """Test that items are yielded as the lines are read, so that a source
+    does not have to fit in memory.
+    """
+    items = read_sentence_items(cycle(['the cat,2\n', 'a dog,1\n']))
+    assert next(items) == ('the cat', 2.0, ['the', 'cat'])
+    assert next(items) == ('a dog', 1.0, ['a', 'dog'])
+    assert next(items) == ('the cat', 2.0, ['the', 'cat'])
+
+
+def test_engine_sources(tmp_path) -> None:
+    """Test building an engine from a compressed file and from lines.
+    """
+    path = tmp_path / 'data.txt.xz'
+    path.write_bytes(lzma.compress(DATA))
+    config = {'autocompleter': 'simple', 'weight_type': 'sum'}
+
+    reports = []
+    engine = LetterAutocompleteEngine(dict(config, file=path,
+                                           progress=reports.append))
+    assert engine.autocomplete('an') == [('an', 2.0), ('and', 1.0)]
+    assert reports[-1]['lines'] == 4
+
+    engine = LetterAutocompleteEngine(dict(config, file=LINES))
+    assert engine.autocomplete('an') == [('an', 2.0), ('and', 1.0)]
+
+
+if __name__ == '__main__':
+    pytest.main(['test_ingest.py'])
@@ -0,0 +1,116 @@
+"""Test IntervalIndex
+
+=== Module description ===
+This module contains tests for intervals.py module.
+"""
+from typing import List
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import integers, lists
+
+from autocomplete.intervals import IntervalIndex
+
+SEQUENCES = [[2, 2, -4, 5], [2, -4, 5, 5, 2], [], [5], [2, 2, 2, 2],
+             [-4, 5, 5]]
+
+
+def contains(sequence: List[int], run: List[int]) -> bool:
+    """Return whether <run> is a contiguous run of <sequence>."""
+    return any(sequence[start:start + len(run)] == run
+               for start in range(len(sequence) - len(run) + 1))
+
+
+def build_index(n: int) -> IntervalIndex:
+    """Return an index of SEQUENCES, each weighing its position."""
+    index = IntervalIndex(n)
+    for position, sequence in enumerate(SEQUENCES):
+        index.insert(position, float(position % 3), sequence)
+    return index
+
+
+def test_search() -> None:
+    """Test finding the sequences containing runs shorter, as long as and
+    longer than the n-grams.
+    """
+    runs = [[], [2], [5], [2, 2], [-4, 5], [2, -4, 5], [2, 2, 2], [5, 5, 2],
+            [2, 2, -4, 5], [-4, 5, 5, 2], [2, 2, 2, 2, 2], [7], [5, 2, 2]]
+    for n in [1, 2, 3]:
+        index = build_index(n)
+        assert len(index) == len(SEQUENCES)
+        for run in runs:
+            expected = sorted(
+                ((position, float(position % 3))
+                 for position, sequence in enumerate(SEQUENCES)
+                 if contains(sequence, run)),
+                key=lambda pair: (-pair[1], pair[0]))
+            assert index.search(run) == expected
+            assert index.search(run, 2) == expected[:2]
+
+
+def test_remove() -> None:
+    """Test that removed sequences are no longer found.
+    """
+    index = build_index(3)
+    index.remove([2, 2])
+    assert len(index) == 4
+    assert index.search([2, 2]) == []
+    assert index.search([-4, 5]) == [(5, 2.0), (1, 1.0)]
+
+    index.remove([])
+    assert len(index) == 0
+    assert index.search([]) == []
+
+
+@given(lists(lists(integers(-3, 3), max_size=8), max_size=10),
+       lists(integers(-3, 3), max_size=5))
+def test_search_random(sequences: List[List[int]], run: List[int]) -> None:
+    """Test that every sequence containing the run is found."""
+    index = IntervalIndex()
+    for position, sequence in enumerate(sequences):
+        index.insert(position, 1.0, sequence)
+
+    assert [value for value, _ in index.search(run)] == \
+        [position for position, sequence in enumerate(sequences)
+         if contains(sequence, run)]
+
+
+def test_remove_compacts() -> None:
+    """Test that repeatedly removing and inserting sequences keeps the
+    removed entries at most as many as the stored ones.
+    """
+    index = build_index(2)
+    for cycle in range(20):
+        index.remove([2])
+        index.insert(f'a{cycle}', 1.0, [2, -4, 5])
+        index.insert(f'b{cycle}', 2.0, [2, 2])
+        assert len(index) == 5
+        assert len(index._entries) <= 2 * len(index)
+        assert index.search([2, 2]) == [(f'b{cycle}', 2.0)]
+        assert index.search([-4, 5]) == [(5, 2.0), (f'a{cycle}', 1.0)]
+
+
+@given(lists(lists(integers(-2, 2), max_size=6), max_size=10),
+       lists(lists(integers(-2, 2), max_size=3), max_size=4),
+       lists(integers(-2, 2), max_size=4))
+def test_remove_random(sequences: List[List[int]],
+                       prefixes: List[List[int]], run: List[int]) -> None:
+    """Test that removing prefixes removes exactly the sequences starting
+    with them.
+    """
+    index = IntervalIndex()
+    for position, sequence in enumerate(sequences):
+        index.insert(position, 1.0, sequence)
+    for prefix in prefixes:
+        index.remove(prefix)
+
+    stored = [position for position, sequence in enumerate(sequences)
+              if not any(sequence[:len(prefix)] == prefix
+                         for prefix in prefixes)]
+    assert len(index) == len(stored)
+    assert [value for value, _ in index.search(run)] == \
+        [position for position in stored if contains(sequences[position], run)]
+
+
+if __name__ == '__main__':
+    pytest.main(['test_intervals.py'])
@@ -0,0 +1,83 @@
+"""Test parallel prefix tree building
+
+=== Module description ===
+This module contains tests for parallel.py module.
+"""
+import pytest
+
+from autocomplete.parallel import from_items_parallel, partition_items
+from autocomplete.prefix_tree import SimplePrefixTree, CompressedPrefixTree
+
+ITEMS = [
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('car', 3.0, ['c', 'a', 'r']),
+    ('door', 5.0, ['d', 'o', 'o', 'r']),
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('care', 1.0, ['c', 'a', 'r', 'e']),
+    ('c', 1.0, ['c']),
+    ('empty', 1.0, []),
+    ('bee', 4.0, ['b', 'e', 'e']),
+    ('bed', 1.0, ['b', 'e', 'd']),
+    ('ant', 4.0, ['a', 'n', 't'])
+]
+
+
+def test_partition_items() -> None:
+    """Test that items whose prefixes start with the same element are in the
+    same shard, and that the shards are balanced.
+    """
+    shards = partition_items(ITEMS, 2)
+    assert len(shards) == 2
+    assert sorted(index for shard in shards for index, _ in shard) == \
+        list(range(len(ITEMS)))
+    assert [len(shard) for shard in shards] == [5, 5]
+    for shard in shards:
+        for index, item in shard:
+            assert item is ITEMS[index]
+
+    starts = [{tuple(item[2][:1]) for _, item in shard} for shard in shards]
+    assert not starts[0] & starts[1]
+
+    assert len(partition_items(ITEMS, 100)) == 5
+    assert partition_items([], 2) == []
+
+
+def test_from_items_parallel_same_tree() -> None:
+    """Test that trees built by several processes are the trees built by
+    from_items in a single process.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            for top_k in [None, 2]:
+                expected = tree_class.from_items(weight_type, ITEMS, top_k)
+                t = from_items_parallel(tree_class, weight_type, ITEMS,
+                                        top_k, 3)
+                assert type(t) is tree_class
+                assert t.__getstate__() == expected.__getstate__()
+                assert str(t) == str(expected)
+                for prefix in [[], ['c'], ['c', 'a'], ['b'], ['x']]:
+                    for limit in [None, 1, 2]:
+                        assert t.autocomplete(prefix, limit) == \
+                            expected.autocomplete(prefix, limit)
+
+                # the grafted tree can still be changed
+                t.insert('bed', 5.0, ['b', 'e', 'd'])
+                t.remove(['c', 'a'])
+                expected.insert('bed', 5.0, ['b', 'e', 'd'])
+                expected.remove(['c', 'a'])
+                assert t.__getstate__() == expected.__getstate__()
+
+
+def test_from_items_parallel_single_shard() -> None:
+    """Test that items under a single subtree of the root are bulk loaded
+    in this process, compressing the root.
+    """
+    t = from_items_parallel(CompressedPrefixTree, 'sum', ITEMS[:2], None, 4)
+    assert t.value == ['c', 'a']
+    assert t.autocomplete([]) == [('car', 3.0), ('cat', 2.0)]
+
+    assert from_items_parallel(SimplePrefixTree, 'sum', [], None, 4).is_empty()
+
+
+if __name__ == '__main__':
+    pytest.main(['test_parallel.py'])
@@ -3,15 +3,19 @@
 === Module description ===
 This module contains tests for prefix_tree.py module.
 """
+import pickle
 import re
+import sys
 from typing import List
 
+import pytest
 from hypothesis import given
 from hypothesis.strategies import lists, from_regex
 
 from autocomplete.prefix_tree import (
     SimplePrefixTree,
     CompressedPrefixTree,
+    PrefixTreeLeaf,
     find_common_prefix_len
 )
 
@@ -176,7 +180,8 @@ def test_spt_autocomplete() -> None:
                                          ('cat', 5.0)]
     assert t2.autocomplete(['d']) == [('danger', 4.0), ('door', 3.0),
                                       ('dan', 1.0)]
-    assert t2.autocomplete(['d'], 1) == [('door', 3.0)]
+    assert t2.autocomplete(['d'], 1) == [('danger', 4.0)]
+    assert t2.autocomplete(['d'], 2) == [('danger', 4.0), ('door', 3.0)]
     assert t2.autocomplete([], 1) == [('center', 14.0)]
     assert t2.autocomplete([], 2) == [('center', 14.0), ('cent', 7.0)]
 
@@ -245,6 +250,129 @@ def test_spt_remove_avg_weight() -> None:
     assert t.subtrees[1].weight == 3.0
 
 
+def test_spt_remove_length() -> None:
+    """Test that remove keeps the size and weights of SimplePrefixTree.
+    """
+    t = SimplePrefixTree('average')
+    t.insert('cat', 4.0, ['c', 'a', 't'])
+    t.insert('car', 2.0, ['c', 'a', 'r'])
+    t.insert('cart', 6.0, ['c', 'a', 'r', 't'])
+    t.insert('dog', 3.0, ['d', 'o', 'g'])
+    t.insert('a', 1.0, [])
+    assert len(t) == 5
+
+    t.remove(['c', 'a', 'r'])
+    assert len(t) == 3
+    assert t.weight == 8.0 / 3
+    assert t.subtrees[0].value == ['c']
+    assert t.subtrees[0].weight == 4.0
+
+    t.remove(['c'])
+    assert len(t) == 2
+    assert [s.weight for s in t.subtrees] == [3.0, 1.0]
+
+    t.remove([])
+    assert len(t) == 0
+    assert t.is_empty()
+
+
+def test_spt_reposition_subtree() -> None:
+    """Test that subtrees stay sorted, with ties kept in insertion order.
+    """
+    t = SimplePrefixTree('sum')
+    t.insert('a', 1.0, ['a'])
+    t.insert('b', 1.0, ['b'])
+    t.insert('c', 1.0, ['c'])
+    assert [s.value for s in t.subtrees] == [['a'], ['b'], ['c']]
+
+    t.insert('c', 1.0, ['c'])
+    assert [s.value for s in t.subtrees] == [['c'], ['a'], ['b']]
+
+    t.insert('b', 1.0, ['b'])
+    assert [s.value for s in t.subtrees] == [['c'], ['b'], ['a']]
+
+    t.insert('a', 5.0, ['a'])
+    assert [s.value for s in t.subtrees] == [['a'], ['c'], ['b']]
+
+    # lighter value added below a subtree moves it down in 'average'
+    t2 = SimplePrefixTree('average')
+    t2.insert('a', 4.0, ['a'])
+    t2.insert('b', 3.0, ['b'])
+    t2.insert('ab', 1.0, ['a', 'b'])
+    assert [s.value for s in t2.subtrees] == [['b'], ['a']]
+    assert t2.subtrees[1].weight == 2.5
+
+
+def test_spt_position_of() -> None:
+    """Test that the subtrees are found at their index after they are added,
+    moved and removed, and in trees built in bulk.
+    """
+    items = [(letter, float(index % 4 + 1), [letter])
+             for index, letter in enumerate('abcdefgh')]
+    t = SimplePrefixTree('sum')
+    for value, weight, prefix in items:
+        t.insert(value, weight, prefix)
+    for tree in [t, SimplePrefixTree.from_items('sum', items)]:
+        tree.increment('a', 5.0)
+        tree.insert('ha', 2.5, ['h', 'a'])
+        tree.remove(['c'])
+        tree.increment('e', 0.5)
+        assert [s.value[0] for s in tree.subtrees] == \
+            ['h', 'a', 'd', 'g', 'b', 'f', 'e']
+        for index, subtree in enumerate(tree.subtrees):
+            assert tree.position_of(subtree) == index
+            assert subtree._position == index
+
+
+def test_spt_matching_subtree() -> None:
+    """Test the child index used by get_matching_subtree in SimplePrefixTree.
+    """
+    t = SimplePrefixTree('sum')
+    t.insert('cat', 2.0, ['c', 'a', 't'])
+    t.insert('car', 3.0, ['c', 'a', 'r'])
+    t.insert('dog', 1.0, ['d', 'o', 'g'])
+
+    assert t.get_matching_subtree(['d', 'o']).value == ['d']
+    sub = t.get_matching_subtree(['c', 'a', 't']).get_matching_subtree(
+        ['c', 'a', 't'])
+    assert sub.value == ['c', 'a']
+    assert sub.get_matching_subtree(['c', 'a', 'r']).value == ['c', 'a', 'r']
+    assert sub.get_matching_subtree(['c', 'a']) is None
+    assert t.get_matching_subtree(['x']) is None
+
+    # removed subtrees are no longer reachable through the index
+    t.remove(['d'])
+    assert t.get_matching_subtree(['d']) is None
+    t.insert('door', 4.0, ['d', 'o', 'o', 'r'])
+    assert t.get_matching_subtree(['d']).weight == 4.0
+    assert t.autocomplete(['d']) == [('door', 4.0)]
+
+
+def test_spt_value_rebuilt() -> None:
+    """Test that SimplePrefixTree values are rebuilt from the last prefix
+    element stored in each tree.
+    """
+    t = SimplePrefixTree('sum')
+    t.insert('cat', 2.0, ['c', 'a', 't'])
+    t.insert('car', 3.0, ['c', 'a', 'r'])
+
+    car = t.subtrees[0].subtrees[0].subtrees[0]
+    assert car._value == 'r'
+    assert car.value == ['c', 'a', 'r']
+    assert car.subtrees[0].value == 'car'
+    assert str(t) == ("[] (5.0)\n"
+                      "  ['c'] (5.0)\n"
+                      "    ['c', 'a'] (5.0)\n"
+                      "      ['c', 'a', 'r'] (3.0)\n"
+                      "        car (3.0)\n"
+                      "      ['c', 'a', 't'] (2.0)\n"
+                      "        cat (2.0)\n")
+
+    t.remove(['c', 'a', 'r'])
+    assert t.subtrees[0].subtrees[0].subtrees[0].value == ['c', 'a', 't']
+    assert t.autocomplete(['c', 'a']) == [('cat', 2.0)]
+
+
 # ------------------------------------------------------------------------------
 # Test CompressedPrefixTree
 # ------------------------------------------------------------------------------
@@ -338,9 +466,13 @@ def test_cpt_autocomplete() -> None:
     t.insert('dan', 5.0, ['d', 'a', 'n'])
 
     result = t.autocomplete([], 3)
-    assert result[0] == ('cater', 6.0)
-    assert result[1] == ('cate', 3.0)
-    assert result[2] == ('cat', 2.0)
+    assert result[0] == ('danger', 9.0)
+    assert result[1] == ('car', 8.0)
+    assert result[2] == ('cater', 6.0)
+
+    assert t.autocomplete(['c', 'a', 't']) == [('cater', 6.0), ('cate', 3.0),
+                                               ('cat', 2.0)]
+    assert t.autocomplete(['d'], 1) == [('danger', 9.0)]
 
 
 def test_cpt_insert_same_prefix() -> None:
@@ -383,6 +515,38 @@ def test_cpt_remove_sum_weight() -> None:
     assert t2.is_empty()
 
 
+def test_cpt_remove_compress() -> None:
+    """Test that CompressedPrefixTree stays compressed after removals.
+    """
+    t = CompressedPrefixTree('sum')
+    t.insert('cat', 2.0, ['c', 'a', 't'])
+    t.insert('cater', 3.0, ['c', 'a', 't', 'e', 'r'])
+    t.insert('cats', 4.0, ['c', 'a', 't', 's'])
+    t.insert('dog', 1.0, ['d', 'o', 'g'])
+
+    t.remove(['c', 'a', 't', 's'])
+    assert len(t) == 3
+    assert t.weight == 6.0
+    cat = t.subtrees[0]
+    assert cat.value == ['c', 'a', 't']
+    assert [s.value for s in cat.subtrees] == [['c', 'a', 't', 'e', 'r'],
+                                               'cat']
+
+    # the node for 'cat' keeps its leaf instead of becoming one
+    t.remove(['c', 'a', 't', 'e'])
+    assert t.subtrees[0].value == ['c', 'a', 't']
+    assert t.subtrees[0].subtrees[0].value == 'cat'
+    assert t.autocomplete(['c']) == [('cat', 2.0)]
+
+    # the root takes over its only remaining subtree
+    t.remove(['d'])
+    assert t.value == ['c', 'a', 't']
+    assert len(t) == 1
+    t.insert('car', 1.0, ['c', 'a', 'r'])
+    assert t.value == ['c', 'a']
+    assert t.autocomplete(['c', 'a']) == [('cat', 2.0), ('car', 1.0)]
+
+
 def test_cpt_complex() -> None:
     """Test various things for a complex CompressedPrefixTree.
     """
@@ -402,6 +566,455 @@ def test_cpt_complex() -> None:
     assert t1.subtrees[1].value == ['d']
 
 
+def test_cpt_matching_subtree() -> None:
+    """Test the child index used by CompressedPrefixTree lookups.
+    """
+    t = CompressedPrefixTree('sum')
+    t.insert('cater', 2.0, ['c', 'a', 't', 'e', 'r'])
+    t.insert('car', 3.0, ['c', 'a', 'r'])
+    t.insert('dog', 1.0, ['d', 'o', 'g'])
+
+    common, found = t.find_max_common_subtree(['c', 'a', 't'])
+    assert common == ['c', 'a']
+    assert found.value == ['c', 'a']
+    common, found = found.find_max_common_subtree(['c', 'a', 't', 'e'])
+    assert common == ['c', 'a', 't', 'e']
+    assert found.value == ['c', 'a', 't', 'e', 'r']
+    assert t.find_max_common_subtree(['x']) == ([], None)
+
+    assert t.get_matching_subtree(['c']) is None
+    assert t.get_matching_subtree(['c'], both_way=True).value == ['c', 'a']
+    assert t.get_matching_subtree(['d', 'o', 'g', 's']).value == \
+        ['d', 'o', 'g']
+    assert t.get_matching_subtree(['d', 'i']) is None
+
+
+# ------------------------------------------------------------------------------
+# Test bulk loading
+# ------------------------------------------------------------------------------
+ITEMS = [
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('car', 3.0, ['c', 'a', 'r']),
+    ('door', 5.0, ['d', 'o', 'o', 'r']),
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('care', 1.0, ['c', 'a', 'r', 'e']),
+    ('c', 1.0, ['c'])
+]
+
+
+def test_from_items_same_tree() -> None:
+    """Test that bulk loaded trees are the trees built by insert.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            t1 = tree_class(weight_type)
+            for value, weight, prefix in ITEMS:
+                t1.insert(value, weight, prefix)
+            t2 = tree_class.from_items(weight_type, ITEMS)
+
+            assert str(t2) == str(t1)
+            assert len(t2) == len(t1) == 5
+            assert t2.memory_stats()['nodes'] == t1.memory_stats()['nodes']
+            for prefix in [[], ['c'], ['c', 'a', 'r'], ['d', 'o'], ['x']]:
+                assert t2.autocomplete(prefix) == t1.autocomplete(prefix)
+                assert t2.autocomplete(prefix, 2) == t1.autocomplete(prefix, 2)
+
+
+def test_from_items_ties() -> None:
+    """Test that values of equal weight are ordered by their first item.
+    """
+    items = [('as', 1.0, ['a', 's']), ('an', 1.0, ['a', 'n']),
+             ('and', 1.0, ['a', 'n', 'd']), ('as', 1.0, ['a', 's'])]
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        t = tree_class.from_items('sum', items)
+        assert t.autocomplete(['a']) == [('as', 2.0), ('an', 1.0),
+                                         ('and', 1.0)]
+
+
+def test_from_items_compressed() -> None:
+    """Test the values of a bulk loaded CompressedPrefixTree.
+    """
+    t = CompressedPrefixTree.from_items('sum', ITEMS[2:3])
+    assert t.value == ['d', 'o', 'o', 'r']
+    assert t.subtrees[0].value == 'door'
+
+    t = CompressedPrefixTree.from_items('sum', ITEMS)
+    assert t.value == []
+    assert [s.value for s in t.subtrees] == [['c'], ['d', 'o', 'o', 'r']]
+    assert t.subtrees[0].subtrees[0].value == ['c', 'a']
+
+    t.insert('dog', 1.0, ['d', 'o', 'g'])
+    assert t.subtrees[1].value == ['d', 'o']
+    assert CompressedPrefixTree.from_items('sum', []).is_empty()
+
+
+# ------------------------------------------------------------------------------
+# Test batch autocomplete
+# ------------------------------------------------------------------------------
+def test_autocomplete_many() -> None:
+    """Test that prefixes autocompleted together get the results of
+    autocompleting them one at a time, in the order they are given.
+    """
+    prefixes = [['d', 'o'], [], ['c', 'a', 'r'], ['c', 'a'], ['c', 'x'],
+                ['c'], ['c', 'a', 'r', 'e', 's'], ['d'], ['c', 'a'], ['x']]
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for top_k in [None, 1]:
+            t = tree_class.from_items('sum', ITEMS, top_k)
+            for limit in [None, 1, 2]:
+                assert t.autocomplete_many(prefixes, limit) == \
+                    [t.autocomplete(prefix, limit) for prefix in prefixes]
+
+        assert t.autocomplete_many([]) == []
+        assert tree_class('sum').autocomplete_many([['c'], []]) == [[], []]
+
+    # a compressed tree whose own value is longer than the prefixes
+    t = CompressedPrefixTree.from_items('sum', ITEMS[2:3])
+    assert t.autocomplete_many([['d', 'o'], ['d', 'x'], ['d']]) == \
+        [[('door', 5.0)], [], [('door', 5.0)]]
+
+
+# ------------------------------------------------------------------------------
+# Test fuzzy autocomplete
+# ------------------------------------------------------------------------------
+FUZZY_WORDS = ['cat', 'car', 'care', 'cart', 'dog', 'door', 'do', 'act', 'c']
+
+
+def edit_distance(first: List, second: List) -> int:
+    """Return the Levenshtein distance between two sequences."""
+    row = list(range(len(first) + 1))
+    for j, element in enumerate(second, 1):
+        new_row = [j]
+        for i, first_element in enumerate(first, 1):
+            new_row.append(min(row[i] + 1, new_row[i - 1] + 1,
+                               row[i - 1] + (first_element != element)))
+        row = new_row
+    return row[-1]
+
+
+def test_autocomplete_fuzzy() -> None:
+    """Test that the fuzzy matches are the values starting within the edits
+    of the prefix, in non-increasing weight order.
+    """
+    items = [(word, float(index + 1), list(word))
+             for index, word in enumerate(FUZZY_WORDS)]
+    prefixes = ['', 'c', 'cst', 'dor', 'xyz', 'atc', 'carts', 'o']
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for top_k in [None, 2]:
+            t = tree_class.from_items('sum', items, top_k)
+            for prefix in prefixes:
+                for max_edits in [0, 1, 2]:
+                    expected = sorted(
+                        ((word, weight) for word, weight, _ in items
+                         if min(edit_distance(list(prefix), list(word[:end]))
+                                for end in range(len(word) + 1))
+                         <= max_edits), key=lambda pair: -pair[1])
+                    assert t.autocomplete_fuzzy(list(prefix), max_edits) == \
+                        expected
+                    assert t.autocomplete_fuzzy(list(prefix), max_edits, 2) \
+                        == expected[:2]
+
+            # no edits are the same as autocomplete
+            assert t.autocomplete_fuzzy(['c', 'a'], 0) == \
+                t.autocomplete(['c', 'a'])
+
+        assert tree_class('sum').autocomplete_fuzzy(['c'], 1) == []
+
+
+def test_autocomplete_fuzzy_costs() -> None:
+    """Test fuzzy matches with custom substitution and gap costs.
+    """
+    items = [('the cat', 2.0, ['the', 'cat']), ('a dog', 3.0, ['a', 'dog']),
+             ('the dog ran', 1.0, ['the', 'dog', 'ran'])]
+
+    def substitution(query_word: str, word: str, last: bool) -> float:
+        if last and word.startswith(query_word):
+            return 0.0
+        return 0.0 if query_word == word else 1.0
+
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        t = tree_class.from_items('sum', items)
+        assert t.autocomplete_fuzzy(['the', 'd'], 0, None, substitution,
+                                    float('inf')) == [('the dog ran', 1.0)]
+        assert t.autocomplete_fuzzy(['x', 'd'], 1, None, substitution,
+                                    float('inf')) == \
+            [('a dog', 3.0), ('the dog ran', 1.0)]
+        assert t.autocomplete_fuzzy(['the'], 1, None, substitution,
+                                    float('inf')) == \
+            [('a dog', 3.0), ('the cat', 2.0), ('the dog ran', 1.0)]
+        assert t.autocomplete_fuzzy(['dog'], 1, None, substitution,
+                                    float('inf')) == \
+            [('a dog', 3.0), ('the cat', 2.0), ('the dog ran', 1.0)]
+        assert t.autocomplete_fuzzy(['dog', 'ran'], 1, None, substitution,
+                                    float('inf')) == []
+
+
+# ------------------------------------------------------------------------------
+# Test changing values by value
+# ------------------------------------------------------------------------------
+VALUE_ITEMS = [
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('car', 3.0, ['c', 'a', 'r']),
+    ('door', 5.0, ['d', 'o', 'o', 'r']),
+    ('care', 1.0, ['c', 'a', 'r', 'e']),
+    ('c', 1.5, ['c']),
+    ('empty', 0.5, [])
+]
+
+
+def test_increment() -> None:
+    """Test that incrementing values gives the tree built with their
+    weights increased.
+    """
+    increments = [('care', 4.5, ['c', 'a', 'r', 'e']), ('empty', 10.0, []),
+                  ('c', 0.25, ['c'])]
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            for top_k in [None, 2]:
+                t = tree_class.from_items(weight_type, VALUE_ITEMS, top_k)
+                items = list(VALUE_ITEMS)
+                for value, delta, prefix in increments:
+                    t.increment(value, delta)
+                    items.append((value, delta, prefix))
+                    expected = tree_class.from_items(weight_type, items,
+                                                     top_k)
+                    assert str(t) == str(expected)
+                    for limit in [None, 1, 2]:
+                        assert t.autocomplete(['c'], limit) == \
+                            expected.autocomplete(['c'], limit)
+                        assert t.autocomplete([], limit) == \
+                            expected.autocomplete([], limit)
+
+                with pytest.raises(KeyError):
+                    t.increment('dog', 1.0)
+
+
+def test_insert_uses_leaf_index() -> None:
+    """Test that inserting a value again finds its leaf without its prefix.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        t = tree_class.from_items('sum', VALUE_ITEMS)
+        t.insert('cat', 4.0, ['c', 'a', 't'])
+        assert t.autocomplete(['c', 'a'], 1) == [('cat', 6.0)]
+        assert t.prefix_of('cat') == ['c', 'a', 't']
+        assert t.prefix_of('empty') == []
+        assert t.prefix_of('dog') is None
+
+
+def test_remove_value() -> None:
+    """Test that removing a value gives the tree built without it.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            for top_k in [None, 2]:
+                t = tree_class.from_items(weight_type, VALUE_ITEMS, top_k)
+                items = list(VALUE_ITEMS)
+                for value in ['c', 'cat', 'empty', 'dog', 'care', 'door',
+                              'car']:
+                    t.remove_value(value)
+                    items = [item for item in items if item[0] != value]
+                    expected = tree_class.from_items(weight_type, items,
+                                                     top_k)
+                    assert str(t) == str(expected)
+                    assert t.value == expected.value
+                    assert len(t) == len(items)
+                    for limit in [None, 1, 2]:
+                        assert t.autocomplete(['c'], limit) == \
+                            expected.autocomplete(['c'], limit)
+                        assert t.autocomplete([], limit) == \
+                            expected.autocomplete([], limit)
+
+                assert t.is_empty()
+                t.insert('cat', 1.0, ['c', 'a', 't'])
+                assert t.autocomplete([]) == [('cat', 1.0)]
+
+
+def test_remove_forgets_values() -> None:
+    """Test that values removed by prefix are no longer indexed.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        t = tree_class.from_items('sum', VALUE_ITEMS)
+        t.remove(['c', 'a'])
+        assert t.prefix_of('care') is None
+        with pytest.raises(KeyError):
+            t.increment('cat', 1.0)
+        t.insert('cat', 1.0, ['c', 'a', 't'])
+        assert t.autocomplete(['c', 'a']) == [('cat', 1.0)]
+
+        t = pickle.loads(pickle.dumps(t))
+        assert t.prefix_of('cat') == ['c', 'a', 't']
+        t.remove([])
+        assert t.prefix_of('c') is None
+
+
+# ------------------------------------------------------------------------------
+# Test pickling
+# ------------------------------------------------------------------------------
+def test_pickle() -> None:
+    """Test that pickled trees are unpickled with the same values, weights
+    and structure.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            t1 = tree_class.from_items(weight_type, ITEMS)
+            t2 = pickle.loads(pickle.dumps(t1))
+
+            assert str(t2) == str(t1)
+            assert len(t2) == len(t1)
+            assert t2.memory_stats()['nodes'] == t1.memory_stats()['nodes']
+            assert t2.autocomplete(['c'], 2) == t1.autocomplete(['c'], 2)
+
+            # unpickled trees can still be changed
+            t1.insert('cow', 9.0, ['c', 'o', 'w'])
+            t2.insert('cow', 9.0, ['c', 'o', 'w'])
+            t1.remove(['c', 'a', 'r'])
+            t2.remove(['c', 'a', 'r'])
+            assert str(t2) == str(t1)
+
+        empty = pickle.loads(pickle.dumps(tree_class('average')))
+        assert empty.is_empty()
+        empty.insert('a', 1.0, ['a'])
+        assert empty.autocomplete([]) == [('a', 1.0)]
+
+
+def test_pickle_long_prefix() -> None:
+    """Test pickling a tree deeper than the recursion limit.
+    """
+    prefix = ['a'] * (sys.getrecursionlimit() + 100)
+    t = pickle.loads(pickle.dumps(SimplePrefixTree.from_items(
+        'sum', [('long', 1.0, prefix), ('longer', 2.0, prefix + ['b'])])))
+    assert t.autocomplete(prefix) == [('longer', 2.0), ('long', 1.0)]
+
+
+# ------------------------------------------------------------------------------
+# Test top-k lists
+# ------------------------------------------------------------------------------
+TOP_ITEMS = [
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('car', 3.0, ['c', 'a', 'r']),
+    ('door', 5.0, ['d', 'o', 'o', 'r']),
+    ('care', 1.5, ['c', 'a', 'r', 'e']),
+    ('c', 1.0, ['c']),
+    ('dog', 4.0, ['d', 'o', 'g'])
+]
+
+
+def test_top_k_autocomplete() -> None:
+    """Test that trees keeping their heaviest values autocomplete like trees
+    that do not, while values are inserted and removed.
+    """
+    prefixes = [[], ['c'], ['c', 'a'], ['c', 'a', 'r'], ['d', 'o'], ['x']]
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            t1 = tree_class.from_items(weight_type, TOP_ITEMS)
+            t2 = tree_class.from_items(weight_type, TOP_ITEMS, top_k=2)
+            t3 = tree_class(weight_type, top_k=2)
+            for value, weight, prefix in TOP_ITEMS:
+                t3.insert(value, weight, prefix)
+
+            changes = [('insert', ('cow', 6.0, ['c', 'o', 'w'])),
+                       ('insert', ('cat', 5.0, ['c', 'a', 't'])),
+                       ('remove', (['c', 'o'],)),
+                       ('remove', (['d', 'o', 'o'],))]
+            for method, args in [(None, ())] + changes:
+                for t in [t1, t2, t3]:
+                    if method is not None:
+                        getattr(t, method)(*args)
+                for t in [t2, t3, pickle.loads(pickle.dumps(t2))]:
+                    assert str(t) == str(t1)
+                    for prefix in prefixes:
+                        for limit in [None, 1, 2, 3]:
+                            assert t.autocomplete(prefix, limit) == \
+                                t1.autocomplete(prefix, limit)
+
+
+def test_top_k_lists() -> None:
+    """Test the heaviest values kept by the trees.
+    """
+    t = CompressedPrefixTree.from_items('sum', TOP_ITEMS, top_k=2)
+    assert t._top == [('door', 5.0), ('dog', 4.0)]
+    assert t.find_subtree(['c'])._top == [('car', 3.0), ('cat', 2.0)]
+
+    t.insert('cab', 2.5, ['c', 'a', 'b'])
+    assert t.find_subtree(['c'])._top == [('car', 3.0), ('cab', 2.5)]
+    t.remove(['c', 'a', 'r'])
+    assert t.find_subtree(['c'])._top == [('cab', 2.5), ('cat', 2.0)]
+
+    assert t.top_memory() > 0
+    assert CompressedPrefixTree.from_items('sum', TOP_ITEMS).top_memory() == 0
+
+    # a tree with a single non-leaf subtree shares the list of its subtree
+    t = SimplePrefixTree.from_items('sum', TOP_ITEMS, top_k=2)
+    d = t.subtrees[0]
+    assert d.value == ['d']
+    assert d._top is d.subtrees[0]._top == [('door', 5.0), ('dog', 4.0)]
+
+
+# ------------------------------------------------------------------------------
+# Test long prefixes
+# ------------------------------------------------------------------------------
+def test_long_prefix() -> None:
+    """Test that prefixes longer than the recursion limit can be inserted,
+    autocompleted and removed.
+    """
+    prefix = ['a'] * (sys.getrecursionlimit() + 100)
+    for t in [SimplePrefixTree('sum'), CompressedPrefixTree('sum')]:
+        t.insert('long', 2.0, prefix)
+        t.insert('longer', 1.0, prefix + ['b'])
+        t.insert('long', 2.0, prefix)
+        assert t.autocomplete(prefix) == [('long', 4.0), ('longer', 1.0)]
+        assert t.autocomplete(prefix[:10], 1) == [('long', 4.0)]
+
+        t.remove(prefix + ['b'])
+        assert len(t) == 1
+        assert t.weight == 4.0
+        t.remove(prefix[:10])
+        assert t.is_empty()
+
+
+# ------------------------------------------------------------------------------
+# Test memory layout
+# ------------------------------------------------------------------------------
+def test_memory_stats() -> None:
+    """Test memory_stats of both prefix trees.
+    """
+    t1 = SimplePrefixTree('sum')
+    assert t1.memory_stats()['nodes'] == 1
+    assert t1.memory_stats()['leaves'] == 0
+
+    t1.insert('cat', 2.0, ['c', 'a', 't'])
+    t1.insert('car', 3.0, ['c', 'a', 'r'])
+    stats = t1.memory_stats()
+    assert stats['nodes'] == 5
+    assert stats['leaves'] == 2
+    assert stats['bytes'] > 0
+
+    t2 = CompressedPrefixTree('sum')
+    t2.insert('cat', 2.0, ['c', 'a', 't'])
+    t2.insert('car', 3.0, ['c', 'a', 'r'])
+    stats = t2.memory_stats()
+    assert stats['nodes'] == 3
+    assert stats['leaves'] == 2
+
+
+def test_slotted_trees() -> None:
+    """Test that the trees have no instance dict and that leaves are
+    PrefixTreeLeaf records.
+    """
+    for t in [SimplePrefixTree('average'), CompressedPrefixTree('average')]:
+        t.insert('cat', 2.0, ['c', 'a', 't'])
+        t.insert('car', 4.0, ['c', 'a', 'r'])
+        assert not hasattr(t, '__dict__')
+
+        subtree = t.subtrees[0]
+        while not subtree.is_leaf():
+            assert not hasattr(subtree, '__dict__')
+            assert not hasattr(subtree, '_weight_type')
+            subtree = subtree.subtrees[0]
+        assert isinstance(subtree, PrefixTreeLeaf)
+        assert subtree.value == 'car'
+        assert t.weight == 3.0
+
+
 def test_find_common_prefix_len() -> None:
     """Test <find_common_prefix_len> function.
     """
@@ -0,0 +1,151 @@
+"""Test AutocompleteServer
+
+=== Module description ===
+This module contains tests for server.py module.
+"""
+import asyncio
+import json
+import time
+from typing import Any, List, Optional, Tuple
+
+import pytest
+
+from autocomplete.engine import LetterAutocompleteEngine
+from autocomplete.server import AutocompleteServer
+
+
+class SlowEngine:
+    """An engine taking a while to answer each query, and counting them.
+    """
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def autocomplete(self, prefix: str, limit: Optional[int] = None
+                     ) -> List[Tuple[Any, float]]:
+        self.calls += 1
+        time.sleep(0.05)
+        return [(prefix + '!', 1.0)]
+
+
+def test_server_coalesces_lookups() -> None:
+    """Test that requests for the same query in flight share one lookup.
+    """
+    engine = SlowEngine()
+    server = AutocompleteServer(engine)
+
+    async def run() -> list:
+        return await asyncio.gather(server.answer('a', 'ho'),
+                                    server.answer('b', 'ho'),
+                                    server.answer('c', 'hi'))
+
+    assert asyncio.run(run()) == [[('ho!', 1.0)], [('ho!', 1.0)],
+                                  [('hi!', 1.0)]]
+    assert engine.calls == 2
+    assert server.stats() == {'requests': 3, 'coalesced': 1, 'cancelled': 0,
+                              'offloaded': 2}
+    server.close()
+
+
+def test_server_cancels_superseded() -> None:
+    """Test that a request is cancelled by a later request of its session.
+    """
+    server = AutocompleteServer(SlowEngine())
+
+    async def run() -> list:
+        first = asyncio.ensure_future(server.answer('a', 'how t'))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(server.answer('a', 'how to'))
+        other = asyncio.ensure_future(server.answer('b', 'how'))
+        return await asyncio.gather(first, second, other,
+                                    return_exceptions=True)
+
+    first, second, other = asyncio.run(run())
+    assert isinstance(first, asyncio.CancelledError)
+    assert second == [('how to!', 1.0)]
+    assert other == [('how!', 1.0)]
+    assert server.stats()['cancelled'] == 1
+    server.close()
+
+
+class ExclusiveEngine(SlowEngine):
+    """A SlowEngine recording the largest number of threads using it at once.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.active = 0
+        self.most_active = 0
+
+    def autocomplete(self, prefix: str, limit: Optional[int] = None
+                     ) -> List[Tuple[Any, float]]:
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        try:
+            return super().autocomplete(prefix, limit)
+        finally:
+            self.active -= 1
+
+
+def test_server_one_engine_thread() -> None:
+    """Test that a light query arriving while a heavy query is looked up
+    waits for it in the worker thread instead of using the engine at once.
+    """
+    engine = ExclusiveEngine()
+    server = AutocompleteServer(engine)
+
+    async def run() -> list:
+        heavy = asyncio.ensure_future(server.answer('a', 'h'))
+        await asyncio.sleep(0.01)
+        light = asyncio.ensure_future(server.answer('b', 'hello', 5))
+        return await asyncio.gather(heavy, light)
+
+    assert asyncio.run(run()) == [[('h!', 1.0)], [('hello!', 1.0)]]
+    assert engine.most_active == 1
+    assert server.stats()['offloaded'] == 2
+
+    # a light query is looked up by the event loop if the engine is free
+    assert asyncio.run(server.answer('c', 'hello', 5)) == [('hello!', 1.0)]
+    assert server.stats()['offloaded'] == 2
+    server.close()
+
+
+def test_server_connection() -> None:
+    """Test answering requests sent through a connection.
+    """
+    engine = LetterAutocompleteEngine({
+        'file': 'tests/data/test_data.txt',
+        'autocompleter': 'compressed',
+        'weight_type': 'sum'
+    })
+    server = AutocompleteServer(engine)
+
+    async def run() -> list:
+        listener = await server.serve(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        requests = [
+            {'id': 1, 'session': 1, 'prefix': 'an', 'limit': 1},
+            {'id': 2, 'session': 2, 'prefix': 'an'},
+            {'id': 3, 'prefix': 'x', 'limit': 5}
+        ]
+        for request in requests:
+            writer.write(json.dumps(request).encode('utf8') + b'\n')
+        writer.write(b'not json\n')
+        await writer.drain()
+
+        responses = [json.loads(await reader.readline()) for _ in range(4)]
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return responses
+
+    responses = asyncio.run(run())
+    by_id = {response['id']: response for response in responses}
+    assert by_id[1] == {'id': 1, 'results': [['an', 1.0]]}
+    assert by_id[2] == {'id': 2, 'results': [['an', 1.0], ['and', 1.0]]}
+    assert by_id[3] == {'id': 3, 'results': []}
+    assert 'error' in by_id[None]
+    server.close()
+
+
+if __name__ == '__main__':
+    pytest.main(['test_server.py'])
@@ -0,0 +1,115 @@
+"""Test ShardedAutocompleter
+
+=== Module description ===
+This module contains tests for sharded.py module.
+"""
+import pytest
+
+from autocomplete.engine import word_distance
+from autocomplete.prefix_tree import SimplePrefixTree, CompressedPrefixTree
+from autocomplete.sharded import ShardedAutocompleter, merge_results, shard_of
+
+ITEMS = [
+    ('cat', 2.0, ['c', 'a', 't']),
+    ('car', 3.0, ['c', 'a', 'r']),
+    ('door', 5.0, ['d', 'o', 'o', 'r']),
+    ('cat', 2.5, ['c', 'a', 't']),
+    ('care', 1.0, ['c', 'a', 'r', 'e']),
+    ('empty', 0.5, []),
+    ('bee', 4.0, ['b', 'e', 'e']),
+    ('bed', 1.5, ['b', 'e', 'd']),
+    ('ant', 6.0, ['a', 'n', 't'])
+]
+PREFIXES = [[], ['c'], ['c', 'a'], ['b'], ['a', 'n'], ['d', 'x'], ['z']]
+
+
+def test_shard_bounds() -> None:
+    """Test that the shards own ranges of first prefix elements storing
+    about as many items each.
+    """
+    with ShardedAutocompleter.from_items(SimplePrefixTree, 'sum', ITEMS,
+                                         shards=3) as sharded:
+        assert sharded.bounds == ['c', 'd']
+        assert len(sharded) == 8
+
+    assert shard_of(['b', 'c'], []) == 0
+    assert shard_of(['b', 'c'], ['a']) == 0
+    assert shard_of(['b', 'c'], ['b', 'x']) == 1
+    assert shard_of(['b', 'c'], ['z']) == 2
+
+    with ShardedAutocompleter.from_items(SimplePrefixTree, 'sum', ITEMS[:1],
+                                         shards=3) as sharded:
+        assert sharded.bounds == []
+        assert sharded.autocomplete([]) == [('cat', 2.0)]
+
+
+def test_sharded_autocomplete() -> None:
+    """Test that a sharded autocompleter answers queries like a single prefix
+    tree storing the same items.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        for weight_type in ['sum', 'average']:
+            tree = tree_class.from_items(weight_type, ITEMS)
+            with ShardedAutocompleter.from_items(tree_class, weight_type,
+                                                 ITEMS, 2, 3) as sharded:
+                for limit in [None, 1, 2, 3]:
+                    expected = [tree.autocomplete(prefix, limit)
+                                for prefix in PREFIXES]
+                    assert [sharded.autocomplete(prefix, limit)
+                            for prefix in PREFIXES] == expected
+                    assert sharded.autocomplete_many(PREFIXES, limit) == \
+                        expected
+
+
+def test_sharded_insert_remove() -> None:
+    """Test that values are inserted into and removed from their shards.
+    """
+    with ShardedAutocompleter.from_items(CompressedPrefixTree, 'sum', ITEMS,
+                                         shards=3) as sharded:
+        sharded.insert('bee', 3.0, ['b', 'e', 'e'])
+        sharded.insert('zoo', 0.25, ['z', 'o', 'o'])
+        assert sharded.autocomplete(['b']) == [('bee', 7.0), ('bed', 1.5)]
+        assert sharded.autocomplete([], 2) == [('bee', 7.0), ('ant', 6.0)]
+        assert len(sharded) == 9
+
+        sharded.remove(['b', 'e', 'e'])
+        assert sharded.autocomplete(['b']) == [('bed', 1.5)]
+        sharded.remove([])
+        assert len(sharded) == 0
+        assert sharded.autocomplete([]) == []
+
+
+def test_sharded_vocabulary() -> None:
+    """Test that shards storing the ids of words in their own vocabularies
+    answer exact and fuzzy queries of words like a tree storing the words.
+    """
+    items = [('the cat', 3.0, ['the', 'cat']), ('a dog', 4.0, ['a', 'dog']),
+             ('the cow', 2.0, ['the', 'cow']), ('dog', 1.0, ['dog'])]
+    tree = CompressedPrefixTree.from_items('sum', items)
+    with ShardedAutocompleter.from_items(CompressedPrefixTree, 'sum', items,
+                                         shards=2, vocabulary=True) as sharded:
+        sharded.insert('a cat', 5.0, ['a', 'cat'])
+        tree.insert('a cat', 5.0, ['a', 'cat'])
+        for prefix in [[], ['the'], ['a', 'cat'], ['bird']]:
+            assert sharded.autocomplete(prefix) == tree.autocomplete(prefix)
+        for prefix, max_edits in [(['teh'], 2), (['a', 'cot'], 1),
+                                  (['dig'], 1)]:
+            assert sharded.autocomplete_fuzzy(prefix, max_edits) == \
+                tree.autocomplete_fuzzy(prefix, max_edits)
+            assert sharded.autocomplete_fuzzy(
+                prefix, max_edits, None, word_distance) == \
+                tree.autocomplete_fuzzy(prefix, max_edits, None, word_distance)
+
+
+def test_merge_results() -> None:
+    """Test that results from several shards are merged by weight.
+    """
+    assert merge_results([[('a', 3.0), ('b', 1.0)], [('c', 2.0)]], None) == \
+        [('a', 3.0), ('c', 2.0), ('b', 1.0)]
+    assert merge_results([[('a', 3.0), ('b', 1.0)], [('c', 2.0)]], 2) == \
+        [('a', 3.0), ('c', 2.0)]
+    assert merge_results([[], []], 2) == []
+
+
+if __name__ == '__main__':
+    pytest.main(['test_sharded.py'])
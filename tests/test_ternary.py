@@ -0,0 +1,126 @@
+"""Test TernarySearchTree
+
+=== Module description ===
+This module contains tests for ternary.py module.
+"""
+import pickle
+from typing import List
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import integers, lists
+
+from autocomplete.engine import (MelodyAutocompleteEngine,
+                                 SentenceAutocompleteEngine)
+from autocomplete.prefix_tree import SimplePrefixTree
+from autocomplete.ternary import TernarySearchTree
+
+from .helpers import PREFIXES, WORDS, assert_same_results, random_items
+
+
+def test_autocomplete() -> None:
+    """Test that a ternary search tree finds the values of a
+    SimplePrefixTree, with and without the heaviest values kept.
+    """
+    items = random_items(300, 0, WORDS, 4)
+    expected = SimplePrefixTree.from_items('sum', items)
+    for top_k in [None, 2]:
+        tree = TernarySearchTree.from_items('sum', items, top_k)
+        assert tree.memory_stats()['leaves'] == len(expected)
+        assert sorted(tree.items()) == \
+            sorted(TernarySearchTree.from_items('sum', tree.items()).items())
+        assert len(list(tree.items())) == len(expected)
+        assert_same_results(tree, expected, PREFIXES)
+
+
+def test_insert_balanced() -> None:
+    """Test that sorted and unsorted lists and iterators of items build the
+    same tree, without changing the list given.
+    """
+    items = random_items(100, 2, WORDS, 4)
+    expected = TernarySearchTree.from_items('sum', iter(items))
+    for given_items in [items, sorted(items, key=lambda item: item[2])]:
+        copy = list(given_items)
+        tree = TernarySearchTree.from_items('sum', given_items)
+        assert given_items == copy
+        assert sorted(tree.items()) == sorted(expected.items())
+        assert tree._root.element == expected._root.element
+
+
+def test_insert_adds_weight() -> None:
+    """Test that inserting a stored value adds to its weight, and updates
+    the heaviest values kept.
+    """
+    tree = TernarySearchTree('sum', 1)
+    tree.insert('the cat', 2.0, ['the', 'cat'])
+    tree.insert('the dog', 3.0, ['the', 'dog'])
+    tree.insert('', 1.0, [])
+    assert tree.autocomplete(['the'], 1) == [('the dog', 3.0)]
+    tree.insert('the cat', 2.0, ['the', 'cat'])
+    tree.insert('', 1.0, [])
+    assert len(tree) == 3
+    assert tree.autocomplete(['the'], 1) == [('the cat', 4.0)]
+    assert tree.autocomplete([]) == [('the cat', 4.0), ('the dog', 3.0),
+                                     ('', 2.0)]
+
+
+def test_remove() -> None:
+    """Test that removing values unlinks the empty nodes and updates the
+    weights and heaviest values above them.
+    """
+    items = random_items(300, 1, WORDS, 4)
+    expected = SimplePrefixTree.from_items('sum', items)
+    tree = TernarySearchTree.from_items('sum', items, 2)
+    for prefix in [['zebra'], ['the', 'cat'], ['a'], ['dog', 'on', 'mat'],
+                   ['sat']]:
+        tree.remove(prefix)
+        expected.remove(prefix)
+        assert_same_results(tree, expected, PREFIXES)
+
+    tree.remove([])
+    assert len(tree) == 0
+    assert tree.autocomplete([]) == []
+    assert tree.memory_stats()['nodes'] == 0
+
+
+@given(lists(lists(integers(-3, 3), max_size=4), max_size=40))
+def test_insert_random(prefixes: List[List[int]]) -> None:
+    """Test that inserting interval sequences one at a time gives the
+    results of a SimplePrefixTree.
+    """
+    tree = TernarySearchTree('sum', 2)
+    expected = SimplePrefixTree('sum', 2)
+    for index, prefix in enumerate(prefixes):
+        tree.insert(index, 1.0 + index % 3, prefix)
+        expected.insert(index, 1.0 + index % 3, prefix)
+    assert_same_results(tree, expected, [[], [0], [1, -1], [3, 3, 3]])
+
+
+def test_pickle() -> None:
+    """Test that a pickled tree gives the same results."""
+    items = random_items(200, 2, WORDS, 4)
+    tree = TernarySearchTree.from_items('sum', items, 3)
+    copy = pickle.loads(pickle.dumps(tree))
+    assert copy.top_k == 3
+    for prefix in PREFIXES:
+        assert sorted(copy.autocomplete(prefix)) == \
+            sorted(tree.autocomplete(prefix))
+
+
+def test_ternary_engines() -> None:
+    """Test engines using a ternary search tree.
+    """
+    config = {'autocompleter': 'ternary', 'weight_type': 'sum'}
+    engine = SentenceAutocompleteEngine(
+        dict(config, file='tests/data/test_data.csv', top_k=1))
+    assert engine.autocomplete('the', 1) == [('the animal', 150.0)]
+
+    engine = MelodyAutocompleteEngine(
+        dict(config, file='tests/data/test_melody.csv'))
+    result = engine.autocomplete([0])
+    assert [melody.name for melody, _ in result] == \
+        ['Random melody 0', 'Random melody 2']
+
+
+if __name__ == '__main__':
+    pytest.main(['test_ternary.py'])
@@ -0,0 +1,151 @@
+"""Test Vocabulary and VocabularyAutocompleter
+
+=== Module description ===
+This module contains tests for vocabulary.py module.
+"""
+import pickle
+from typing import List
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import lists, sampled_from
+
+from autocomplete.cache import CachedAutocompleter
+from autocomplete.engine import SentenceAutocompleteEngine, word_distance
+from autocomplete.prefix_tree import CompressedPrefixTree, SimplePrefixTree
+from autocomplete.vocabulary import Vocabulary, VocabularyAutocompleter
+
+ITEMS = [
+    ('the cat', 3.0, ['the', 'cat']),
+    ('the cat sat', 5.0, ['the', 'cat', 'sat']),
+    ('the dog', 2.0, ['the', 'dog']),
+    ('a cat', 4.0, ['a', 'cat']),
+    ('dog', 1.0, ['dog'])
+]
+
+PREFIXES = [[], ['the'], ['the', 'cat'], ['cat'], ['the', 'bird'],
+            ['bird', 'cat'], ['dog'], ['the', 'cat', 'sat', 'down']]
+
+
+def encoded(tree_class: type, items: list) -> VocabularyAutocompleter:
+    """Return a VocabularyAutocompleter storing <items> in a prefix tree of
+    <tree_class>.
+    """
+    vocabulary = Vocabulary()
+    return VocabularyAutocompleter(
+        tree_class.from_items('sum', vocabulary.intern_items(items)),
+        vocabulary)
+
+
+def test_vocabulary() -> None:
+    """Test interning, encoding and decoding words."""
+    vocabulary = Vocabulary(['the', 'cat'])
+    assert vocabulary.intern(['cat', 'sat', 'the', 'sat']) == [1, 2, 0, 2]
+    assert len(vocabulary) == 3
+    assert 'sat' in vocabulary and 'dog' not in vocabulary
+    assert vocabulary.encode(['sat', 'cat']) == [2, 1]
+    assert vocabulary.encode(['sat', 'dog']) is None
+    assert vocabulary.decode([0, 2]) == ['the', 'sat']
+
+    copy = pickle.loads(pickle.dumps(vocabulary))
+    assert copy.words == vocabulary.words
+    assert copy.encode(['sat', 'cat']) == [2, 1]
+    assert pickle.loads(pickle.dumps(Vocabulary())).add('a') == 0
+
+
+def test_autocomplete() -> None:
+    """Test that prefixes of words find the values stored under their ids,
+    and that unknown words find nothing.
+    """
+    for tree_class in [SimplePrefixTree, CompressedPrefixTree]:
+        tree = tree_class.from_items('sum', ITEMS)
+        autocompleter = encoded(tree_class, ITEMS)
+        assert len(autocompleter) == len(tree)
+        assert autocompleter.memory_stats() == tree.memory_stats()
+        for limit in [None, 1, 2]:
+            for prefix in PREFIXES:
+                assert autocompleter.autocomplete(prefix, limit) == \
+                    tree.autocomplete(prefix, limit)
+            assert autocompleter.autocomplete_many(PREFIXES, limit) == \
+                tree.autocomplete_many(PREFIXES, limit)
+
+
+@given(lists(lists(sampled_from(['a', 'b', 'c']), max_size=4), max_size=20))
+def test_autocomplete_random(prefixes: List[List[str]]) -> None:
+    """Test that a VocabularyAutocompleter gives the results of the tree it
+    wraps storing the words.
+    """
+    items = [(' '.join(prefix) + f' {index}', float(index % 3 + 1), prefix)
+             for index, prefix in enumerate(prefixes)]
+    tree = CompressedPrefixTree.from_items('sum', items)
+    autocompleter = encoded(CompressedPrefixTree, items)
+    for prefix in [[], ['a'], ['b', 'a'], ['c', 'c'], ['d']]:
+        assert autocompleter.autocomplete(prefix) == tree.autocomplete(prefix)
+
+
+def test_changes() -> None:
+    """Test inserting, removing and changing values through the vocabulary,
+    behind a cache.
+    """
+    tree = SimplePrefixTree.from_items('sum', ITEMS)
+    autocompleter = CachedAutocompleter(encoded(SimplePrefixTree, ITEMS))
+    assert autocompleter.autocomplete(['the']) == tree.autocomplete(['the'])
+
+    for changed in [tree, autocompleter]:
+        changed.insert('the bird', 6.0, ['the', 'bird'])
+        changed.increment('the dog', 10.0)
+        changed.remove(['a'])
+        changed.remove(['bird'])
+        changed.remove_value('the cat sat')
+    for prefix in PREFIXES:
+        assert autocompleter.autocomplete(prefix) == tree.autocomplete(prefix)
+    assert autocompleter.autocomplete(['the'], 1) == [('the dog', 12.0)]
+
+
+def test_fuzzy() -> None:
+    """Test that fuzzy matches compare the query words with the stored
+    words.
+    """
+    tree = CompressedPrefixTree.from_items('sum', ITEMS)
+    autocompleter = encoded(CompressedPrefixTree, ITEMS)
+    for prefix, max_edits in [(['teh', 'cat'], 2), (['the', 'bat'], 1),
+                              (['bird'], 1), (['dig'], 1)]:
+        assert autocompleter.autocomplete_fuzzy(prefix, max_edits) == \
+            tree.autocomplete_fuzzy(prefix, max_edits)
+        assert autocompleter.autocomplete_fuzzy(
+            prefix, max_edits, None, word_distance) == \
+            tree.autocomplete_fuzzy(prefix, max_edits, None, word_distance)
+
+
+def test_freeze() -> None:
+    """Test that a frozen copy stores the words instead of their ids."""
+    tree = CompressedPrefixTree.from_items('sum', ITEMS)
+    frozen = encoded(CompressedPrefixTree, ITEMS).freeze()
+    for prefix in PREFIXES:
+        assert frozen.autocomplete(prefix) == tree.autocomplete(prefix)
+
+
+def test_sentence_engine(tmp_path) -> None:
+    """Test that the sentence engine stores the ids of its words, also in
+    its snapshots.
+    """
+    config = {
+        'file': 'tests/data/test_data.csv',
+        'autocompleter': 'compressed',
+        'weight_type': 'sum',
+        'cache_dir': str(tmp_path)
+    }
+    engine = SentenceAutocompleteEngine(config)
+    assert isinstance(engine.autocompleter, VocabularyAutocompleter)
+    assert 'animal' in engine.autocompleter.vocabulary
+    assert engine.autocomplete('the') == [('the animal', 150.0)]
+    assert engine.autocomplete('the cat') == []
+
+    cached = SentenceAutocompleteEngine(config)
+    assert cached.autocompleter.vocabulary.words == \
+        engine.autocompleter.vocabulary.words
+    assert cached.autocomplete('') == engine.autocomplete('')
+
+
+if __name__ == '__main__':
+    pytest.main(['test_vocabulary.py'])